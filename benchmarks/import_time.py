@@ -0,0 +1,108 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Import-time benchmark of the pymfm control entry points.
+
+Every entry point is imported in a fresh interpreter with ``python -X importtime``. The script
+reports the cumulative import time and fails (exit code 1) if an entry point loads one of the
+heavy dependencies, which are only to be imported on first use of the control logic needing
+them, or exceeds its time budget.
+
+Usage::
+
+    python benchmarks/import_time.py [--repeats N] [--budget-scale FACTOR]
+"""
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+
+# Heavy dependencies which are not to be loaded by merely importing an entry point
+HEAVY_MODULES = ("pyomo", "matplotlib", "scipy", "astral", "gurobipy")
+
+# Entry points and their import time budgets (seconds), with headroom for slower machines
+ENTRY_POINTS = {
+    "pymfm.control.utils.data_input": 1.5,
+    "pymfm.control.utils.mode_logic_handler": 1.5,
+    "pymfm.control.utils.data_output": 1.5,
+    "pymfm.control.utils.result_cache": 1.5,
+    "pymfm.control.utils.async_handler": 1.5,
+    "pymfm.control.utils.worker_pool": 1.5,
+}
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)")
+
+
+def import_profile(module: str) -> dict:
+    """Import a module in a fresh interpreter and return the cumulative import time (seconds)
+    of every module it loaded."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    profile = {}
+    for line in completed.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            profile[match.group(4)] = int(match.group(2)) / 1e6
+    return profile
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=3, help="imports per entry point")
+    parser.add_argument(
+        "--budget-scale", type=float, default=1.0, help="factor applied to the time budgets"
+    )
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'entry point':45} {'median [s]':>10} {'budget [s]':>10}  heavy modules")
+    for module, budget_s in ENTRY_POINTS.items():
+        profiles = [import_profile(module) for _ in range(args.repeats)]
+        median_s = statistics.median(profile[module] for profile in profiles)
+        heavy = sorted(
+            {
+                name
+                for name in profiles[0]
+                if name.split(".")[0] in HEAVY_MODULES and "." not in name
+            }
+        )
+        budget_s *= args.budget_scale
+        print(f"{module:45} {median_s:10.3f} {budget_s:10.3f}  {', '.join(heavy) or '-'}")
+        if heavy:
+            failures.append(f"{module} imports {', '.join(heavy)}")
+        if median_s > budget_s:
+            failures.append(f"{module} takes {median_s:.3f} s (budget {budget_s:.3f} s)")
+
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Benchmark of the alignment of P_net_after_kW limitations onto the forecast timestamps.
+
+data_input.P_net_after_kW_lim_to_df is timed for long forecasts (1-minute resolution, 10k+
+timestamps) without limitations and with dense and sparse limitation lists. The former
+set-based alignment is timed alongside as a reference. The script fails (exit code 1) if
+both alignments disagree on any bound.
+
+Usage::
+
+    python benchmarks/limits_alignment.py [--repeats N] [--timestamps N [N ...]]
+"""
+
+import argparse
+from datetime import datetime
+import statistics
+import sys
+import time
+from typing import List
+import numpy as np
+import pandas as pd
+from pymfm.control.utils.data_input import (
+    GenerationAndLoad,
+    P_net_after_kWLimitationColumns,
+    P_net_after_kW_lim_to_df,
+)
+
+# Share of the forecast timestamps with a limitation
+DENSITIES = {"none": None, "dense": 1.0, "sparse": 0.01}
+
+
+def set_based_alignment(limits: List[dict], timestamps: List[datetime]) -> pd.DataFrame:
+    """The former alignment of the limitations (given as the dictionaries of their values)
+    onto the forecast timestamps through sets of timestamps."""
+    if limits is None:
+        all_timestamps = set(timestamps)
+        missing_data = pd.DataFrame(
+            {
+                "upper_bound": [0] * len(all_timestamps),
+                "with_upper_bound": [False] * len(all_timestamps),
+                "lower_bound": [0] * len(all_timestamps),
+                "with_lower_bound": [False] * len(all_timestamps),
+            },
+            index=list(all_timestamps),
+        )
+        return missing_data
+    df = pd.DataFrame(limits)
+    df.set_index("timestamp", inplace=True)
+    df["with_upper_bound"] = df["upper_bound"].notnull()
+    df["with_lower_bound"] = df["lower_bound"].notnull()
+    df.fillna(0, inplace=True)
+    all_timestamps = set(df.index).union(set(timestamps))
+    missing_timestamps = list(set(all_timestamps).difference(df.index))
+    missing_data = pd.DataFrame(
+        {
+            "upper_bound": [0] * len(missing_timestamps),
+            "with_upper_bound": [False] * len(missing_timestamps),
+            "lower_bound": [0] * len(missing_timestamps),
+            "with_lower_bound": [False] * len(missing_timestamps),
+        },
+        index=missing_timestamps,
+    )
+    return pd.concat([df, missing_data.astype(int)], axis=0)
+
+
+def scenario(n_timestamps: int, density: float, seed: int = 0):
+    """Forecast of n_timestamps minutes and limitations at the given share of them."""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(
+        "2021-04-01", periods=n_timestamps, freq="1min", tz="UTC", name="timestamp"
+    )
+    gen_load_data = GenerationAndLoad(
+        values={
+            "start": index[0],
+            "freq": "1min",
+            "P_gen_kW": rng.uniform(0, 100, n_timestamps),
+            "P_load_kW": rng.uniform(0, 100, n_timestamps),
+        }
+    )
+    if density is None:
+        return None, gen_load_data
+    limited = np.sort(
+        rng.choice(n_timestamps, max(1, int(density * n_timestamps)), replace=False)
+    )
+    upper_bound = rng.uniform(50, 100, len(limited))
+    lower_bound = rng.uniform(-100, -50, len(limited))
+    # Some limitations only bound one side
+    upper_bound[::7] = np.nan
+    lower_bound[::5] = np.nan
+    limits = P_net_after_kWLimitationColumns.from_columns(
+        index[limited], [upper_bound, lower_bound]
+    )
+    return limits, gen_load_data
+
+
+def timed(function, repeats: int, *args) -> float:
+    """Median wall time (seconds) of function(*args)."""
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(*args)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5, help="runs per scenario")
+    parser.add_argument(
+        "--timestamps",
+        type=int,
+        nargs="+",
+        default=[10080, 43200],
+        help="forecast lengths (1-minute timestamps)",
+    )
+    args = parser.parse_args()
+
+    failures = []
+    print(
+        f"{'timestamps':>10} {'limits':>8} {'reindex [ms]':>13} {'set-based [ms]':>15} "
+        f"{'speedup':>8}"
+    )
+    for n_timestamps in args.timestamps:
+        for name, density in DENSITIES.items():
+            limits, gen_load_data = scenario(n_timestamps, density)
+            # Input of the former alignment, as parsed per timestamp by pydantic
+            rows = None if limits is None else [row.dict() for row in limits]
+            timestamps = list(gen_load_data.values.timestamps.to_pydatetime())
+            aligned = P_net_after_kW_lim_to_df(limits, gen_load_data)
+            reference = set_based_alignment(rows, timestamps).sort_index()
+            if not np.allclose(
+                aligned.to_numpy(float), reference[aligned.columns].to_numpy(float)
+            ):
+                failures.append(f"{name} limitations of {n_timestamps} timestamps differ")
+            reindex_s = timed(P_net_after_kW_lim_to_df, args.repeats, limits, gen_load_data)
+            set_based_s = timed(set_based_alignment, args.repeats, rows, timestamps)
+            print(
+                f"{n_timestamps:>10} {name:>8} {reindex_s * 1e3:13.2f} {set_based_s * 1e3:15.2f} "
+                f"{set_based_s / reindex_s:7.0f}x"
+            )
+
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import time
+from typing import Dict, List, Sequence
+import numpy as np
+import pandas as pd
+from pyomo.environ import SolverFactory
+from pyomo.core import *
+from pyomo.opt import TerminationCondition
+from pymfm.control.algorithms import optimization_based as OptB
+from pymfm.control.utils.data_input import Bulk
+from pymfm.control.utils.feasibility import screen_feasibility
+from pymfm.control.utils.solver_resources import solver_options
+
+# Battery specifications which can be swept, in the units of BatterySpecs
+SWEEP_PARAMETERS = ("bat_capacity_kWh", "P_ch_max_kW", "P_dis_max_kW")
+
+# Scheduling inputs and reusable model of a sweep worker process
+_worker = {}
+
+
+def sweep(
+    P_load_gen: pd.DataFrame,
+    df_battery: pd.DataFrame,
+    day_end: datetime,
+    bulk_data: Bulk,
+    P_net_after_kW_limits: pd.DataFrame,
+    pv_curtailment: bool,
+    grid: Dict[str, Sequence[float]],
+    bat_id: str = None,
+    n_workers: int = 1,
+) -> pd.DataFrame:
+    """Battery sizing sweep: scheduling optimization over a grid of candidate battery sizes for
+    the same forecast.
+
+    The optimization model is built only once per worker process, with the battery capacities and
+    maximum powers as mutable parameters (see optimization_based.build_model), and re-solved for
+    every candidate of the grid. The candidates are visited in serpentine order, so that every
+    worker process solves a contiguous run of neighbouring candidates, each one warm-started from
+    the solution of the previous one. Candidates which are provably infeasible
+    (see feasibility.screen_feasibility) are reported without being solved.
+
+    Parameters
+    ----------
+    P_load_gen : pd.DataFrame
+        load and generation forecast time series of float type.
+    df_battery : pd.DataFrame
+        battery specifications of float and string types.
+    day_end : datetime
+        user-defined end of the day (datetime) till which household batteries should reach
+        maximum SoC.
+    bulk_data : Bulk
+        Class related to the bulk delivery/reception of energy from batteries including bulk_start
+        and _end datetime and the bulk_energy_kWh float.
+    P_net_after_kW_limits : pd.DataFrame
+        consisiting of upper and lower bound float time series (kW) and
+        the identifiers for the existance of any upper or lower bounds.
+    pv_curtailment : bool
+        If true, PV generation can be curtailed.
+    grid : Dict[str, Sequence[float]]
+        candidate values of the swept battery specifications (see SWEEP_PARAMETERS), e.g.
+        {"bat_capacity_kWh": [100, 200], "P_ch_max_kW": [50, 100]}. All their combinations are
+        evaluated.
+    bat_id : str, optional
+        identifier of the sized battery, by default None (only allowed for a single battery)
+    n_workers : int, optional
+        number of worker processes, by default 1 (the sweep runs in the calling process)
+
+    Returns
+    -------
+    pd.DataFrame
+        one row per candidate, indexed by the swept parameters, with the "objective", the peak
+        import/export "alpha_imp_kW"/"alpha_exp_kW", the imported/exported energy
+        "E_imp_kWh"/"E_exp_kWh", the solver "status" and "termination_condition", the
+        "solve_time_s" and the "infeasibility_reasons" of screened out candidates.
+    """
+    unknown = set(grid) - set(SWEEP_PARAMETERS)
+    if not grid or unknown:
+        raise ValueError(
+            f"The sweep grid has to consist of {', '.join(SWEEP_PARAMETERS)}, "
+            f"it was {', '.join(grid) or 'empty'}."
+        )
+    if bat_id is None:
+        if len(df_battery) != 1:
+            raise ValueError("bat_id is required for sizing one of multiple batteries.")
+        bat_id = df_battery.index[0]
+    elif bat_id not in df_battery.index:
+        raise ValueError(f"There is no battery {bat_id} in the battery specifications.")
+
+    names = list(grid)
+    candidates = _serpentine([list(grid[name]) for name in names])
+    chunks = [
+        [dict(zip(names, candidate)) for candidate in chunk]
+        for chunk in np.array_split(np.array(candidates, dtype=float), max(n_workers, 1))
+        if len(chunk)
+    ]
+    inputs = (
+        P_load_gen,
+        df_battery,
+        day_end,
+        bulk_data,
+        P_net_after_kW_limits,
+        pv_curtailment,
+        bat_id,
+    )
+
+    print(
+        f"Sweeping {len(candidates)} battery sizes of battery {bat_id} "
+        f"in {len(chunks)} worker process(es)."
+    )
+
+    if len(chunks) == 1:
+        _init_worker(*inputs)
+        rows = _solve_chunk(chunks[0])
+    else:
+        with ProcessPoolExecutor(
+            max_workers=len(chunks), initializer=_init_worker, initargs=inputs
+        ) as executor:
+            rows = [row for chunk in executor.map(_solve_chunk, chunks) for row in chunk]
+
+    results = pd.DataFrame(rows).set_index(names).sort_index()
+    print("Battery sizing sweep finished.")
+    return results
+
+
+def _serpentine(values: List[list]) -> List[tuple]:
+    """All combinations of the given values, ordered such that consecutive combinations differ
+    in a single (the fastest varying) parameter only, by one step of its values."""
+    if len(values) == 1:
+        return [(value,) for value in values[0]]
+    combinations = []
+    for i, first in enumerate(values[0]):
+        rest = _serpentine(values[1:])
+        combinations += [(first, *combination) for combination in (rest[::-1] if i % 2 else rest)]
+    return combinations
+
+
+def _init_worker(
+    P_load_gen, df_battery, day_end, bulk_data, P_net_after_kW_limits, pv_curtailment, bat_id
+):
+    """Build the sweep model of a worker process once."""
+    _worker.update(
+        inputs=(P_load_gen, day_end, bulk_data, P_net_after_kW_limits, pv_curtailment),
+        df_battery=df_battery.copy(),
+        bat_id=bat_id,
+        model=OptB.build_model(
+            P_load_gen,
+            df_battery,
+            day_end,
+            bulk_data,
+            P_net_after_kW_limits,
+            pv_curtailment,
+            mutable_sizing=True,
+        ),
+        solver=SolverFactory(OptB.SOLVER_NAME),
+        warm=False,
+    )
+
+
+def _solve_chunk(chunk: List[dict]) -> List[dict]:
+    """Solve the candidates of a run of neighbouring candidates one after the other on the model
+    of the worker process, each one warm-started from the previous solution."""
+    model = _worker["model"]
+    df_battery = _worker["df_battery"]
+    bat_id = _worker["bat_id"]
+    P_load_gen, day_end, bulk_data, P_net_after_kW_limits, pv_curtailment = _worker["inputs"]
+    rows = []
+    for candidate in chunk:
+        row = dict(candidate)
+        if "bat_capacity_kWh" in candidate:
+            df_battery.loc[bat_id, "bat_capacity_kWs"] = candidate["bat_capacity_kWh"] * 3600
+            model.bat_capacity_kWs[bat_id] = candidate["bat_capacity_kWh"] * 3600
+        if "P_ch_max_kW" in candidate:
+            df_battery.loc[bat_id, "P_ch_max_kW"] = candidate["P_ch_max_kW"]
+            model.P_ch_bat_max_kW[bat_id] = candidate["P_ch_max_kW"]
+        if "P_dis_max_kW" in candidate:
+            df_battery.loc[bat_id, "P_dis_max_kW"] = candidate["P_dis_max_kW"]
+            model.P_dis_bat_max_kW[bat_id] = candidate["P_dis_max_kW"]
+
+        reasons = screen_feasibility(
+            P_load_gen,
+            df_battery,
+            day_end,
+            bulk_data,
+            P_net_after_kW_limits,
+            pv_curtailment,
+        )
+        if reasons:
+            row.update(
+                _metrics(None),
+                status=None,
+                termination_condition=str(TerminationCondition.infeasible),
+                solve_time_s=0.0,
+                infeasibility_reasons=" ".join(reasons),
+            )
+            rows.append(row)
+            continue
+
+        start = time.perf_counter()
+        results = _worker["solver"].solve(
+            model,
+            warmstart=_worker["warm"],
+            load_solutions=False,
+            options=solver_options(OptB.SOLVER_NAME),
+        )
+        solve_time_s = time.perf_counter() - start
+        solved = results.solver.termination_condition == TerminationCondition.optimal
+        if solved:
+            model.solutions.load_from(results)
+            # The next candidate starts from this solution
+            _worker["warm"] = True
+        row.update(
+            _metrics(model if solved else None),
+            status=str(results.solver.status),
+            termination_condition=str(results.solver.termination_condition),
+            solve_time_s=solve_time_s,
+            infeasibility_reasons=None,
+        )
+        rows.append(row)
+    return rows
+
+
+def _metrics(model) -> dict:
+    """Schedule metrics of a solved sweep model (not a number without a solution)."""
+    if model is None:
+        return dict.fromkeys(
+            ("objective", "alpha_imp_kW", "alpha_exp_kW", "E_imp_kWh", "E_exp_kWh"), np.nan
+        )
+    dT_h = model.dT_s / 3600
+    return {
+        "objective": value(model.obj),
+        "alpha_imp_kW": value(model.alpha_imp),
+        "alpha_exp_kW": value(model.alpha_exp),
+        "E_imp_kWh": sum(
+            value(model.P_imp_kW[t] * model.x_imp[t]) * dT_h[t] for t in model.T
+        ),
+        "E_exp_kWh": sum(
+            value(model.P_exp_kW[t] * model.x_exp[t]) * dT_h[t] for t in model.T
+        ),
+    }
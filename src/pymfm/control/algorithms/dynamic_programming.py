@@ -0,0 +1,697 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from pymfm.control.utils.data_input import Bulk
+
+# Number of SoC grid points between min_SoC and max_SoC
+GRID_POINTS = 501
+# Number of SoC grid points of the coarser grid on which the peak caps are searched
+PEAK_GRID_POINTS = 31
+# Caps per peak (import/export) in every round of the peak cap search, 0 disables the search
+PEAK_CAPS = 7
+# Rounds of the peak cap search, each one on a finer grid of caps around the best caps so far
+PEAK_SEARCH_ROUNDS = 3
+# Numerical tolerance (kW, kWs)
+TOLERANCE = 1e-6
+
+
+@dataclass
+class _Problem:
+    """Single-battery scheduling problem as arrays over the time steps (energy in kWs)."""
+
+    dt_s: float
+    P_net_before_kW: np.ndarray
+    lower_bound_kW: np.ndarray
+    upper_limit_kW: np.ndarray
+    curtailment_kW: np.ndarray
+    energy_min_kWs: np.ndarray
+    energy_max_kWs: np.ndarray
+    ch_eff: float
+    dis_eff: float
+    capacity_kWs: float
+    min_SoC: float
+    max_SoC: float
+    initial_SoC: float
+    SoC_grid: np.ndarray
+    offsets: np.ndarray
+    target_position: Optional[int]
+    target_SoC: Optional[float]
+
+
+@dataclass
+class _Value:
+    """Value functions of the cap pairs at a SoC horizon position: at the grid points (cap pairs x
+    grid points, infinite outside of the feasible SoC interval), the feasible SoC interval (cap
+    pairs x 2, inf and -inf if empty) and the nodes of the interpolation, one more on both ends
+    of the grid (cap pairs x grid points + 2)."""
+
+    grid: np.ndarray
+    edges_SoC: np.ndarray
+    nodes: np.ndarray
+
+
+def scheduling(
+    P_load_gen: pd.DataFrame,
+    df_battery: pd.DataFrame,
+    day_end: datetime,
+    bulk_data: Bulk,
+    P_net_after_kW_limits: pd.DataFrame,
+    pv_curtailment: bool,
+    grid_points: int = GRID_POINTS,
+    peak_caps: int = PEAK_CAPS,
+) -> Tuple[
+    pd.Series,
+    pd.DataFrame,
+    pd.Series,
+    pd.DataFrame,
+    pd.Series,
+    pd.Series,
+    pd.Series,
+    dict,
+]:
+    """Schedule a single battery by backward dynamic programming over a discretized SoC grid.
+
+    The schedule follows the optimization-based control model (same power balance, deficit and
+    surplus cases, P_net_after_kW bounds, power limits, efficiencies and final SoC) and its objective
+    (sum of the grid exchange plus its import and export peaks), without an optimization solver.
+    The value function is computed for all SoC grid points at once with NumPy, so that one pass
+    takes O(T x grid_points x power steps). Between the grid points, it is interpolated linearly
+    (and only where both neighbours are feasible), which lets the schedule leave the grid where
+    the bounds or the final SoC require an exact battery power: the bounds and the final SoC are
+    met exactly and the grid resolution only affects the optimality (see discretization_error).
+
+    The import/export peaks are not separable in time and are not part of the state. For given
+    import and export caps, one pass minimizes the grid exchange, and the objective is at most
+    its value plus both caps (with equality for the peaks of the optimal schedule). The caps are
+    therefore searched on a grid of peak_caps x peak_caps cap pairs, refined around the best pair
+    in each of the PEAK_SEARCH_ROUNDS rounds, with all pairs of a round evaluated by one pass
+    vectorized over the pairs on a coarser grid of PEAK_GRID_POINTS SoC points. As the power
+    steps scale with the grid points, the scheduling takes
+    O(T x (PEAK_SEARCH_ROUNDS x peak_caps^2 x PEAK_GRID_POINTS^2 + grid_points^2)) operations.
+    The caps are optimal up to the spacing of the cap grid in the last round,
+    discretization_error measures the overall gap to the MILP optimum.
+
+    Parameters
+    ----------
+    P_load_gen : pd.DataFrame
+        load and generation forecast time series of float type.
+    df_battery : pd.DataFrame
+        battery specifications of float and string types, with a single battery.
+    day_end : datetime
+        end of the day till which a household battery should reach maximum SoC.
+    bulk_data : Bulk
+        bulk delivery/reception of energy, not supported by dynamic programming (must be None).
+    P_net_after_kW_limits : pd.DataFrame
+        consisiting of upper and lower bound float time series (kW) and
+        the identifiers for the existance of any upper or lower bounds.
+    pv_curtailment : bool
+        If true, PV generation can be curtailed.
+    grid_points : int, optional
+        number of SoC grid points between min_SoC and max_SoC, by default GRID_POINTS
+    peak_caps : int, optional
+        caps per peak in every round of the peak cap search (0 disables it), by default PEAK_CAPS
+
+    Returns
+    -------
+    Tuple[ pd.Series, pd.DataFrame, pd.Series, pd.DataFrame, pd.Series, pd.Series, pd.Series, dict, ]
+        pv_profile, P_bat_kW_df, P_bat_total_kW, SoC_bat_df, P_net_after_kW, upper_bound and
+        lower_bound as returned by optimization_based.post_process, and a dictionary with the
+        "objective" value and the "SoC_resolution_%" of the grid.
+    """
+    if len(df_battery) != 1:
+        raise RuntimeError(
+            "Dynamic programming control cannot deal with multiple flex nodes."
+        )
+    if bulk_data is not None:
+        raise RuntimeError(
+            "Dynamic programming control cannot deal with bulk energy, "
+            "use the optimization-based control instead."
+        )
+    battery = df_battery.iloc[0]
+    bat_id = df_battery.index[0]
+
+    # Time horizons (as in the optimization model)
+    index = P_load_gen.index
+    delta_T = pd.to_timedelta(index.freq)
+    dt_s = delta_T.total_seconds()
+    sof_horizon = pd.date_range(
+        index[0], index[-1] + delta_T, freq=delta_T, inclusive="both"
+    )
+    generation = P_load_gen.P_gen_kW.to_numpy(float)
+    P_net_before_kW = P_load_gen.P_load_kW.to_numpy(float) - generation
+    limits = P_net_after_kW_limits.reindex(index)
+    upper_bound = np.where(
+        limits.with_upper_bound.fillna(False).to_numpy(bool),
+        limits.upper_bound.to_numpy(float),
+        np.inf,
+    )
+    lower_bound = np.where(
+        limits.with_lower_bound.fillna(False).to_numpy(bool),
+        limits.lower_bound.to_numpy(float),
+        -np.inf,
+    )
+
+    # Change of the stored energy in every time step: charging only from the surplus and not
+    # more than the surplus, a household battery is never discharged
+    energy_max_kWs = (
+        np.where(
+            P_net_before_kW < 0,
+            np.minimum(battery.P_ch_max_kW / battery.ch_efficiency, -P_net_before_kW),
+            0.0,
+        )
+        * dt_s
+    )
+    energy_min_kWs = np.full(
+        len(index),
+        0.0
+        if battery.bat_type == "hbes"
+        else -battery.P_dis_max_kW * battery.dis_efficiency * dt_s,
+    )
+    SoC_grid, offsets = _grid(battery, grid_points, energy_min_kWs, energy_max_kWs)
+
+    # Final SoC target at its SoC horizon position
+    target_position, target_SoC = None, None
+    if not pd.isna(battery.final_SoC):
+        if battery.bat_type == "hbes":
+            # Household battery should reach its maximum SoC at the end of the day
+            target_SoC = battery.max_SoC
+            target_position = sof_horizon.get_indexer([day_end])[0]
+            if target_position < 0:
+                raise RuntimeError(
+                    f"day_end {day_end} is not within the scheduling horizon."
+                )
+        else:
+            target_SoC, target_position = battery.final_SoC, len(index) - 1
+
+    problem = _Problem(
+        dt_s=dt_s,
+        P_net_before_kW=P_net_before_kW,
+        lower_bound_kW=lower_bound,
+        # No import beyond the deficit, no import at all in case of surplus
+        upper_limit_kW=np.minimum(upper_bound, np.maximum(P_net_before_kW, 0.0)),
+        curtailment_kW=generation if pv_curtailment else np.zeros_like(generation),
+        energy_min_kWs=energy_min_kWs,
+        energy_max_kWs=energy_max_kWs,
+        ch_eff=battery.ch_efficiency,
+        dis_eff=battery.dis_efficiency,
+        capacity_kWs=battery.bat_capacity_kWs,
+        min_SoC=battery.min_SoC,
+        max_SoC=battery.max_SoC,
+        initial_SoC=battery.initial_SoC,
+        SoC_grid=SoC_grid,
+        offsets=offsets,
+        target_position=target_position,
+        target_SoC=target_SoC,
+    )
+
+    # Peak caps searched on the coarser grid between zero and the peaks without caps
+    caps = (np.inf, np.inf)
+    if peak_caps > 0:
+        coarse_grid, coarse_offsets = _grid(
+            battery, min(grid_points, PEAK_GRID_POINTS), energy_min_kWs, energy_max_kWs
+        )
+        coarse = replace(problem, SoC_grid=coarse_grid, offsets=coarse_offsets)
+        uncapped = _solve(coarse, np.inf, np.inf)
+        if uncapped is not None:
+            caps = _peak_caps(coarse, uncapped[0], peak_caps)
+    best = _solve(problem, *caps)
+    if best is None and caps != (np.inf, np.inf):
+        best = _solve(problem, np.inf, np.inf)
+    if best is None:
+        raise RuntimeError(
+            "Dynamic programming found no feasible schedule on the SoC grid, "
+            "the input might be infeasible."
+        )
+    schedule, SoC, energy_kWs, objective_value = best
+
+    # Results in the format of the optimization-based control
+    P_ch_kW = np.maximum(energy_kWs, 0.0) * battery.ch_efficiency / dt_s
+    P_dis_kW = np.maximum(-energy_kWs, 0.0) / battery.dis_efficiency / dt_s
+    P_bat_kW = -P_dis_kW / battery.dis_efficiency + P_ch_kW * battery.ch_efficiency
+    # PV is curtailed by the part of P_net_after_kW not explained by the battery
+    PV_profile = pd.Series(
+        generation - (schedule - (P_net_before_kW + P_ch_kW - P_dis_kW)), index=index
+    )
+    P_bat_kW_df = pd.DataFrame({bat_id: P_bat_kW}, index=index, columns=df_battery.index)
+    P_bat_total_kW = pd.Series(P_bat_kW, index=index)
+    SoC_bat_df = pd.DataFrame({bat_id: SoC}, index=sof_horizon, columns=df_battery.index)
+    P_net_after_kW = pd.Series(schedule, index=index)
+    upper_bound_kW = pd.Series(
+        np.where(np.isinf(upper_bound), np.nan, upper_bound), index=index
+    )
+    lower_bound_kW = pd.Series(
+        np.where(np.isinf(lower_bound), np.nan, lower_bound), index=index
+    )
+    SoC_step = (battery.max_SoC - battery.min_SoC) / (grid_points - 1)
+    info = {"objective": objective_value, "SoC_resolution_%": SoC_step * 100}
+
+    return (
+        PV_profile,
+        P_bat_kW_df,
+        P_bat_total_kW,
+        SoC_bat_df,
+        P_net_after_kW,
+        upper_bound_kW,
+        lower_bound_kW,
+        info,
+    )
+
+
+def _grid(battery: pd.Series, grid_points: int, energy_min_kWs, energy_max_kWs):
+    """SoC grid anchored at the initial SoC and the offsets between its grid points of the changes
+    of the stored energy landing on the grid."""
+    SoC_step = (battery.max_SoC - battery.min_SoC) / (grid_points - 1)
+    steps_below = int(np.floor((battery.initial_SoC - battery.min_SoC) / SoC_step + 1e-6))
+    steps_above = int(np.floor((battery.max_SoC - battery.initial_SoC) / SoC_step + 1e-6))
+    SoC_grid = battery.initial_SoC + SoC_step * np.arange(-steps_below, steps_above + 1)
+    energy_step_kWs = SoC_step * battery.bat_capacity_kWs
+    offsets = np.arange(
+        -int(np.floor(-energy_min_kWs.min() / energy_step_kWs)),
+        int(np.floor(energy_max_kWs.max() / energy_step_kWs)) + 1,
+    )
+    return SoC_grid, offsets
+
+
+def _battery_power(problem: _Problem, energy_kWs):
+    """Battery power in the power balance (charging positive) for a change of the stored energy."""
+    return (
+        np.where(energy_kWs >= 0, energy_kWs * problem.ch_eff, energy_kWs / problem.dis_eff)
+        / problem.dt_s
+    )
+
+
+def _battery_energy(problem: _Problem, power_kW):
+    """Change of the stored energy for a battery power in the power balance (charging positive)."""
+    return (
+        np.where(power_kW >= 0, power_kW / problem.ch_eff, power_kW * problem.dis_eff)
+        * problem.dt_s
+    )
+
+
+def _exchange(problem: _Problem, k, energy_kWs, import_cap, export_cap):
+    """Best P_net_after_kW (closest to zero) in time step(s) k for changes of the stored energy,
+    and whether the changes are feasible at all."""
+    P_battery_kW = problem.P_net_before_kW[k] + _battery_power(problem, energy_kWs)
+    low = np.maximum(np.maximum(P_battery_kW, problem.lower_bound_kW[k]), -export_cap)
+    high = np.minimum(
+        np.minimum(P_battery_kW + problem.curtailment_kW[k], problem.upper_limit_kW[k]),
+        import_cap,
+    )
+    feasible = (
+        (energy_kWs >= problem.energy_min_kWs[k] - TOLERANCE)
+        & (energy_kWs <= problem.energy_max_kWs[k] + TOLERANCE)
+        & (low <= high + TOLERANCE)
+    )
+    return np.clip(0.0, low, high), feasible
+
+
+def _energy_candidates(problem: _Problem, import_cap, export_cap):
+    """Changes of the stored energy off the grid worth trying in every time step: both ends of the
+    feasible range (the battery power is monotone in the energy, so that the range is an interval)
+    and the change closest to compensating P_net_before_kW (time steps x 3, NaN if infeasible,
+    with a leading axis of cap pairs for caps of shape (cap pairs, 1))."""
+    P_low_kW = np.maximum(problem.lower_bound_kW, -export_cap)
+    P_high_kW = np.minimum(problem.upper_limit_kW, import_cap)
+    energy_low = np.maximum(
+        problem.energy_min_kWs,
+        _battery_energy(
+            problem, P_low_kW - problem.P_net_before_kW - problem.curtailment_kW
+        ),
+    )
+    energy_high = np.minimum(
+        problem.energy_max_kWs,
+        _battery_energy(problem, P_high_kW - problem.P_net_before_kW),
+    )
+    energy_zero = np.clip(
+        _battery_energy(problem, -problem.P_net_before_kW), energy_low, energy_high
+    )
+    candidates = np.stack([energy_low, energy_high, energy_zero], axis=-1)
+    feasible = (energy_low <= energy_high + TOLERANCE) & (
+        P_low_kW <= P_high_kW + TOLERANCE
+    )
+    return np.where(feasible[..., None], candidates, np.nan)
+
+
+def _value(problem: _Problem, grid_value, edges_SoC, edges_value) -> _Value:
+    """Value functions from their values at the grid points and at the edges of the feasible SoC
+    interval. The nodes next to the edges extend the lines from the edges to the next inner grid
+    points (or the line through both edges within a single cell), so that the interpolation
+    between the nodes meets the values at the edges."""
+    grid = problem.SoC_grid
+    step = grid[1] - grid[0]
+    nodes = np.pad(grid_value, ((0, 0), (1, 1)), constant_values=np.inf)
+    rows = np.flatnonzero(edges_SoC[:, 0] <= edges_SoC[:, 1])
+    low, high = edges_SoC[rows].T
+    low_value, high_value = edges_value[rows].T
+    # Node i is at the SoC grid[0] + (i - 1) x step, the edges are in the cells left to left + 1
+    # and right - 1 to right
+    left = np.clip(np.floor((low - grid[0]) / step).astype(int) + 1, 0, len(grid))
+    right = np.clip(
+        np.ceil((high - grid[0]) / step).astype(int) + 1, left + 1, len(grid) + 1
+    )
+    left_SoC, right_SoC = grid[0] + step * (left - 1), grid[0] + step * (right - 1)
+    single = right == left + 1
+    left_to_SoC = np.where(single, high, left_SoC + step)
+    left_to_value = np.where(single, high_value, nodes[rows, left + 1])
+    right_from_SoC = np.where(single, low, right_SoC - step)
+    right_from_value = np.where(single, low_value, nodes[rows, right - 1])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        left_slope = np.where(
+            left_to_SoC - low > 1e-12,
+            (left_to_value - low_value) / (left_to_SoC - low),
+            0.0,
+        )
+        right_slope = np.where(
+            high - right_from_SoC > 1e-12,
+            (high_value - right_from_value) / (high - right_from_SoC),
+            0.0,
+        )
+        nodes[rows, left] = low_value + left_slope * (left_SoC - low)
+        nodes[rows, right] = high_value + right_slope * (right_SoC - high)
+    return _Value(grid_value, edges_SoC, np.where(np.isnan(nodes), np.inf, nodes))
+
+
+def _interpolate(problem: _Problem, value: _Value, SoC):
+    """Value functions at the SoC of every cap pair (cap pairs x SoC, or 1 x SoC for the same SoC
+    for all of them): linear between the nodes and infinite outside of the feasible SoC
+    interval."""
+    grid = problem.SoC_grid
+    SoC = np.broadcast_to(np.asarray(SoC, dtype=float), (len(value.nodes), np.shape(SoC)[1]))
+    low, high = value.edges_SoC[:, :1], value.edges_SoC[:, 1:]
+    inside = (SoC >= low - 1e-9) & (SoC <= high + 1e-9)
+    SoC = np.where(inside, np.minimum(np.maximum(SoC, low), high), grid[0])
+    # Within the interval, the position is between the first and the last node
+    position = (SoC - grid[0]) / (grid[1] - grid[0]) + 1
+    lower = np.minimum(np.maximum(position.astype(int), 0), len(grid))
+    fraction = position - lower
+    lower += np.arange(len(SoC))[:, None] * value.nodes.shape[1]
+    value_lower = value.nodes.ravel()[lower]
+    value_upper = value.nodes.ravel()[lower + 1]
+    # The upper node is only infinite (outside of the interval) without a fraction
+    with np.errstate(invalid="ignore"):
+        interpolated = np.where(
+            fraction > 0, value_lower + fraction * (value_upper - value_lower), value_lower
+        )
+    return np.where(inside, interpolated, np.inf)
+
+
+def _costs(problem: _Problem, k, value: _Value, SoC, energy_kWs, import_caps, export_caps):
+    """Grid exchange in time step k plus the value after it for changes of the stored energy
+    (cap pairs x states x changes, NaN if not to be tried) from the SoC (cap pairs x states)."""
+    found = ~np.isnan(energy_kWs)
+    energy_kWs = np.where(found, energy_kWs, 0.0)
+    P_kW, feasible = _exchange(
+        problem, k, energy_kWs, import_caps[:, :, None], export_caps[:, :, None]
+    )
+    next_SoC = SoC[:, :, None] + energy_kWs / problem.capacity_kWs
+    next_value = _interpolate(problem, value, next_SoC.reshape(len(next_SoC), -1))
+    return np.where(found & feasible, np.abs(P_kW), np.inf) + next_value.reshape(
+        next_SoC.shape
+    )
+
+
+# The edges of empty feasible intervals (inf) give NaN changes and SoC, which are infeasible
+@np.errstate(invalid="ignore")
+def _backward(problem: _Problem, import_caps, export_caps, all_positions=True):
+    """Backward pass for several pairs of import/export caps at once. Returns the value functions
+    at every SoC horizon position, or only at the first one."""
+    n_steps = len(problem.P_net_before_kW)
+    grid = problem.SoC_grid
+    n_states, n_actions = len(grid), len(problem.offsets)
+    max_down = -problem.offsets[0]
+    energy_step_kWs = (grid[1] - grid[0]) * problem.capacity_kWs
+    import_caps = np.asarray(import_caps, dtype=float)[:, None]
+    export_caps = np.asarray(export_caps, dtype=float)[:, None]
+    n_caps = len(import_caps)
+    off_grid = _energy_candidates(problem, import_caps, export_caps)
+
+    # Stage cost of the actions landing on the grid: grid exchange |P_net_after_kW|
+    P_grid_kW, feasible = _exchange(
+        problem,
+        np.arange(n_steps)[None, :, None],
+        (problem.offsets * energy_step_kWs)[None, None, :],
+        import_caps[:, :, None],
+        export_caps[:, :, None],
+    )
+    stage_cost = np.where(feasible, np.abs(P_grid_kW), np.inf)
+
+    value = _value(
+        problem,
+        np.zeros((n_caps, n_states)),
+        np.tile([problem.min_SoC, problem.max_SoC], (n_caps, 1)),
+        np.zeros((n_caps, 2)),
+    )
+    values = [value]
+    padded = np.full((n_caps, n_states + n_actions - 1), np.inf)
+    # Window i of the padded values holds the grid points i + offsets
+    windows = sliding_window_view(padded, n_actions, axis=1)
+    for k in range(n_steps - 1, -1, -1):
+        # Feasible SoC interval: the SoC from which the next feasible interval can be reached by
+        # a feasible change of the stored energy (an interval, as these changes are one)
+        next_SoC = value.edges_SoC
+        if k + 1 == problem.target_position:
+            reachable = np.isfinite(_interpolate(problem, value, [[problem.target_SoC]]))
+            next_SoC = np.where(reachable, problem.target_SoC, [[np.inf, -np.inf]])
+        energy_range = off_grid[:, k, :2] / problem.capacity_kWs
+        edges_SoC = np.stack(
+            [
+                np.maximum(next_SoC[:, 0] - energy_range[:, 1], problem.min_SoC),
+                np.minimum(next_SoC[:, 1] - energy_range[:, 0], problem.max_SoC),
+            ],
+            axis=1,
+        )
+        empty = (
+            np.isnan(edges_SoC).any(axis=1)
+            | (next_SoC[:, 0] > next_SoC[:, 1])
+            | (edges_SoC[:, 0] > edges_SoC[:, 1] + 1e-9)
+        )
+        # Intervals empty within the tolerance hold a single SoC
+        edges_SoC[:, 1] = np.maximum(edges_SoC[:, 1], edges_SoC[:, 0])
+        edges_SoC[empty] = [np.inf, -np.inf]
+        states = np.concatenate([np.broadcast_to(grid, (n_caps, n_states)), edges_SoC], axis=1)
+
+        if k + 1 == problem.target_position:
+            # Exactly the final SoC has to be reached
+            energy_kWs = (problem.target_SoC - states) * problem.capacity_kWs
+            state_value = _costs(
+                problem, k, value, states, energy_kWs[:, :, None], import_caps, export_caps
+            )[:, :, 0]
+        else:
+            # Off-grid actions: the ones of the time step and the ones towards the edges of the
+            # next feasible interval
+            towards_edges = np.clip(
+                (next_SoC[:, None, :] - states[:, :, None]) * problem.capacity_kWs,
+                off_grid[:, k, None, :1],
+                off_grid[:, k, None, 1:2],
+            )
+            energy_kWs = np.concatenate(
+                [
+                    np.broadcast_to(off_grid[:, k, None, :], (n_caps, n_states + 2, 3)),
+                    towards_edges,
+                ],
+                axis=2,
+            )
+            state_value = np.min(
+                _costs(problem, k, value, states, energy_kWs, import_caps, export_caps),
+                axis=2,
+            )
+            padded[:, max_down : max_down + n_states] = value.grid
+            state_value[:, :n_states] = np.minimum(
+                state_value[:, :n_states],
+                np.min(windows + stage_cost[:, k, None, :], axis=2),
+            )
+        value = _value(
+            problem, state_value[:, :n_states], edges_SoC, state_value[:, n_states:]
+        )
+        if all_positions:
+            values.append(value)
+    return values[::-1] if all_positions else value
+
+
+def _solve(problem: _Problem, import_cap, export_cap):
+    """Backward pass and forward pass from the initial SoC for given import/export caps. Returns
+    the P_net_after_kW schedule, the SoC, the stored energy changes and the objective value, or
+    None if no feasible schedule has been found."""
+    n_steps = len(problem.P_net_before_kW)
+    grid = problem.SoC_grid
+    caps = np.array([[import_cap]], dtype=float), np.array([[export_cap]], dtype=float)
+    off_grid = _energy_candidates(problem, import_cap, export_cap)
+    value = _backward(problem, [import_cap], [export_cap])
+    if not np.isfinite(_interpolate(problem, value[0], [[problem.initial_SoC]])[0, 0]):
+        return None
+
+    # Forward pass from the exact initial SoC with the same actions
+    SoC = np.empty(n_steps + 1)
+    SoC[0] = problem.initial_SoC
+    energy_kWs = np.empty(n_steps)
+    schedule = np.empty(n_steps)
+    for k in range(n_steps):
+        if k + 1 == problem.target_position:
+            candidates = np.array([(problem.target_SoC - SoC[k]) * problem.capacity_kWs])
+        else:
+            candidates = np.concatenate(
+                [
+                    (grid - SoC[k]) * problem.capacity_kWs,
+                    off_grid[k],
+                    np.clip(
+                        (value[k + 1].edges_SoC[0] - SoC[k]) * problem.capacity_kWs,
+                        off_grid[k, 0],
+                        off_grid[k, 1],
+                    ),
+                ]
+            )
+        total = _costs(
+            problem, k, value[k + 1], np.array([[SoC[k]]]), candidates[None, None, :], *caps
+        )[0, 0]
+        action = int(np.argmin(total))
+        if not np.isfinite(total[action]):
+            return None
+        energy_kWs[k] = candidates[action]
+        schedule[k] = _exchange(problem, k, energy_kWs[k], import_cap, export_cap)[0]
+        SoC[k + 1] = SoC[k] + energy_kWs[k] / problem.capacity_kWs
+    return schedule, SoC, energy_kWs, objective(schedule)
+
+
+def _peak_caps(problem: _Problem, schedule, n_caps):
+    """Import and export caps minimizing the grid exchange plus both caps, an upper bound of the
+    objective. The caps are searched on a grid between zero and the peaks of the uncapped
+    schedule, refined around the best pair in every round, with one backward pass per round."""
+    bounds = [(0.0, max(np.max(schedule), 0.0)), (0.0, max(np.max(-schedule), 0.0))]
+    best = (np.inf, np.inf)
+    for _ in range(PEAK_SEARCH_ROUNDS):
+        import_caps, export_caps = (np.linspace(low, high, n_caps) for low, high in bounds)
+        import_pairs, export_pairs = (
+            pairs.ravel() for pairs in np.meshgrid(import_caps, export_caps, indexing="ij")
+        )
+        value = _backward(problem, import_pairs, export_pairs, all_positions=False)
+        total = (
+            _interpolate(problem, value, [[problem.initial_SoC]])[:, 0]
+            + import_pairs
+            + export_pairs
+        )
+        pair = int(np.argmin(total))
+        if not np.isfinite(total[pair]):
+            break
+        best = (import_pairs[pair], export_pairs[pair])
+        # The next round searches between the neighbouring caps of the best pair
+        bounds = [
+            (caps[max(i - 1, 0)], caps[min(i + 1, n_caps - 1)])
+            for caps, i in zip(
+                (import_caps, export_caps), np.unravel_index(pair, (n_caps, n_caps))
+            )
+        ]
+    return best
+
+
+def objective(P_net_after_kW) -> float:
+    """Objective of the optimization-based control for a schedule: the grid exchange
+    (sum of import and export) plus the import and export peaks.
+
+    Parameters
+    ----------
+    P_net_after_kW : array-like
+        net power after control (import positive, export negative) in kW.
+
+    Returns
+    -------
+    float
+        the objective value.
+    """
+    P_net_after_kW = np.asarray(P_net_after_kW, dtype=float)
+    return float(
+        np.abs(P_net_after_kW).sum()
+        + max(np.max(P_net_after_kW, initial=0.0), 0.0)
+        + max(np.max(-P_net_after_kW, initial=0.0), 0.0)
+    )
+
+
+def discretization_error(
+    P_load_gen: pd.DataFrame,
+    df_battery: pd.DataFrame,
+    day_end: datetime,
+    P_net_after_kW_limits: pd.DataFrame,
+    pv_curtailment: bool,
+    grid_points: int = GRID_POINTS,
+    info: dict = None,
+) -> dict:
+    """Discretization error of the dynamic programming schedule relative to the MILP optimum
+    of the optimization-based control (requires the optimization solver). Besides the SoC grid,
+    it includes the spacing of the peak caps searched.
+
+    Parameters
+    ----------
+    P_load_gen : pd.DataFrame
+        load and generation forecast time series of float type.
+    df_battery : pd.DataFrame
+        battery specifications of float and string types, with a single battery.
+    day_end : datetime
+        end of the day till which a household battery should reach maximum SoC.
+    P_net_after_kW_limits : pd.DataFrame
+        upper and lower bound float time series (kW) and the identifiers for their existance.
+    pv_curtailment : bool
+        If true, PV generation can be curtailed.
+    grid_points : int, optional
+        number of SoC grid points between min_SoC and max_SoC, by default GRID_POINTS
+    info : dict, optional
+        dictionary returned by scheduling for these inputs and grid_points, by default None
+        (scheduling is run)
+
+    Returns
+    -------
+    dict
+        "dp_objective" and "milp_objective" values, their "absolute_error" and "relative_error",
+        and the "SoC_resolution_%" of the grid.
+    """
+    # The solver is only needed for the comparison, dynamic programming itself is solver-free
+    from pyomo.core import value
+    from pymfm.control.algorithms import optimization_based as OptB
+
+    if info is None:
+        *_, info = scheduling(
+            P_load_gen,
+            df_battery,
+            day_end,
+            None,
+            P_net_after_kW_limits,
+            pv_curtailment,
+            grid_points=grid_points,
+        )
+    model = OptB.build_model(
+        P_load_gen, df_battery, day_end, None, P_net_after_kW_limits, pv_curtailment
+    )
+    OptB.solve(model)
+    milp_objective = value(model.obj)
+    absolute_error = info["objective"] - milp_objective
+    return {
+        "dp_objective": info["objective"],
+        "milp_objective": milp_objective,
+        "absolute_error": absolute_error,
+        "relative_error": absolute_error / milp_objective if milp_objective else 0.0,
+        "SoC_resolution_%": info["SoC_resolution_%"],
+    }
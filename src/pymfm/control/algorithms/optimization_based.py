@@ -22,16 +22,28 @@
 
 
 from datetime import datetime
-from typing import Tuple
+import threading
+from typing import Callable, Tuple
+import numpy as np
 import pandas as pd
-from typing import Tuple
 from pyomo.environ import SolverFactory
 from pyomo.core import *
 from pymfm.control.utils.data_input import Bulk
+from pymfm.control.utils.data_output import OutputColumns
+from pymfm.control.utils.solver_resources import solver_options
+from pymfm.control.utils.time_resolution import step_seconds
 from pyomo.opt import SolverStatus
 import pyomo.kernel as pmo
 
 
+# Selected optimization solver
+SOLVER_NAME = "gurobi"
+# SOLVER_NAME = "scip"
+
+# Objective penalty per kW (bounds), per kWh (final SoC, bulk energy) of violation in the elastic formulation
+ELASTIC_PENALTY = 1000.0
+
+
 # Constraints
 
 
@@ -56,16 +68,17 @@ def power_balance(model, t):
 def bat_charging(model, n, t):
     """
     The battery charging/discharging constraint.
-    Updates the state of charge (SoC) of the battery for the next timestamp t accordingly.
+    Updates the state of charge (SoC) of the battery for the next timestamp t accordingly,
+    over the duration of the time step t.
 
     :param model: The pyomo model.
     :param n: The battery index.
     :param t: The timestamp index.
     :return: The constraint itself.
     """
-    return model.SoC_bat[n, t + model.dT] == model.SoC_bat[n, t] + model.dT.seconds * (
+    return model.SoC_bat[n, model.next_t[t]] == model.SoC_bat[n, t] + model.dT_s[t] * (
         (model.P_ch_bat_kW[n, t] / model.ch_eff_bat[n]) / model.bat_capacity_kWs[n]
-    ) - model.dT.seconds * (
+    ) - model.dT_s[t] * (
         (model.P_dis_bat_kW[n, t] * model.dis_eff_bat[n]) / model.bat_capacity_kWs[n]
     )
 
@@ -92,7 +105,7 @@ def bat_max_ch_power(model, n, t):
     :param t: The timestamp index.
     :return: The constraint itself.
     """
-    return model.P_ch_bat_kW[n, t] <= float(model.P_ch_bat_max_kW[n]) * model.x_ch[n, t]
+    return model.P_ch_bat_kW[n, t] <= model.P_ch_bat_max_kW[n] * model.x_ch[n, t]
 
 
 def bat_max_dis_power(model, n, t):
@@ -106,7 +119,7 @@ def bat_max_dis_power(model, n, t):
     :return: The constraint itself.
     """
     return (
-        model.P_dis_bat_kW[n, t] <= float(model.P_dis_bat_max_kW[n]) * model.x_dis[n, t]
+        model.P_dis_bat_kW[n, t] <= model.P_dis_bat_max_kW[n] * model.x_dis[n, t]
     )
 
 
@@ -148,7 +161,9 @@ def P_net_after_kW_lower_bound(model, t):
     if model.with_lower_bound[t]:
         return (
             model.lower_bound_kW[t]
-            <= model.P_imp_kW[t] * model.x_imp[t] - model.P_exp_kW[t] * model.x_exp[t]
+            <= model.P_imp_kW[t] * model.x_imp[t]
+            - model.P_exp_kW[t] * model.x_exp[t]
+            + (model.lower_bound_slack_kW[t] if model.elastic else 0)
         )
     else:
         return Constraint.Feasible
@@ -165,7 +180,9 @@ def P_net_after_kW_upper_bound(model, t):
     """
     if model.with_upper_bound[t]:
         return (
-            model.P_imp_kW[t] * model.x_imp[t] - model.P_exp_kW[t] * model.x_exp[t]
+            model.P_imp_kW[t] * model.x_imp[t]
+            - model.P_exp_kW[t] * model.x_exp[t]
+            - (model.upper_bound_slack_kW[t] if model.elastic else 0)
             <= model.upper_bound_kW[t]
         )
     else:
@@ -183,11 +200,17 @@ def bat_final_SoC(model, n):
     :return: The constraint itself.
     """
     if model.final_SoC_bat[n] is not None:
+        # In the elastic formulation, the deviation from the final SoC is taken by the slack variables
+        slack = (
+            model.final_SoC_slack_pos[n] - model.final_SoC_slack_neg[n]
+            if model.elastic
+            else 0
+        )
         # Household battery should reach its maximum SoC at the end of the day (= either predefined or sunset)
         if model.bat_type[n] == "hbes":
-            return model.SoC_bat[n, model.day_end] == model.max_SoC_bat[n]
+            return model.SoC_bat[n, model.day_end] == model.max_SoC_bat[n] + slack
         else:
-            return model.SoC_bat[n, model.end_time] == model.final_SoC_bat[n]
+            return model.SoC_bat[n, model.end_time] == model.final_SoC_bat[n] + slack
     else:
         return Constraint.Feasible
 
@@ -207,12 +230,17 @@ def bulk_energy(model):
                     model.P_dis_bat_kW[n, t] * model.dis_eff_bat[n]
                     - (model.P_ch_bat_kW[n, t]) / model.ch_eff_bat[n]
                 )
-                * model.dT.seconds
+                * model.dT_s[t]
                 for t in model.T_bulk
             )
             for n in model.N
         )
         == -model.bulk_energy_kWs[0]
+        + (
+            model.bulk_energy_slack_kWs_pos - model.bulk_energy_slack_kWs_neg
+            if model.elastic
+            else 0
+        )
     )
 
 
@@ -371,50 +399,73 @@ def obj_rule(model):
     The objective function.
     Objective: Minimize the power exchange with the grid (Minimum interaction with the grid)
     Power import and export as well as their peak values (alpha) are minimized.
+    Time steps longer than the first one (see time_resolution) are weighted by their duration.
     :param model: The pyomo model.
     :return: The objective function itself.
     """
-    return (
+    objective = (
         sum(
-            model.P_exp_kW[t] * model.x_exp[t] + model.P_imp_kW[t] * model.x_imp[t]
+            (model.P_exp_kW[t] * model.x_exp[t] + model.P_imp_kW[t] * model.x_imp[t])
+            * (model.dT_s[t] / model.dT_s[model.start_time])
             for t in model.T
         )
         + model.alpha_exp
         + model.alpha_imp
     )
+    if model.elastic:
+        objective += model.violation_penalty * elastic_violation(model)
+    return objective
 
 
-def scheduling(
+def elastic_violation(model):
+    """
+    The total constraint violation of the elastic formulation.
+    Sum of the P_net_after_kW bound violations (kW), the final SoC violations (kWh)
+    and the bulk energy violation (kWh).
+
+    :param model: The pyomo model.
+    :return: The violation expression itself.
+    """
+    violation = sum(
+        model.upper_bound_slack_kW[t] + model.lower_bound_slack_kW[t] for t in model.T
+    ) + sum(
+        (model.final_SoC_slack_pos[n] + model.final_SoC_slack_neg[n])
+        * model.bat_capacity_kWs[n]
+        / 3600
+        for n in model.N
+    )
+    if model.bulk_data is not None:
+        violation += (
+            model.bulk_energy_slack_kWs_pos + model.bulk_energy_slack_kWs_neg
+        ) / 3600
+    return violation
+
+
+def build_model(
     P_load_gen: pd.Series,
     df_battery: pd.DataFrame,
     day_end: datetime,
     bulk_data: Bulk,
     P_net_after_kW_limits: pd.DataFrame,
     pv_curtailment: bool,
-) -> Tuple[
-    pd.Series,
-    pd.DataFrame,
-    pd.Series,
-    pd.DataFrame,
-    pd.Series,
-    pd.Series,
-    pd.Series,
-    Tuple[str,str],
-]:
-    """The scheduling optimization function which acts upon the load and generation forecast data considering
-    battery specifications, optimization horizon, and power boundaries.
-    Depending on the input data, bulk delivery/reception and PV curtailment can also be satisfied.
-
+    elastic: bool = False,
+    violation_penalty: float = ELASTIC_PENALTY,
+    mutable_sizing: bool = False,
+) -> ConcreteModel:
+    """Build the scheduling optimization model for the load and generation forecast data considering
+    battery specifications, optimization horizon, and power boundaries, without solving it.
 
     Parameters
     ----------
     P_load_gen : pd.Series
-        load and generation forecast time series of float type.
+        load and generation forecast time series of float type, either with a uniform time step
+        or aggregated into time steps of different lengths by time_resolution.aggregate.
     df_battery : pd.DataFrame
         battery specifications of float and string types.
     day_end : datetime
         user-defined end of the day (datetime) till which household batteries should reach
-        maximum SoC. By default, its value is set to then sun-set time.
+        maximum SoC. By default, its value is set to then sun-set time. If it falls within a time
+        step, the end of that time step is taken.
     bulk_data : Bulk
         Class related to the bulk delivery/reception of energy from batteries including bulk_start
         and _end datetime and the bulk_energy_kWh float.
@@ -423,42 +474,42 @@ def scheduling(
         the integer identifiers for the existance of any upper or lower bounds.
     pv_curtailment : bool
         If true, PV generation can be curtailed.
-
-        (solver.status, solver.termination_condition),
+    elastic : bool, optional
+        If true, the P_net_after_kW bounds, the final SoC and the bulk energy constraints get
+        penalized slack variables, so that the model is always feasible, by default False
+    violation_penalty : float, optional
+        objective penalty per kW/kWh of violation in the elastic formulation, by default ELASTIC_PENALTY
+    mutable_sizing : bool, optional
+        If true, the battery capacities and maximum charging/discharging powers are mutable
+        parameters, which can be changed (e.g. for a battery sizing sweep) and the model re-solved
+        without being rebuilt, by default False
 
     Returns
     -------
-    Tuple[ pd.Series, pd.DataFrame, pd.Series, pd.DataFrame, pd.Series, pd.Series, pd.Series, Tuple[Any, Any], ]
-        pv_profile: Series containing the PV (Photovoltaic) profile.
-        P_bat_kW_df: DataFrame containing battery power for different nodes.
-        P_bat_total_kW: Series containing the total battery power.
-        SoC_bat_df: DataFrame containing battery state of charge for different nodes.
-        P_net_after_kW: Series containing net power after control.
-        P_net_after_kW_upperb: Series containing upper bounds for net power after control.
-        P_net_after_kW_lowerb: Series containing lower bounds for net power after control.
-        (str, str): status and details from the solver
+    ConcreteModel
+        the pyomo model including its index sets, parameters, variables, constraints and objective.
     """
 
-    # Selected optimization solver
-    optimization_solver = SolverFactory("gurobi")
-    # optimization_solver = SolverFactory("scip")
-
     # Initialize necessary values from the inputs
     load = P_load_gen.P_load_kW
     generation = P_load_gen.P_gen_kW
     start_time = load.index[0]
     end_time = load.index[-1]
-    delta_T = pd.to_timedelta(load.index.freq)
-    opt_horizon = pd.date_range(
-        start_time, end_time + delta_T, freq=delta_T, inclusive="left"
-    )
-    sof_horizon = pd.date_range(
-        start_time, end_time + delta_T, freq=delta_T, inclusive="both"
+    # Duration of every time step (seconds), uniform unless aggregated by time_resolution
+    delta_T_s = pd.Series(step_seconds(P_load_gen), index=load.index)
+    opt_horizon = load.index
+    sof_horizon = opt_horizon.append(
+        pd.DatetimeIndex([end_time + pd.to_timedelta(delta_T_s.iloc[-1], unit="s")])
     )
     if bulk_data is not None:
-        bulk_horizon = pd.date_range(
-            bulk_data.bulk_start, bulk_data.bulk_end, freq=delta_T, inclusive="both"
-        )
+        bulk_horizon = opt_horizon[
+            (opt_horizon >= bulk_data.bulk_start) & (opt_horizon <= bulk_data.bulk_end)
+        ]
+    # A day end within a time step is moved to the end of that time step
+    if day_end is not None and day_end not in sof_horizon:
+        position = sof_horizon.searchsorted(day_end)
+        if position < len(sof_horizon):
+            day_end = sof_horizon[position]
 
     considered_load_forecast = load[
         opt_horizon
@@ -484,8 +535,9 @@ def scheduling(
 
     # Parameters
     ######################################################################################################
-    # TimeDelta in one time step
-    model.dT = delta_T
+    # Duration of every time step (seconds) and the timestamp following it
+    model.dT_s = delta_T_s
+    model.next_t = dict(zip(opt_horizon, sof_horizon[1:]))
     model.start_time = start_time
     model.end_time = end_time
     model.day_end = day_end
@@ -513,12 +565,26 @@ def scheduling(
     model.ini_SoC_bat = df_battery.initial_SoC
     # The value of the final state of charge (if given) to be reached for the battery n at the end of the optimization horizon
     model.final_SoC_bat = df_battery.final_SoC
-    # Capacity of the battery n (kWsec)
-    model.bat_capacity_kWs = df_battery.bat_capacity_kWs
-    # Maximum charging power of the battery n (KW)
-    model.P_ch_bat_max_kW = df_battery.P_ch_max_kW
-    # Maximum discharging power of the battery n (KW)
-    model.P_dis_bat_max_kW = df_battery.P_dis_max_kW
+    if mutable_sizing:
+        # Capacity of the battery n (kWsec)
+        model.bat_capacity_kWs = Param(
+            model.N, initialize=df_battery.bat_capacity_kWs.to_dict(), mutable=True
+        )
+        # Maximum charging power of the battery n (KW)
+        model.P_ch_bat_max_kW = Param(
+            model.N, initialize=df_battery.P_ch_max_kW.to_dict(), mutable=True
+        )
+        # Maximum discharging power of the battery n (KW)
+        model.P_dis_bat_max_kW = Param(
+            model.N, initialize=df_battery.P_dis_max_kW.to_dict(), mutable=True
+        )
+    else:
+        # Capacity of the battery n (kWsec)
+        model.bat_capacity_kWs = df_battery.bat_capacity_kWs
+        # Maximum charging power of the battery n (KW)
+        model.P_ch_bat_max_kW = df_battery.P_ch_max_kW
+        # Maximum discharging power of the battery n (KW)
+        model.P_dis_bat_max_kW = df_battery.P_dis_max_kW
     # Charging efficiency of the battery n
     model.ch_eff_bat = df_battery.ch_efficiency
     # Discharging efficiency of the battery n
@@ -531,6 +597,10 @@ def scheduling(
         model.pv_curtailment = pv_curtailment
     else:
         model.pv_curtailment = False
+    # Elastic formulation (soft bound, final SoC and bulk energy constraints)
+    model.elastic = elastic
+    model.violation_penalty = violation_penalty
+    model.bulk_data = bulk_data
 
     # Variables
     ######################################################################################################
@@ -563,6 +633,17 @@ def scheduling(
     model.x_imp = Var(model.T, within=pmo.Binary)
     # Binary variable having 1 if battery n exports power at timestamp t
     model.x_exp = Var(model.T, within=pmo.Binary)
+    # Slack variables of the elastic formulation
+    if elastic:
+        # Violation of the P_net_after_kW upper/lower bound in timestamp t
+        model.upper_bound_slack_kW = Var(model.T, within=NonNegativeReals)
+        model.lower_bound_slack_kW = Var(model.T, within=NonNegativeReals)
+        # Positive/negative deviation of battery n from its final SoC
+        model.final_SoC_slack_pos = Var(model.N, within=NonNegativeReals)
+        model.final_SoC_slack_neg = Var(model.N, within=NonNegativeReals)
+        # Positive/negative deviation from the bulk energy (kWsec)
+        model.bulk_energy_slack_kWs_pos = Var(within=NonNegativeReals)
+        model.bulk_energy_slack_kWs_neg = Var(within=NonNegativeReals)
 
     # Constraints
     ######################################################################################################
@@ -593,59 +674,84 @@ def scheduling(
     model.hbes_avoid_diss = Constraint(model.N, model.T, rule=hbes_avoid_diss)
     model.pv_curtailment_constr = Constraint(model.T, rule=pv_curtailment_constr)
 
-    # Objective function and solver
+    # Objective function
     ######################################################################################################
     model.obj = Objective(rule=obj_rule, sense=minimize)
-    solver = optimization_solver.solve(model).solver
 
-    #####################################################################################################
-    ##################################       POST PROCESSING             ################################
-    # Initialize DataFrames and Series to store post-processing results
-    P_bat_kW_df = pd.DataFrame(index=model.T, columns=df_battery.index)
-    P_bat_total_kW = pd.Series(
-        index=model.T, dtype=float
-    )  # Total battery power (discharging: negative, charging: positive)
-    P_net_after_kW = pd.Series(index=model.T, dtype=float)
-    bat_ch = pd.DataFrame(index=model.T, columns=df_battery.index)
-    bat_dis = pd.DataFrame(index=model.T, columns=df_battery.index)
-    SoC_bat_df = pd.DataFrame(index=model.T_SoC_bat, columns=df_battery.index)
-    lower_bound = pd.Series(index=model.T, dtype=float)
-    upper_bound = pd.Series(index=model.T, dtype=float)
-
-    # Loop through time steps to calculate and store post-processing results
-    for t in model.T:
-        # Calculate net power after considering import and export
-        P_net_after_kW[t] = value(
-            model.x_imp[t] * model.P_imp_kW[t] - model.x_exp[t] * model.P_exp_kW[t]
-        )
-        total_supply = 0
-        # Loop through battery nodes (n) to calculate battery power and total supply
-        for n in model.N:
-            total_supply += value(
-                -model.x_dis[n, t] * model.P_dis_bat_kW[n, t] / model.dis_eff_bat[n]
-            ) + value(model.x_ch[n, t] * model.P_ch_bat_kW[n, t] * model.ch_eff_bat[n])
-
-            P_bat_kW_df.loc[t, n] = value(
-                -model.x_dis[n, t] * model.P_dis_bat_kW[n, t] / model.dis_eff_bat[n]
-                + model.x_ch[n, t] * model.P_ch_bat_kW[n, t] * model.ch_eff_bat[n]
-            )
-        # Store the total supply in P_bat_total_kW
-        P_bat_total_kW[t] = total_supply
+    return model
 
-        # Check if lower and upper bounds exist for this time step and store them
-        if model.with_lower_bound[t]:
-            lower_bound[t] = model.lower_bound_kW[t]
-        if model.with_upper_bound[t]:
-            upper_bound[t] = model.upper_bound_kW[t]
 
-    # Loop through battery nodes (col) to extract charging, discharging, and SoC data
-    for col in df_battery.index:
-        bat_ch[col] = model.P_ch_bat_kW[col, :]()
-        bat_dis[col] = model.P_dis_bat_kW[col, :]()
-        SoC_bat_df[col] = model.SoC_bat[col, :]()
+def post_process(
+    model: ConcreteModel, df_battery: pd.DataFrame
+) -> Tuple[
+    pd.Series,
+    pd.DataFrame,
+    pd.Series,
+    pd.DataFrame,
+    pd.Series,
+    pd.Series,
+    pd.Series,
+]:
+    """Extract the schedule from a solved (or partially solved) scheduling optimization model.
+
+    Parameters
+    ----------
+    model : ConcreteModel
+        the pyomo model built by build_model with its variable values loaded from the solver.
+    df_battery : pd.DataFrame
+        battery specifications of float and string types.
+
+    Returns
+    -------
+    Tuple[ pd.Series, pd.DataFrame, pd.Series, pd.DataFrame, pd.Series, pd.Series, pd.Series, ]
+        pv_profile: Series containing the PV (Photovoltaic) profile.
+        P_bat_kW_df: DataFrame containing battery power for different nodes.
+        P_bat_total_kW: Series containing the total battery power.
+        SoC_bat_df: DataFrame containing battery state of charge for different nodes.
+        P_net_after_kW: Series containing net power after control.
+        P_net_after_kW_upperb: Series containing upper bounds for net power after control.
+        P_net_after_kW_lowerb: Series containing lower bounds for net power after control.
+    """
+    #####################################################################################################
+    ##################################       POST PROCESSING             ################################
+    # Extract the solution values as float arrays (in the order of the time steps)
+    index = pd.Index(model.T)
+    x_imp = np.array(model.x_imp[:](), dtype=float)
+    x_exp = np.array(model.x_exp[:](), dtype=float)
+    P_imp_kW = np.array(model.P_imp_kW[:](), dtype=float)
+    P_exp_kW = np.array(model.P_exp_kW[:](), dtype=float)
+
+    # Net power after considering import and export
+    P_net_after_kW = pd.Series(x_imp * P_imp_kW - x_exp * P_exp_kW, index=index)
+
+    # Battery power of each battery node (discharging: negative, charging: positive)
+    P_bat_kW = OutputColumns(index, df_battery.index)
+    SoC_bat = OutputColumns(pd.Index(model.T_SoC_bat), df_battery.index)
+    for n in model.N:
+        x_dis = np.array(model.x_dis[n, :](), dtype=float)
+        x_ch = np.array(model.x_ch[n, :](), dtype=float)
+        P_bat_kW[n] = -x_dis * np.array(
+            model.P_dis_bat_kW[n, :](), dtype=float
+        ) / model.dis_eff_bat[n] + x_ch * np.array(
+            model.P_ch_bat_kW[n, :](), dtype=float
+        ) * model.ch_eff_bat[n]
+        SoC_bat[n] = model.SoC_bat[n, :]()
+    P_bat_kW_df = P_bat_kW.to_df()
+    SoC_bat_df = SoC_bat.to_df()
+
+    # Total battery power (discharging: negative, charging: positive)
+    P_bat_total_kW = P_bat_kW_df.sum(axis=1)
+
+    # Lower and upper bounds where they exist for the time step
+    lower_bound = model.lower_bound_kW.loc[index].where(
+        model.with_lower_bound.loc[index].astype(bool)
+    )
+    upper_bound = model.upper_bound_kW.loc[index].where(
+        model.with_upper_bound.loc[index].astype(bool)
+    )
 
     # Extract the PV profile data
-    PV_profile = pd.Series(model.P_PV_kW[:](), index=model.T)
+    PV_profile = pd.Series(model.P_PV_kW[:](), index=index, dtype=float)
 
     return (
         PV_profile,
@@ -655,10 +761,336 @@ def scheduling(
         P_net_after_kW,
         upper_bound,
         lower_bound,
-        (solver.status, solver.termination_condition),
     )
 
 
+def scheduling(
+    P_load_gen: pd.Series,
+    df_battery: pd.DataFrame,
+    day_end: datetime,
+    bulk_data: Bulk,
+    P_net_after_kW_limits: pd.DataFrame,
+    pv_curtailment: bool,
+    elastic: bool = False,
+) -> Tuple[
+    pd.Series,
+    pd.DataFrame,
+    pd.Series,
+    pd.DataFrame,
+    pd.Series,
+    pd.Series,
+    pd.Series,
+    Tuple[str, str],
+]:
+    """The scheduling optimization function which acts upon the load and generation forecast data considering
+    battery specifications, optimization horizon, and power boundaries.
+    Depending on the input data, bulk delivery/reception and PV curtailment can also be satisfied.
+
+
+    Parameters
+    ----------
+    P_load_gen : pd.Series
+        load and generation forecast time series of float type.
+    df_battery : pd.DataFrame
+        battery specifications of float and string types.
+    day_end : datetime
+        user-defined end of the day (datetime) till which household batteries should reach
+        maximum SoC. By default, its value is set to then sun-set time.
+    bulk_data : Bulk
+        Class related to the bulk delivery/reception of energy from batteries including bulk_start
+        and _end datetime and the bulk_energy_kWh float.
+    P_net_after_kW_limits : pd.DataFrame
+        consisiting of upper and lower bound float time series (kW) and
+        the integer identifiers for the existance of any upper or lower bounds.
+    pv_curtailment : bool
+        If true, PV generation can be curtailed.
+    elastic : bool, optional
+        If true, the bound, final SoC and bulk energy constraints are softened by penalized
+        slack variables (see build_model), by default False
+
+    Returns
+    -------
+    Tuple[ pd.Series, pd.DataFrame, pd.Series, pd.DataFrame, pd.Series, pd.Series, pd.Series, Tuple[Any, Any], ]
+        pv_profile: Series containing the PV (Photovoltaic) profile.
+        P_bat_kW_df: DataFrame containing battery power for different nodes.
+        P_bat_total_kW: Series containing the total battery power.
+        SoC_bat_df: DataFrame containing battery state of charge for different nodes.
+        P_net_after_kW: Series containing net power after control.
+        P_net_after_kW_upperb: Series containing upper bounds for net power after control.
+        P_net_after_kW_lowerb: Series containing lower bounds for net power after control.
+        (str, str): status and details from the solver
+    """
+    model = build_model(
+        P_load_gen,
+        df_battery,
+        day_end,
+        bulk_data,
+        P_net_after_kW_limits,
+        pv_curtailment,
+        elastic,
+    )
+    solver_status = solve(model)
+
+    return (*post_process(model, df_battery), solver_status)
+
+
+def solve(model: ConcreteModel) -> Tuple[str, str]:
+    """Solve a scheduling optimization model with the selected optimization solver and
+    load the solution into the model. In the worker processes of a SolverResourceScheduler,
+    the solver is limited to the thread budget of the job.
+
+    Parameters
+    ----------
+    model : ConcreteModel
+        the pyomo model built by build_model.
+
+    Returns
+    -------
+    Tuple[str, str]
+        status and details from the solver
+    """
+    optimization_solver = SolverFactory(SOLVER_NAME)
+    solver = optimization_solver.solve(model, options=solver_options(SOLVER_NAME)).solver
+
+    return (solver.status, solver.termination_condition)
+
+
+def scheduling_anytime(
+    P_load_gen: pd.Series,
+    df_battery: pd.DataFrame,
+    day_end: datetime,
+    bulk_data: Bulk,
+    P_net_after_kW_limits: pd.DataFrame,
+    pv_curtailment: bool,
+    deadline: datetime,
+    incumbent_callback: Callable[[dict], None] = None,
+    elastic: bool = False,
+) -> Tuple[
+    pd.Series,
+    pd.DataFrame,
+    pd.Series,
+    pd.DataFrame,
+    pd.Series,
+    pd.Series,
+    pd.Series,
+    Tuple[str, str],
+    dict,
+]:
+    """Deadline-driven variant of the scheduling optimization function.
+
+    The solve is started in a background thread on a persistent Gurobi instance and every improving
+    incumbent found by the solver is collected as it arrives. At the deadline (e.g. the gate-closure
+    time of the day-ahead market) the solver is stopped and the best schedule found so far is returned,
+    whether or not its optimality has been proven.
+
+    Parameters
+    ----------
+    P_load_gen : pd.Series
+        load and generation forecast time series of float type.
+    df_battery : pd.DataFrame
+        battery specifications of float and string types.
+    day_end : datetime
+        user-defined end of the day (datetime) till which household batteries should reach
+        maximum SoC. By default, its value is set to then sun-set time.
+    bulk_data : Bulk
+        Class related to the bulk delivery/reception of energy from batteries including bulk_start
+        and _end datetime and the bulk_energy_kWh float.
+    P_net_after_kW_limits : pd.DataFrame
+        consisiting of upper and lower bound float time series (kW) and
+        the integer identifiers for the existance of any upper or lower bounds.
+    pv_curtailment : bool
+        If true, PV generation can be curtailed.
+    deadline : datetime
+        wall-clock time by which the schedule has to be available.
+    incumbent_callback : Callable[[dict], None], optional
+        called with every improving incumbent as soon as the solver reports it, by default None
+    elastic : bool, optional
+        If true, the bound, final SoC and bulk energy constraints are softened by penalized
+        slack variables (see build_model), by default False
+
+    Returns
+    -------
+    Tuple[ pd.Series, pd.DataFrame, pd.Series, pd.DataFrame, pd.Series, pd.Series, pd.Series, Tuple[Any, Any], dict, ]
+        pv_profile: Series containing the PV (Photovoltaic) profile.
+        P_bat_kW_df: DataFrame containing battery power for different nodes.
+        P_bat_total_kW: Series containing the total battery power.
+        SoC_bat_df: DataFrame containing battery state of charge for different nodes.
+        P_net_after_kW: Series containing net power after control.
+        P_net_after_kW_upperb: Series containing upper bounds for net power after control.
+        P_net_after_kW_lowerb: Series containing lower bounds for net power after control.
+        (str, str): status and details from the solver
+        dict: relative MIP "gap" of the returned schedule, the list of "incumbents" (each with its
+        "runtime_s", "objective" and "bound") and the total solver "runtime_s".
+
+    Raises
+    ------
+    RuntimeError
+        if the deadline has already passed or no feasible schedule was found before the deadline.
+    """
+    model = build_model(
+        P_load_gen,
+        df_battery,
+        day_end,
+        bulk_data,
+        P_net_after_kW_limits,
+        pv_curtailment,
+        elastic,
+    )
+    solver_status, anytime_info = solve_anytime(model, deadline, incumbent_callback)
+
+    return (*post_process(model, df_battery), solver_status, anytime_info)
+
+
+def solve_anytime(
+    model: ConcreteModel,
+    deadline: datetime,
+    incumbent_callback: Callable[[dict], None] = None,
+) -> Tuple[Tuple[str, str], dict]:
+    """Solve a scheduling optimization model until the deadline at the latest and load the best
+    solution found into the model.
+
+    Parameters
+    ----------
+    model : ConcreteModel
+        the pyomo model built by build_model.
+    deadline : datetime
+        wall-clock time by which the schedule has to be available.
+    incumbent_callback : Callable[[dict], None], optional
+        called with every improving incumbent as soon as the solver reports it, by default None
+
+    Returns
+    -------
+    Tuple[Tuple[str, str], dict]
+        (str, str): status and details from the solver
+        dict: relative MIP "gap", "incumbents" and solver "runtime_s" (see scheduling_anytime).
+
+    Raises
+    ------
+    RuntimeError
+        if the deadline has already passed or no feasible schedule was found before the deadline.
+    """
+    from gurobipy import GRB
+
+    optimization_solver = SolverFactory("gurobi_persistent")
+    optimization_solver.set_instance(model)
+
+    # Collect every improving incumbent reported by the solver
+    incumbents = []
+
+    def on_incumbent(cb_model, cb_solver, cb_where):
+        if cb_where != GRB.Callback.MIPSOL:
+            return
+        incumbent = {
+            "runtime_s": cb_solver.cbGet(GRB.Callback.RUNTIME),
+            "objective": cb_solver.cbGet(GRB.Callback.MIPSOL_OBJ),
+            "bound": cb_solver.cbGet(GRB.Callback.MIPSOL_OBJBND),
+        }
+        if incumbents and incumbent["objective"] >= incumbents[-1]["objective"]:
+            return
+        incumbents.append(incumbent)
+        if incumbent_callback is not None:
+            incumbent_callback(incumbent)
+
+    optimization_solver.set_callback(on_incumbent)
+
+    remaining_s = _seconds_until(deadline)
+    if remaining_s <= 0:
+        raise RuntimeError(f"The deadline {deadline} has already passed.")
+    optimization_solver.set_gurobi_param("TimeLimit", remaining_s)
+    for option, option_value in solver_options("gurobi_persistent").items():
+        optimization_solver.set_gurobi_param(option, option_value)
+
+    # Start the solve in the background and wait until it finishes or the deadline is reached
+    outcome = {}
+
+    def solve():
+        try:
+            outcome["results"] = optimization_solver.solve(
+                save_results=False, load_solutions=False
+            )
+        except Exception as err:
+            outcome["error"] = err
+
+    worker = threading.Thread(target=solve, daemon=True)
+    worker.start()
+    worker.join(timeout=max(_seconds_until(deadline), 0))
+    if worker.is_alive():
+        # The solver has not reached its time limit yet (e.g. still in presolve), stop it explicitly
+        optimization_solver._solver_model.terminate()
+        worker.join()
+    if "error" in outcome:
+        raise outcome["error"]
+
+    solver = outcome["results"].solver
+    if optimization_solver.get_model_attr("SolCount") == 0:
+        raise RuntimeError(
+            f"No feasible schedule has been found before the deadline {deadline} "
+            f"(termination condition: {solver.termination_condition})."
+        )
+    optimization_solver.load_vars()
+    anytime_info = {
+        "gap": optimization_solver.get_model_attr("MIPGap"),
+        "incumbents": incumbents,
+        "runtime_s": optimization_solver.get_model_attr("Runtime"),
+    }
+
+    return (solver.status, solver.termination_condition), anytime_info
+
+
+def violation_report(model: ConcreteModel) -> pd.DataFrame:
+    """Per-timestep constraint violations of a solved model with the elastic formulation.
+
+    Parameters
+    ----------
+    model : ConcreteModel
+        the solved pyomo model built by build_model with elastic=True.
+
+    Returns
+    -------
+    pd.DataFrame
+        indexed by the optimization horizon, containing the violations of the P_net_after_kW upper
+        and lower bounds in kW, the deviation of each battery from its final SoC in % at the
+        timestamp where the final SoC is to be reached (at the last time step if it is to be
+        reached at the end of the horizon), and the deviation from the bulk energy in kWh at the end of the
+        bulk window.
+    """
+    report = pd.DataFrame(index=list(model.T))
+    report["upper_bound_violation_kW"] = [
+        value(model.upper_bound_slack_kW[t]) if model.with_upper_bound[t] else 0.0
+        for t in model.T
+    ]
+    report["lower_bound_violation_kW"] = [
+        value(model.lower_bound_slack_kW[t]) if model.with_lower_bound[t] else 0.0
+        for t in model.T
+    ]
+    for n in model.N:
+        column = f"final_SoC_violation_{n}_%"
+        report[column] = 0.0
+        if model.final_SoC_bat[n] is not None:
+            final_time = model.day_end if model.bat_type[n] == "hbes" else model.end_time
+            if final_time not in report.index:
+                # day_end moved to the end of the last time step
+                final_time = report.index[-1]
+            report.loc[final_time, column] = 100 * value(
+                model.final_SoC_slack_pos[n] - model.final_SoC_slack_neg[n]
+            )
+    if model.bulk_data is not None:
+        report["bulk_energy_violation_kWh"] = 0.0
+        report.loc[model.T_bulk[-1], "bulk_energy_violation_kWh"] = (
+            value(
+                model.bulk_energy_slack_kWs_pos - model.bulk_energy_slack_kWs_neg
+            )
+            / 3600
+        )
+
+    return report
+
+
+def _seconds_until(deadline: datetime) -> float:
+    """Seconds left until the (naive or timezone-aware) deadline."""
+    return (deadline - datetime.now(deadline.tzinfo)).total_seconds()
+
+
 def prep_output_df(
     pv_profile: pd.Series,
     P_bat_kW_df: pd.DataFrame,
@@ -668,6 +1100,7 @@ def prep_output_df(
     df_forecasts: pd.DataFrame,
     P_net_after_kW_upperb: pd.Series,
     P_net_after_kW_lowerb: pd.Series,
+    dtype: str = "float64",
 ):
     """
     Prepare the output DataFrame of scheduling optimization based mode.
@@ -690,37 +1123,64 @@ def prep_output_df(
         containing upper bounds for net power after control.
     P_net_after_kW_lowerb : pd.Series
         containing lower bounds for net power after control.
+    dtype : str, optional
+        float type of the output columns, "float64" or "float32", by default "float64"
 
     Returns
     ----------    
     output_df : DataFrame
-        containing prepared output data.
+        containing prepared output data, with a single block of float columns.
 
     """
-    # Create an empty output DataFrame with the same index as df_forecasts
-    output_df = pd.DataFrame(index=df_forecasts.index)
+    index = df_forecasts.index
+    battery_columns = [
+        column
+        for col in P_bat_kW_df.columns
+        for column in (f"P_{col}_kW", f"SoC_{col}_%")
+    ]
+    # Preallocate the output columns with the same index as df_forecasts (results of other
+    # indexes, e.g. the SoC at the end of the horizon, are aligned onto it)
+    output = OutputColumns(
+        index,
+        [
+            "P_net_before_kW",
+            "P_net_before_controlled_PV_kW",
+            "P_PV_forecast_kW",
+            "P_PV_controlled_kW",
+            "P_net_after_kW",
+            "upperb",
+            "lowerb",
+        ]
+        + battery_columns
+        + ["P_bat_total_kW"],
+        dtype,
+    )
+    pv_profile = pv_profile.reindex(index)
 
     # Calculate 'P_net_before_kW' as the difference between load and generation
-    output_df["P_net_before_kW"] = df_forecasts["P_load_kW"] - df_forecasts["P_gen_kW"]
+    output["P_net_before_kW"] = df_forecasts["P_load_kW"] - df_forecasts["P_gen_kW"]
 
     # Calculate 'P_net_before_controlled_PV_kW' as the difference between load and controlled PV
-    output_df["P_net_before_controlled_PV_kW"] = df_forecasts["P_load_kW"] - pv_profile
+    output["P_net_before_controlled_PV_kW"] = df_forecasts["P_load_kW"] - pv_profile
 
     # Add columns for PV forecast and controlled PV
-    output_df["P_PV_forecast_kW"] = df_forecasts["P_gen_kW"]
-    output_df["P_PV_controlled_kW"] = pv_profile
+    output["P_PV_forecast_kW"] = df_forecasts["P_gen_kW"]
+    output["P_PV_controlled_kW"] = pv_profile
 
     # Add columns for net power after control, upper bounds, and lower bounds
-    output_df["P_net_after_kW"] = P_net_after_kW
-    output_df["upperb"] = P_net_after_kW_upperb
-    output_df["lowerb"] = P_net_after_kW_lowerb
+    output["P_net_after_kW"] = P_net_after_kW.reindex(index)
+    output["upperb"] = P_net_after_kW_upperb.reindex(index)
+    output["lowerb"] = P_net_after_kW_lowerb.reindex(index)
 
     # Iterate through columns in P_bat_kW_df and SoC_bat_df to add battery-related data
+    P_bat_kW_df = P_bat_kW_df.reindex(index)
+    SoC_bat_df = SoC_bat_df.reindex(index)
     for col in P_bat_kW_df.columns:
-        output_df[f"P_{col}_kW"] = P_bat_kW_df[col]
-        output_df[f"SoC_{col}_%"] = SoC_bat_df[col] * 100
+        output[f"P_{col}_kW"] = P_bat_kW_df[col]
+        output[f"SoC_{col}_%"] = SoC_bat_df[col] * 100
 
     # Add the total battery power column
-    output_df["P_bat_total_kW"] = P_bat_total_kW
+    output["P_bat_total_kW"] = P_bat_total_kW.reindex(index)
 
+    output_df = output.to_df()
     return output_df
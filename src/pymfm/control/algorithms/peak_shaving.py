@@ -0,0 +1,578 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from datetime import datetime
+from typing import Tuple
+import numpy as np
+import pandas as pd
+from pymfm.control.algorithms.dynamic_programming import objective
+from pymfm.control.utils.data_input import Bulk
+
+# Bisection iterations for the thresholds and the final SoC
+BISECTION_ITERATIONS = 40
+# Numerical tolerance (kW, kWs)
+TOLERANCE = 1e-6
+
+
+def scheduling(
+    P_load_gen: pd.DataFrame,
+    df_battery: pd.DataFrame,
+    day_end: datetime,
+    bulk_data: Bulk,
+    P_net_after_kW_limits: pd.DataFrame,
+    pv_curtailment: bool,
+) -> Tuple[
+    pd.Series,
+    pd.DataFrame,
+    pd.Series,
+    pd.DataFrame,
+    pd.Series,
+    pd.Series,
+    pd.Series,
+    dict,
+]:
+    """Schedule the batteries with a forecast-aware peak-shaving heuristic.
+
+    Unlike the rule-based control, the whole forecast is taken into account: the batteries, as one
+    virtual battery, charge the surplus above an export threshold and discharge the deficit above
+    an import threshold. The horizon is split into windows of a surplus and the following deficit
+    (see windows), so that the batteries cycle once per window, e.g. once per day. The thresholds
+    of every window are found by bisection over its net load levels so that the shaved energy
+    fits the energy budget of the batteries at the start of the window, the SoC being chained
+    from window to window, and are then shifted (by regula falsi, the last windows first) until
+    the final SoC is met. The batteries are dispatched chronologically against the thresholds,
+    respecting the SoC limits, the power limits, the deficit/surplus rules and the
+    P_net_after_kW bounds. The fleet power is shared among the batteries in proportion to their
+    available power, household batteries (hbes) being charged first until day_end.
+
+    Parameters
+    ----------
+    P_load_gen : pd.DataFrame
+        load and generation forecast time series of float type.
+    df_battery : pd.DataFrame
+        battery specifications of float and string types.
+    day_end : datetime
+        end of the day till which household batteries should reach maximum SoC.
+    bulk_data : Bulk
+        bulk delivery/reception of energy, not supported by the heuristic (must be None).
+    P_net_after_kW_limits : pd.DataFrame
+        consisiting of upper and lower bound float time series (kW) and
+        the identifiers for the existance of any upper or lower bounds.
+    pv_curtailment : bool
+        If true, PV generation can be curtailed.
+
+    Returns
+    -------
+    Tuple[ pd.Series, pd.DataFrame, pd.Series, pd.DataFrame, pd.Series, pd.Series, pd.Series, dict, ]
+        pv_profile, P_bat_kW_df, P_bat_total_kW, SoC_bat_df, P_net_after_kW, upper_bound and
+        lower_bound as returned by optimization_based.post_process, and a dictionary with the
+        "objective" value, the "import_threshold_kW" and the "export_threshold_kW" of every window
+        (by the ISO format of its first timestamp), the number of time steps in which the bounds
+        could not be met ("bound_violations") and the deviation of every battery from its final
+        SoC ("final_SoC_deviation_%").
+    """
+    if bulk_data is not None:
+        raise RuntimeError(
+            "Peak-shaving control cannot deal with bulk energy, "
+            "use the optimization-based control instead."
+        )
+
+    index = P_load_gen.index
+    delta_T = pd.to_timedelta(index.freq)
+    dt_s = delta_T.total_seconds()
+    sof_horizon = pd.date_range(
+        index[0], index[-1] + delta_T, freq=delta_T, inclusive="both"
+    )
+    generation = P_load_gen.P_gen_kW.to_numpy(float)
+    P_net_before_kW = P_load_gen.P_load_kW.to_numpy(float) - generation
+    limits = P_net_after_kW_limits.reindex(index)
+    upper_bound = np.where(
+        limits.with_upper_bound.fillna(False).to_numpy(bool),
+        limits.upper_bound.to_numpy(float),
+        np.inf,
+    )
+    lower_bound = np.where(
+        limits.with_lower_bound.fillna(False).to_numpy(bool),
+        limits.lower_bound.to_numpy(float),
+        -np.inf,
+    )
+    curtailment_kW = generation if pv_curtailment else np.zeros_like(generation)
+    batteries = _batteries(df_battery)
+    day_end_position = (
+        sof_horizon.searchsorted(day_end) if day_end is not None else len(index)
+    )
+
+    # Headroom/energy the fleet has to keep for the rest of the horizon, i.e. for the steps in
+    # which even the most discharging/charging allowed by the bounds and the power limits
+    # still forces charging/discharging
+    most_discharging_kW = np.maximum(
+        lower_bound - P_net_before_kW - curtailment_kW, -batteries["P_dis_max_kW"].sum()
+    )
+    most_charging_kW = np.minimum(
+        np.minimum(upper_bound, np.maximum(P_net_before_kW, 0.0)) - P_net_before_kW,
+        np.where(
+            P_net_before_kW < 0,
+            np.minimum(
+                batteries["P_ch_max_kW"].sum(),
+                -P_net_before_kW * batteries["ch_eff"].min(),
+            ),
+            0.0,
+        ),
+    )
+    remaining_kWs = _remaining_energy(most_discharging_kW, dt_s, batteries)
+    reserved_headroom_kWs = (
+        remaining_kWs - np.minimum.accumulate(remaining_kWs[::-1])[::-1]
+    )
+    remaining_kWs = _remaining_energy(most_charging_kW, dt_s, batteries)
+    reserved_energy_kWs = (
+        np.maximum.accumulate(remaining_kWs[::-1])[::-1] - remaining_kWs
+    )
+
+    # Windows of a surplus and the following deficit, with their largest deficit and surplus
+    starts = windows(P_net_before_kW)
+    stops = np.append(starts[1:], len(index))
+    max_deficits = [max(P_net_before_kW[a:b].max(), 0.0) for a, b in zip(starts, stops)]
+    max_surpluses = [max(-P_net_before_kW[a:b].min(), 0.0) for a, b in zip(starts, stops)]
+
+    def dispatch(shift):
+        def window_thresholds(window, energy_kWs):
+            # Thresholds for which the shaved energy fits the energy budget of the fleet at
+            # the start of the window
+            import_threshold, export_threshold = _thresholds(
+                P_net_before_kW[starts[window] : stops[window]], dt_s, batteries, energy_kWs
+            )
+            # The last windows are shifted first: with shift growing in magnitude, one window
+            # after the other is shifted completely, from the last to the first
+            window_shift = np.sign(shift) * min(
+                max(abs(shift) * len(starts) - (len(starts) - 1 - window), 0.0), 1.0
+            )
+            return _shifted(
+                import_threshold,
+                export_threshold,
+                max_deficits[window],
+                max_surpluses[window],
+                window_shift,
+            )
+
+        return _dispatch(
+            P_net_before_kW,
+            generation,
+            lower_bound,
+            upper_bound,
+            curtailment_kW,
+            dt_s,
+            batteries,
+            starts,
+            window_thresholds,
+            day_end_position,
+            reserved_headroom_kWs,
+            reserved_energy_kWs,
+        )
+
+    result = dispatch(0.0)
+
+    # Shift the thresholds until the fleet reaches the final SoC of its community batteries
+    target = batteries["has_target"] & ~batteries["is_hbes"]
+    if target.any():
+        target_energy_kWs = (batteries["final_SoC"] * batteries["capacity_kWs"])[target].sum()
+
+        def missing_kWs(candidate):
+            return (
+                target_energy_kWs
+                - (candidate[1][-2] * batteries["capacity_kWs"])[target].sum()
+            )
+
+        # The final energy grows monotonically (piecewise linearly) with the shift: search the
+        # shift by regula falsi (Illinois variant) within the bracket found at its ends
+        shift, missing = 0.0, missing_kWs(result)
+        tolerance_kWs = TOLERANCE * batteries["capacity_kWs"][target].sum()
+        if abs(missing) > tolerance_kWs:
+            end_shift = 1.0 if missing > 0 else -1.0
+            end_result = dispatch(end_shift)
+            end_missing = missing_kWs(end_result)
+            if missing * end_missing >= 0:
+                # The final SoC cannot be reached, get as close as possible
+                shift, result = end_shift, end_result
+            else:
+                low = (shift, missing, result)
+                high = (end_shift, end_missing, end_result)
+                side = 0
+                for _ in range(BISECTION_ITERATIONS):
+                    new_shift = (low[0] * high[1] - high[0] * low[1]) / (high[1] - low[1])
+                    new_result = dispatch(new_shift)
+                    new = (new_shift, missing_kWs(new_result), new_result)
+                    if abs(new[1]) <= tolerance_kWs:
+                        low = high = new
+                        break
+                    # Halve the value at the end kept twice in a row (Illinois)
+                    if new[1] * high[1] > 0:
+                        high = new
+                        if side == -1:
+                            low = (low[0], low[1] / 2, low[2])
+                        side = -1
+                    else:
+                        low = new
+                        if side == 1:
+                            high = (high[0], high[1] / 2, high[2])
+                        side = 1
+                _, _, result = min(low, high, key=lambda end: abs(missing_kWs(end[2])))
+    schedule, SoC, P_battery_kW, PV_kW, bound_violations, window_thresholds_kW = result
+
+    # Results in the format of the optimization-based control
+    P_ch_kW = np.maximum(P_battery_kW, 0.0)
+    P_dis_kW = np.maximum(-P_battery_kW, 0.0)
+    P_bat_kW = (
+        -P_dis_kW / batteries["dis_eff"] + P_ch_kW * batteries["ch_eff"]
+    )
+    PV_profile = pd.Series(PV_kW, index=index)
+    P_bat_kW_df = pd.DataFrame(P_bat_kW, index=index, columns=df_battery.index)
+    P_bat_total_kW = P_bat_kW_df.sum(axis=1)
+    SoC_bat_df = pd.DataFrame(SoC, index=sof_horizon, columns=df_battery.index)
+    P_net_after_kW = pd.Series(schedule, index=index)
+    upper_bound_kW = pd.Series(
+        np.where(np.isinf(upper_bound), np.nan, upper_bound), index=index
+    )
+    lower_bound_kW = pd.Series(
+        np.where(np.isinf(lower_bound), np.nan, lower_bound), index=index
+    )
+    # Deviation from the final SoC (household batteries: maximum SoC at day_end)
+    final_SoC_deviation = {}
+    for n, bat_id in enumerate(df_battery.index):
+        if batteries["has_target"][n]:
+            if batteries["is_hbes"][n]:
+                reached = SoC[min(day_end_position, len(index)), n]
+                required = batteries["max_SoC"][n]
+            else:
+                reached, required = SoC[-2, n], batteries["final_SoC"][n]
+            final_SoC_deviation[bat_id] = (reached - required) * 100
+    info = {
+        "objective": objective(schedule),
+        "import_threshold_kW": {
+            index[start].isoformat(): kW[0]
+            for start, kW in zip(starts, window_thresholds_kW)
+        },
+        "export_threshold_kW": {
+            index[start].isoformat(): kW[1]
+            for start, kW in zip(starts, window_thresholds_kW)
+        },
+        "bound_violations": bound_violations,
+        "final_SoC_deviation_%": final_SoC_deviation,
+    }
+
+    return (
+        PV_profile,
+        P_bat_kW_df,
+        P_bat_total_kW,
+        SoC_bat_df,
+        P_net_after_kW,
+        upper_bound_kW,
+        lower_bound_kW,
+        info,
+    )
+
+
+def windows(P_net_before_kW: np.ndarray) -> np.ndarray:
+    """Start positions of the windows of a surplus and the following deficit.
+
+    A window starts at the first time step and at every surplus following a deficit (time steps
+    without net load are skipped), so that the first window may start with a deficit.
+
+    Parameters
+    ----------
+    P_net_before_kW : np.ndarray
+        net load forecast (load - generation) in kW.
+
+    Returns
+    -------
+    np.ndarray
+        the time steps at which the windows start, in ascending order.
+    """
+    sign = np.sign(P_net_before_kW)
+    nonzero = np.flatnonzero(sign)
+    starts = nonzero[1:][(sign[nonzero[1:]] < 0) & (sign[nonzero[:-1]] > 0)]
+    return np.concatenate(([0], starts)).astype(int)
+
+
+def _thresholds(P_net_before_kW, dt_s, batteries, energy_kWs):
+    """Import/export thresholds of a window for which the shaved energy fits the energy budget
+    of the fleet storing energy_kWs (per battery) at its start. The charged energy is limited by
+    the headroom plus the energy discharged before the first surplus, the discharged energy by
+    the stored energy plus the charged energy. Each threshold is the lowest net load level (found
+    by bisection) for which the energy to be shaved above it fits its budget."""
+    deficit_kW = np.maximum(P_net_before_kW, 0.0)
+    surplus_kW = np.maximum(-P_net_before_kW, 0.0)
+    capacity_kWs = batteries["capacity_kWs"]
+    ch_factor, dis_factor = batteries["ch_factor"], batteries["dis_factor"]
+    P_ch_max_kW = batteries["P_ch_max_kW"].sum()
+    P_dis_max_kW = batteries["P_dis_max_kW"].sum()
+
+    # Deficit steps before the first surplus
+    first_surplus = np.argmax(surplus_kW > 0) if (surplus_kW > 0).any() else len(surplus_kW)
+
+    def charged_kWs(threshold):
+        return (
+            np.minimum(np.maximum(surplus_kW - threshold, 0.0), P_ch_max_kW).sum()
+            * dt_s
+            * ch_factor
+        )
+
+    def discharged_kWs(threshold, steps=slice(None)):
+        return (
+            np.minimum(np.maximum(deficit_kW[steps] - threshold, 0.0), P_dis_max_kW).sum()
+            * dt_s
+            * dis_factor
+        )
+
+    stored_kWs = np.maximum(
+        (energy_kWs - batteries["min_SoC"] * capacity_kWs) * ~batteries["is_hbes"], 0.0
+    ).sum()
+    headroom_kWs = np.maximum(batteries["max_SoC"] * capacity_kWs - energy_kWs, 0.0).sum()
+    usable_kWs = ((batteries["max_SoC"] - batteries["min_SoC"]) * capacity_kWs).sum()
+    # At most the usable capacity is charged, which bounds the energy to be discharged
+    import_threshold = _bisect_threshold(
+        discharged_kWs,
+        deficit_kW.max(initial=0.0),
+        stored_kWs + min(charged_kWs(0.0), usable_kWs),
+    )
+    export_threshold = _bisect_threshold(
+        charged_kWs,
+        surplus_kW.max(initial=0.0),
+        min(
+            headroom_kWs + discharged_kWs(import_threshold, slice(first_surplus)),
+            usable_kWs,
+        ),
+    )
+    import_threshold = _bisect_threshold(
+        discharged_kWs,
+        deficit_kW.max(initial=0.0),
+        stored_kWs + charged_kWs(export_threshold),
+    )
+    return import_threshold, export_threshold
+
+
+def _shifted(import_threshold, export_threshold, max_deficit, max_surplus, shift):
+    """Thresholds shifted by shift in [-1, 1]: positive shifts keep more energy (first less
+    discharging, then more charging), negative shifts keep less energy (first less charging, then
+    more discharging)."""
+    if shift >= 0:
+        return (
+            import_threshold + min(2 * shift, 1) * (max_deficit - import_threshold),
+            export_threshold * (1 - max(2 * shift - 1, 0)),
+        )
+    return (
+        import_threshold * (1 - max(-2 * shift - 1, 0)),
+        export_threshold + min(-2 * shift, 1) * (max_surplus - export_threshold),
+    )
+
+
+def _bisect_threshold(shaved_kWs, max_level_kW, budget_kWs):
+    """Lowest threshold whose shaved energy (decreasing in the threshold) fits the budget."""
+    low, high = 0.0, max(max_level_kW, 0.0)
+    if shaved_kWs(low) <= budget_kWs:
+        return low
+    for _ in range(BISECTION_ITERATIONS):
+        middle = (low + high) / 2
+        if shaved_kWs(middle) > budget_kWs:
+            low = middle
+        else:
+            high = middle
+    return high
+
+
+def _batteries(df_battery: pd.DataFrame) -> dict:
+    """Battery specifications as float arrays over the batteries."""
+    is_hbes = (df_battery.bat_type == "hbes").to_numpy()
+    capacity_kWs = df_battery.bat_capacity_kWs.to_numpy(float)
+    return {
+        "is_hbes": is_hbes,
+        "initial_SoC": df_battery.initial_SoC.to_numpy(float),
+        "min_SoC": df_battery.min_SoC.to_numpy(float),
+        "max_SoC": df_battery.max_SoC.to_numpy(float),
+        "final_SoC": df_battery.final_SoC.to_numpy(float),
+        "has_target": df_battery.final_SoC.notna().to_numpy(),
+        "capacity_kWs": capacity_kWs,
+        "ch_eff": df_battery.ch_efficiency.to_numpy(float),
+        "dis_eff": df_battery.dis_efficiency.to_numpy(float),
+        "P_ch_max_kW": df_battery.P_ch_max_kW.to_numpy(float),
+        # Household batteries are never discharged
+        "P_dis_max_kW": np.where(is_hbes, 0.0, df_battery.P_dis_max_kW.to_numpy(float)),
+        # Stored energy per grid-side kWs of the fleet, weighted by capacity
+        "ch_factor": np.average(
+            1 / df_battery.ch_efficiency.to_numpy(float), weights=capacity_kWs
+        ),
+        "dis_factor": np.average(
+            df_battery.dis_efficiency.to_numpy(float), weights=capacity_kWs
+        ),
+    }
+
+
+def _dispatch(
+    P_net_before_kW,
+    generation_kW,
+    lower_bound,
+    upper_bound,
+    curtailment_kW,
+    dt_s,
+    batteries,
+    starts,
+    window_thresholds,
+    day_end_position,
+    reserved_headroom_kWs,
+    reserved_energy_kWs,
+):
+    """Chronological dispatch of the batteries against the import/export thresholds, which
+    window_thresholds(window, energy_kWs) returns at the start of every window for the stored
+    energy of the batteries. Returns P_net_after_kW, the SoC (SoC horizon x batteries), the
+    grid-side battery powers (charging positive, time steps x batteries), the PV profile, the
+    number of time steps in which the bounds could not be met and the thresholds of every window.
+    Shaving never uses the headroom/energy reserved for the charging/discharging forced by the
+    bounds later on."""
+    n_steps = len(P_net_before_kW)
+    capacity_kWs = batteries["capacity_kWs"]
+    is_hbes = batteries["is_hbes"]
+    is_cbes = (~is_hbes).astype(float)
+    has_hbes = is_hbes.any()
+    P_ch_max_kW, P_dis_max_kW = batteries["P_ch_max_kW"], batteries["P_dis_max_kW"]
+    min_ch_eff = batteries["ch_eff"].min()
+    # Stored energy limits and conversions between grid-side power and stored energy
+    max_battery_kWs = batteries["max_SoC"] * capacity_kWs
+    min_battery_kWs = batteries["min_SoC"] * capacity_kWs
+    charge_per_kWs = batteries["ch_eff"] / dt_s
+    discharge_per_kWs = 1 / (batteries["dis_eff"] * dt_s)
+    stored_per_charge = dt_s / batteries["ch_eff"]
+    stored_per_discharge = dt_s * batteries["dis_eff"]
+    max_energy_kWs = max_battery_kWs.sum()
+    min_energy_kWs = min_battery_kWs @ is_cbes
+    energy_kWs = np.empty((n_steps + 1, len(capacity_kWs)))
+    energy_kWs[0] = batteries["initial_SoC"] * capacity_kWs
+    P_battery_kW = np.zeros((n_steps, len(capacity_kWs)))
+    schedule = np.empty(n_steps)
+    PV_kW = np.empty(n_steps)
+    bound_violations = 0
+    thresholds_kW = []
+
+    for k in range(n_steps):
+        net = P_net_before_kW[k]
+        energy = energy_kWs[k]
+        if len(thresholds_kW) < len(starts) and k == starts[len(thresholds_kW)]:
+            thresholds_kW.append(window_thresholds(len(thresholds_kW), energy))
+            import_threshold, export_threshold = thresholds_kW[-1]
+        # Grid-side power limits of every battery from the power and the SoC limits
+        charge_kW = np.maximum(
+            np.minimum(P_ch_max_kW, (max_battery_kWs - energy) * charge_per_kWs), 0.0
+        )
+        discharge_kW = np.maximum(
+            np.minimum(P_dis_max_kW, (energy - min_battery_kWs) * discharge_per_kWs), 0.0
+        )
+        # Charging only from the surplus and not more than the surplus
+        charge_total_kW = charge_kW.sum()
+        discharge_total_kW = discharge_kW.sum()
+        fleet_max_kW = min(charge_total_kW, -net * min_ch_eff) if net < 0 else 0.0
+
+        # Shave the net load beyond the thresholds
+        if net < 0:
+            fleet_kW = max(-net - export_threshold, 0.0)
+        else:
+            fleet_kW = -max(net - import_threshold, 0.0)
+        # Keep the reserves, discharging/charging beyond the thresholds if needed
+        fleet_kW = min(
+            fleet_kW,
+            _fleet_power(
+                max_energy_kWs - energy.sum() - reserved_headroom_kWs[k + 1],
+                dt_s,
+                batteries,
+            ),
+        )
+        fleet_kW = max(
+            fleet_kW,
+            _fleet_power(
+                min_energy_kWs + reserved_energy_kWs[k + 1] - energy @ is_cbes,
+                dt_s,
+                batteries,
+            ),
+        )
+        # Keep P_net_after_kW within the bounds (no import beyond the deficit / in case of surplus)
+        low = max(-discharge_total_kW, lower_bound[k] - net - curtailment_kW[k])
+        high = min(fleet_max_kW, min(upper_bound[k], max(net, 0.0)) - net)
+        if low <= high + TOLERANCE:
+            fleet_kW = min(max(fleet_kW, low), high)
+        else:
+            bound_violations += 1
+            fleet_kW = min(max(fleet_kW, -discharge_total_kW), fleet_max_kW)
+
+        # Share the fleet power among the batteries
+        if fleet_kW > 0:
+            if has_hbes and k < day_end_position:
+                # Household batteries are charged first until the end of the day
+                P_kW = _share(fleet_kW, charge_kW * is_hbes)
+                P_kW += _share(fleet_kW - P_kW.sum(), charge_kW * is_cbes)
+            else:
+                P_kW = _share(fleet_kW, charge_kW)
+            energy_kWs[k + 1] = energy + P_kW * stored_per_charge
+        elif fleet_kW < 0:
+            P_kW = -_share(-fleet_kW, discharge_kW)
+            energy_kWs[k + 1] = energy + P_kW * stored_per_discharge
+        else:
+            P_kW = 0.0
+            energy_kWs[k + 1] = energy
+        P_battery_kW[k] = P_kW
+
+        # PV is curtailed only as far as needed for the lower bound
+        P_net_after = net + fleet_kW
+        curtailed_kW = min(max(lower_bound[k] - P_net_after, 0.0), curtailment_kW[k])
+        schedule[k] = P_net_after + curtailed_kW
+        PV_kW[k] = generation_kW[k] - curtailed_kW
+
+    return (
+        schedule,
+        energy_kWs / capacity_kWs,
+        P_battery_kW,
+        PV_kW,
+        bound_violations,
+        thresholds_kW,
+    )
+
+
+def _fleet_power(energy_kWs, dt_s, batteries):
+    """Grid-side fleet power (charging positive) changing the stored energy by energy_kWs."""
+    if energy_kWs >= 0:
+        return energy_kWs / (dt_s * batteries["ch_factor"])
+    return energy_kWs / (dt_s * batteries["dis_factor"])
+
+
+def _remaining_energy(P_kW, dt_s, batteries):
+    """Stored energy change of the fleet from every time step to the end of the horizon
+    (one element longer than P_kW, ending with 0) for the grid-side fleet powers P_kW."""
+    energy_kWs = (
+        np.where(P_kW > 0, P_kW * batteries["ch_factor"], P_kW * batteries["dis_factor"])
+        * dt_s
+    )
+    return np.append(np.cumsum(energy_kWs[::-1])[::-1], 0.0)
+
+
+def _share(power_kW, limits_kW):
+    """Share a power among the batteries in proportion to their limits (never above them)."""
+    total_kW = limits_kW.sum()
+    if power_kW <= 0 or total_kW <= 0:
+        return np.zeros(len(limits_kW))
+    return limits_kW * min(power_kW / total_kW, 1.0)
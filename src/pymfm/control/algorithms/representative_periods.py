@@ -0,0 +1,350 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from typing import Tuple
+import numpy as np
+import pandas as pd
+from pyomo.environ import SolverFactory
+from pyomo.core import *
+from scipy.cluster.vq import kmeans2
+from pymfm.control.algorithms import optimization_based as OptB
+from pymfm.control.utils.solver_resources import solver_options
+from pymfm.control.utils.time_resolution import STEP_COLUMN
+
+# Length of a period in hours
+PERIOD_HOURS = 24
+# Seed of the clustering, for reproducible representative periods
+CLUSTERING_SEED = 0
+
+
+def cluster_periods(
+    P_load_gen: pd.DataFrame, n_periods: int, period_hours: float = PERIOD_HOURS
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Cluster the periods (by default days) of a forecast into representative periods.
+
+    The periods are clustered by k-means on their load and generation profiles (each normalized
+    by its maximum), and every cluster is represented by its medoid, i.e. the actual period
+    closest to the cluster centre, so that the forecast and the P_net_after_kW bounds of the
+    representative periods stay consistent.
+
+    Parameters
+    ----------
+    P_load_gen : pd.DataFrame
+        load and generation forecast time series of float type, with a uniform time step and
+        covering whole periods.
+    n_periods : int
+        number of representative periods.
+    period_hours : float, optional
+        length of a period in hours, by default PERIOD_HOURS
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        the (ascending) positions of the representative periods among all periods, and for every
+        period the position of its representative period in the first array.
+    """
+    steps = _steps_per_period(P_load_gen.index, period_hours)
+    n_all = len(P_load_gen) // steps
+    if not 0 < n_periods <= n_all:
+        raise ValueError(
+            f"The number of representative periods has to be between 1 and the number of "
+            f"periods ({n_all}), it was {n_periods}."
+        )
+    features = np.hstack(
+        [
+            (column / max(np.abs(column).max(), 1e-9)).reshape(n_all, steps)
+            for column in (
+                P_load_gen.P_load_kW.to_numpy(float),
+                P_load_gen.P_gen_kW.to_numpy(float),
+            )
+        ]
+    )
+    centres, labels = kmeans2(features, n_periods, minit="++", seed=CLUSTERING_SEED)
+    # Medoid of every (non-empty) cluster
+    medoids = []
+    for cluster in np.unique(labels):
+        members = np.flatnonzero(labels == cluster)
+        distances = ((features[members] - centres[cluster]) ** 2).sum(axis=1)
+        medoids.append(members[np.argmin(distances)])
+    medoids = np.array(sorted(medoids))
+    # Every period is represented by the closest medoid
+    distances = ((features[:, None, :] - features[None, medoids, :]) ** 2).sum(axis=2)
+    return medoids, np.argmin(distances, axis=1)
+
+
+def scheduling(
+    P_load_gen: pd.DataFrame,
+    df_battery: pd.DataFrame,
+    P_net_after_kW_limits: pd.DataFrame,
+    pv_curtailment: bool,
+    n_periods: int,
+    period_hours: float = PERIOD_HOURS,
+) -> Tuple[
+    pd.Series,
+    pd.DataFrame,
+    pd.Series,
+    pd.DataFrame,
+    pd.Series,
+    pd.Series,
+    pd.Series,
+    dict,
+]:
+    """Scheduling optimization over long horizons (e.g. a full year) on representative periods.
+
+    The periods of the forecast are clustered into n_periods representative periods
+    (see cluster_periods). The optimization model is built once per representative period
+    (see optimization_based.build_model) with the SoC relative to the start of the period, and all
+    of them are solved together: the SoC at the start of every original period is linked to the
+    one of the period before by the SoC change of its representative period, and the SoC limits
+    hold for the lowest and highest SoC reached within it. Import/export are weighted by the
+    number of periods represented, while the peaks are taken over all representative periods.
+    The schedule of every original period is the one of its representative period.
+
+    Household batteries (hbes) are not required to be full at the end of every day, and bulk
+    energy is not supported. The final SoC of community batteries (cbes) is reached at the start of
+    the last time step of the horizon, as in optimization_based.
+
+    Parameters
+    ----------
+    P_load_gen : pd.DataFrame
+        load and generation forecast time series of float type, with a uniform time step and
+        covering whole periods.
+    df_battery : pd.DataFrame
+        battery specifications of float and string types.
+    P_net_after_kW_limits : pd.DataFrame
+        consisiting of upper and lower bound float time series (kW) and
+        the identifiers for the existance of any upper or lower bounds.
+    pv_curtailment : bool
+        If true, PV generation can be curtailed.
+    n_periods : int
+        number of representative periods.
+    period_hours : float, optional
+        length of a period in hours, by default PERIOD_HOURS
+
+    Returns
+    -------
+    Tuple[ pd.Series, pd.DataFrame, pd.Series, pd.DataFrame, pd.Series, pd.Series, pd.Series, dict, ]
+        pv_profile, P_bat_kW_df, P_bat_total_kW, SoC_bat_df, P_net_after_kW, upper_bound and
+        lower_bound as returned by optimization_based.post_process over the full horizon, and a
+        dictionary with the solver "status" and "termination_condition", the reduced model
+        "objective", the "representative_periods" (start timestamps) with the number of
+        periods they represent, and the error estimate of the reduction: "net_load_rmse_kW"
+        between the forecast and its representation and the "relative_energy_error" (absolute
+        deviation of the represented net energy over the absolute net energy of the forecast).
+    """
+    index = P_load_gen.index
+    steps = _steps_per_period(index, period_hours)
+    medoids, assignment = cluster_periods(P_load_gen, n_periods, period_hours)
+    weights = np.bincount(assignment, minlength=len(medoids))
+    limits = P_net_after_kW_limits.reindex(index)
+    limits[["with_upper_bound", "with_lower_bound"]] = (
+        limits[["with_upper_bound", "with_lower_bound"]].fillna(False).astype(bool)
+    )
+    limits[["upper_bound", "lower_bound"]] = limits[["upper_bound", "lower_bound"]].fillna(0)
+    # The final SoC is linked over all periods, not within the representative periods
+    period_battery = df_battery.assign(final_SoC=None)
+
+    model = ConcreteModel()
+    model.K = range(len(medoids))
+    model.D = range(len(assignment) + 1)
+    model.N = list(df_battery.index)
+    periods = []
+    for k, medoid in enumerate(medoids):
+        period = slice(medoid * steps, (medoid + 1) * steps)
+        forecast = P_load_gen.iloc[period].copy()
+        # Durations of the time steps, the representative periods follow each other in the model
+        forecast[STEP_COLUMN] = index.freq.nanos / 1e9
+        block = OptB.build_model(
+            forecast,
+            period_battery,
+            None,
+            None,
+            limits.iloc[period],
+            pv_curtailment,
+        )
+        # SoC relative to the start of the period, the SoC limits are applied in the linking
+        block.obj.deactivate()
+        block.bat_init_SoC.deactivate()
+        block.bat_min_SoC.deactivate()
+        block.bat_max_SoC.deactivate()
+        for var in block.SoC_bat.values():
+            var.domain = Reals
+        setattr(model, f"period_{k}", block)
+        periods.append(block)
+
+    def period_start(model, k, n):
+        return periods[k].SoC_bat[n, periods[k].start_time] == 0
+
+    def period_end(k, n):
+        return periods[k].SoC_bat[n, periods[k].T_SoC_bat[-1]]
+
+    # Lowest/highest relative SoC within every representative period
+    model.SoC_min = Var(model.K, model.N)
+    model.SoC_max = Var(model.K, model.N)
+    # SoC at the start of every original period (and at the end of the horizon)
+    model.SoC_start = Var(model.N, model.D)
+    model.alpha_imp = Var(within=NonNegativeReals)
+    model.alpha_exp = Var(within=NonNegativeReals)
+
+    model.period_start = Constraint(model.K, model.N, rule=period_start)
+    model.period_min = Constraint(
+        [(k, n, t) for k in model.K for n in model.N for t in periods[k].T_SoC_bat],
+        rule=lambda model, k, n, t: model.SoC_min[k, n] <= periods[k].SoC_bat[n, t],
+    )
+    model.period_max = Constraint(
+        [(k, n, t) for k in model.K for n in model.N for t in periods[k].T_SoC_bat],
+        rule=lambda model, k, n, t: periods[k].SoC_bat[n, t] <= model.SoC_max[k, n],
+    )
+    model.initial_SoC = Constraint(
+        model.N,
+        rule=lambda model, n: model.SoC_start[n, 0] == df_battery.initial_SoC[n],
+    )
+    model.linking = Constraint(
+        model.N,
+        model.D[:-1],
+        rule=lambda model, n, d: model.SoC_start[n, d + 1]
+        == model.SoC_start[n, d] + period_end(assignment[d], n),
+    )
+    model.linked_min_SoC = Constraint(
+        model.N,
+        model.D[:-1],
+        rule=lambda model, n, d: df_battery.min_SoC[n]
+        <= model.SoC_start[n, d] + model.SoC_min[assignment[d], n],
+    )
+    model.linked_max_SoC = Constraint(
+        model.N,
+        model.D[:-1],
+        rule=lambda model, n, d: model.SoC_start[n, d] + model.SoC_max[assignment[d], n]
+        <= df_battery.max_SoC[n],
+    )
+    # As in optimization_based, the final SoC is reached at the start of the last time step
+    last = periods[assignment[-1]]
+    model.final_SoC = Constraint(
+        model.N,
+        rule=lambda model, n: model.SoC_start[n, model.D[-2]] + last.SoC_bat[n, last.end_time]
+        == df_battery.final_SoC[n]
+        if df_battery.bat_type[n] != "hbes" and pd.notna(df_battery.final_SoC[n])
+        else Constraint.Feasible,
+    )
+    model.peak_imp = Constraint(
+        model.K, rule=lambda model, k: periods[k].alpha_imp <= model.alpha_imp
+    )
+    model.peak_exp = Constraint(
+        model.K, rule=lambda model, k: periods[k].alpha_exp <= model.alpha_exp
+    )
+    model.obj = Objective(
+        expr=sum(
+            weights[k]
+            * sum(
+                block.P_exp_kW[t] * block.x_exp[t] + block.P_imp_kW[t] * block.x_imp[t]
+                for t in block.T
+            )
+            for k, block in enumerate(periods)
+        )
+        + model.alpha_imp
+        + model.alpha_exp,
+        sense=minimize,
+    )
+
+    solver = (
+        SolverFactory(OptB.SOLVER_NAME)
+        .solve(model, options=solver_options(OptB.SOLVER_NAME))
+        .solver
+    )
+
+    # Expand the representative periods back to the full horizon
+    results = [OptB.post_process(block, period_battery) for block in periods]
+    PV_profile, P_bat_kW_df, P_bat_total_kW, P_net_after_kW = (
+        _expand([result[i] for result in results], assignment, index)
+        for i in (0, 1, 2, 4)
+    )
+    relative_SoC = _expand(
+        [result[3].iloc[:-1] for result in results], assignment, index
+    )
+    SoC_start = pd.DataFrame(
+        [[value(model.SoC_start[n, d]) for n in model.N] for d in model.D],
+        columns=df_battery.index,
+    )
+    delta_T = pd.to_timedelta(index.freq)
+    SoC_bat_df = pd.concat(
+        [
+            relative_SoC + SoC_start.iloc[:-1].to_numpy().repeat(steps, axis=0),
+            pd.DataFrame(
+                SoC_start.iloc[-1:].to_numpy(),
+                index=[index[-1] + delta_T],
+                columns=df_battery.index,
+            ),
+        ]
+    )
+    upper_bound_kW = limits.upper_bound.where(limits.with_upper_bound)
+    lower_bound_kW = limits.lower_bound.where(limits.with_lower_bound)
+
+    # Error estimate of the reduction: deviation of the represented from the forecast net load
+    P_net_before_kW = (P_load_gen.P_load_kW - P_load_gen.P_gen_kW).to_numpy(float)
+    represented_kW = P_net_before_kW.reshape(-1, steps)[medoids][assignment].ravel()
+    deviation_kW = represented_kW - P_net_before_kW
+    info = {
+        "status": solver.status,
+        "termination_condition": solver.termination_condition,
+        "objective": value(model.obj),
+        "representative_periods": {
+            index[medoid * steps]: int(weights[k]) for k, medoid in enumerate(medoids)
+        },
+        "net_load_rmse_kW": float(np.sqrt((deviation_kW**2).mean())),
+        "relative_energy_error": float(
+            np.abs(deviation_kW).sum() / max(np.abs(P_net_before_kW).sum(), 1e-9)
+        ),
+    }
+
+    return (
+        PV_profile,
+        P_bat_kW_df,
+        P_bat_total_kW,
+        SoC_bat_df,
+        P_net_after_kW,
+        upper_bound_kW,
+        lower_bound_kW,
+        info,
+    )
+
+
+def _steps_per_period(index: pd.DatetimeIndex, period_hours: float) -> int:
+    """Number of time steps per period of a uniform forecast covering whole periods."""
+    if index.freq is None:
+        raise ValueError(
+            "Representative periods require generation_and_load with a uniform time step."
+        )
+    steps = pd.Timedelta(hours=period_hours) / pd.to_timedelta(index.freq)
+    if steps != int(steps) or len(index) % int(steps):
+        raise ValueError(
+            f"generation_and_load has to cover whole periods of {period_hours} hours."
+        )
+    return int(steps)
+
+
+def _expand(period_values, assignment, index):
+    """Concatenate the values of the representative periods in the order of the periods they
+    represent, on the full horizon."""
+    expanded = pd.concat([period_values[k] for k in assignment])
+    expanded.index = index
+    return expanded.astype(float)
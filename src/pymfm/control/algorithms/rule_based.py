@@ -21,9 +21,11 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
+import numpy as np
 import pandas as pd
 from datetime import timedelta
 from pymfm.control.utils.data_input import BatterySpecs
+from pymfm.control.utils.data_output import OutputColumns
 
 
 def near_real_time(measurements_request_dict: dict, battery_specs: BatterySpecs):
@@ -179,104 +181,139 @@ def scheduling(P_load_gen: pd.Series, battery_specs: BatterySpecs, delta_T: time
         associated energy in kWs "bat_energy_kWs", and imported "import_kW" and exported "export_kW" powers
         afer control action in kW are reported.
     """
-    # initialize
+    # Convert timedelta to float in terms of seconds
+    delta_time_in_sec = delta_T.total_seconds()
+    P_net_before_kW = P_load_gen.P_load_kW - P_load_gen.P_gen_kW
+    P_net_after_kW, P_bat_kW, bat_energy_kWs, import_kW, export_kW = _scheduling_step(
+        P_net_before_kW, battery_specs.initial_SoC, battery_specs, delta_time_in_sec
+    )
     output_ds = pd.Series(
-        index=[
-            "P_net_before_kW",
-            "P_net_after_kW",
-            "P_bat_kW",
-            "SoC_bat",
-            "bat_energy_kWs",
-            "import_kW",
-            "export_kW",
-        ],
+        {
+            "P_net_before_kW": P_net_before_kW,
+            "P_net_after_kW": P_net_after_kW,
+            "P_bat_kW": P_bat_kW,
+            "SoC_bat": (bat_energy_kWs / battery_specs.bat_capacity_kWs) * 100,
+            "bat_energy_kWs": bat_energy_kWs,
+            "import_kW": import_kW,
+            "export_kW": export_kW,
+        },
         dtype=float,
     )
-    output_ds.import_kW = 0
-    output_ds.export_kW = 0
-    output_ds.bat_energy_kWs = 0
+
+    return output_ds
+
+
+def scheduling_profile(
+    P_load_gen: pd.DataFrame,
+    battery_specs: BatterySpecs,
+    delta_T: timedelta,
+    dtype: str = "float64",
+) -> pd.DataFrame:
+    """
+    Rule based scheduling (see scheduling) of the whole load and generation forecast, with the
+    SoC reached at each time step as the initial SoC of the next one.
+
+    Parameters
+    ----------
+    P_load_gen : pd.DataFrame
+        load and generation forecast time series of float type
+    battery_specs : pymfm.control.utils.data_input.BatterySpecs
+        battery specifications as in scheduling (not modified)
+    delta_T : timedelta
+        Pandas TimeDelta object (in day unit) representing time intervals of the forecast time series.
+    dtype : str, optional
+        float type of the output columns, "float64" or "float32", by default "float64"
+
+    Returns
+    -------
+    pd.DataFrame
+        indexed by the forecast timestamps, the net power consumption before "P_net_before_kW"
+        and after "P_net_after_kW" control action in kW, the battery power setpoint "P_bat_kW"
+        in kW and the battery SoC in % "SoC_bat" at each time step.
+    """
     # Convert timedelta to float in terms of seconds
     delta_time_in_sec = delta_T.total_seconds()
-    output_ds.P_bat_kW = P_load_gen.P_load_kW - P_load_gen.P_gen_kW
+    output = OutputColumns(
+        P_load_gen.index, ["P_net_before_kW", "P_net_after_kW", "P_bat_kW", "SoC_bat"], dtype
+    )
+    P_net_before_kW = (P_load_gen.P_load_kW - P_load_gen.P_gen_kW).to_numpy(float)
+    P_net_after_kW = np.empty_like(P_net_before_kW)
+    P_bat_kW = np.empty_like(P_net_before_kW)
+    SoC_bat = np.empty_like(P_net_before_kW)
+
+    initial_SoC = battery_specs.initial_SoC
+    for t, P_net_before_kW_t in enumerate(P_net_before_kW.tolist()):
+        P_net_after_kW[t], P_bat_kW[t], bat_energy_kWs, _, _ = _scheduling_step(
+            P_net_before_kW_t, initial_SoC, battery_specs, delta_time_in_sec
+        )
+        SoC_bat[t] = (bat_energy_kWs / battery_specs.bat_capacity_kWs) * 100
+        # The SoC reached is the initial SoC of the next time step
+        initial_SoC = bat_energy_kWs / battery_specs.bat_capacity_kWs
+
+    output["P_net_before_kW"] = P_net_before_kW
+    output["P_net_after_kW"] = P_net_after_kW
+    output["P_bat_kW"] = P_bat_kW
+    output["SoC_bat"] = SoC_bat
+    return output.to_df()
+
+
+def _scheduling_step(
+    P_net_before_kW: float,
+    initial_SoC: float,
+    battery_specs: BatterySpecs,
+    delta_time_in_sec: float,
+):
+    """Rule based control of one time step (see scheduling) starting at initial_SoC, returning
+    P_net_after_kW, P_bat_kW (charging: positiv, discharging: negativ), bat_energy_kWs,
+    import_kW and export_kW."""
+    import_kW = 0.0
+    export_kW = 0.0
+    initial_energy_kWs = initial_SoC * battery_specs.bat_capacity_kWs
+    P_bat_kW = P_net_before_kW
 
-    if output_ds.P_bat_kW > 0:
-        output_ds.bat_energy_kWs = (
-            battery_specs.initial_SoC * battery_specs.bat_capacity_kWs
-            - (battery_specs.dis_efficiency * output_ds.P_bat_kW * delta_time_in_sec)
+    if P_bat_kW > 0:
+        bat_energy_kWs = initial_energy_kWs - (
+            battery_specs.dis_efficiency * P_bat_kW * delta_time_in_sec
         )
-        output_ds.P_bat_kW = output_ds.P_bat_kW / battery_specs.dis_efficiency
+        P_bat_kW = P_bat_kW / battery_specs.dis_efficiency
     else:
-        output_ds.bat_energy_kWs = (
-            battery_specs.initial_SoC * battery_specs.bat_capacity_kWs
-            - (output_ds.P_bat_kW * delta_time_in_sec) / battery_specs.ch_efficiency
+        bat_energy_kWs = (
+            initial_energy_kWs - (P_bat_kW * delta_time_in_sec) / battery_specs.ch_efficiency
         )
-        output_ds.P_bat_kW = output_ds.P_bat_kW * battery_specs.ch_efficiency
+        P_bat_kW = P_bat_kW * battery_specs.ch_efficiency
     # discharging
-    if output_ds.P_bat_kW > 0:
-        act_ptcb = output_ds.P_bat_kW
-        if abs(output_ds.P_bat_kW) >= battery_specs.P_dis_max_kW:
-            output_ds.import_kW = output_ds.P_bat_kW - battery_specs.P_dis_max_kW
-            output_ds.P_bat_kW = battery_specs.P_dis_max_kW
-            output_ds.bat_energy_kWs = (
-                battery_specs.initial_SoC * battery_specs.bat_capacity_kWs
-                - (
-                    battery_specs.dis_efficiency
-                    * battery_specs.P_dis_max_kW
-                    * delta_time_in_sec
-                )
+    if P_bat_kW > 0:
+        act_ptcb = P_bat_kW
+        if abs(P_bat_kW) >= battery_specs.P_dis_max_kW:
+            import_kW = P_bat_kW - battery_specs.P_dis_max_kW
+            P_bat_kW = battery_specs.P_dis_max_kW
+            bat_energy_kWs = initial_energy_kWs - (
+                battery_specs.dis_efficiency * battery_specs.P_dis_max_kW * delta_time_in_sec
             )
-        if (
-            output_ds.bat_energy_kWs
-            < battery_specs.min_SoC * battery_specs.bat_capacity_kWs
-        ):
-            output_ds.import_kW = output_ds.import_kW + (
-                (
-                    battery_specs.min_SoC * battery_specs.bat_capacity_kWs
-                    - output_ds.bat_energy_kWs
-                )
+        if bat_energy_kWs < battery_specs.min_SoC * battery_specs.bat_capacity_kWs:
+            import_kW = import_kW + (
+                (battery_specs.min_SoC * battery_specs.bat_capacity_kWs - bat_energy_kWs)
                 / delta_time_in_sec
             )
-            output_ds.P_bat_kW = act_ptcb - output_ds.import_kW
-            output_ds.bat_energy_kWs = (
-                battery_specs.min_SoC * battery_specs.bat_capacity_kWs
-            )
+            P_bat_kW = act_ptcb - import_kW
+            bat_energy_kWs = battery_specs.min_SoC * battery_specs.bat_capacity_kWs
     # charging
-    if output_ds.P_bat_kW < 0:
-        act_ptcb = output_ds.P_bat_kW
-        if abs(output_ds.P_bat_kW) <= battery_specs.P_ch_max_kW:
-            output_ds.export_kW = 0
-            pass
-        else:
-            output_ds.export_kW = abs(output_ds.P_bat_kW) - battery_specs.P_ch_max_kW
-            output_ds.P_bat_kW = -battery_specs.P_ch_max_kW
-            output_ds.bat_energy_kWs = (
-                battery_specs.initial_SoC * battery_specs.bat_capacity_kWs
-                + (battery_specs.P_ch_max_kW * delta_time_in_sec)
-                / battery_specs.ch_efficiency
-            )
-        if (
-            output_ds.bat_energy_kWs
-            > battery_specs.max_SoC * battery_specs.bat_capacity_kWs
-        ):
-            output_ds.export_kW = output_ds.export_kW + (
-                (
-                    output_ds.bat_energy_kWs
-                    - battery_specs.max_SoC * battery_specs.bat_capacity_kWs
-                )
+    if P_bat_kW < 0:
+        act_ptcb = P_bat_kW
+        if abs(P_bat_kW) > battery_specs.P_ch_max_kW:
+            export_kW = abs(P_bat_kW) - battery_specs.P_ch_max_kW
+            P_bat_kW = -battery_specs.P_ch_max_kW
+            bat_energy_kWs = initial_energy_kWs + (
+                battery_specs.P_ch_max_kW * delta_time_in_sec
+            ) / battery_specs.ch_efficiency
+        if bat_energy_kWs > battery_specs.max_SoC * battery_specs.bat_capacity_kWs:
+            export_kW = export_kW + (
+                (bat_energy_kWs - battery_specs.max_SoC * battery_specs.bat_capacity_kWs)
                 / delta_time_in_sec
             )
-            output_ds.P_bat_kW = -(abs(act_ptcb) - (output_ds.export_kW))
-            output_ds.bat_energy_kWs = (
-                battery_specs.max_SoC * battery_specs.bat_capacity_kWs
-            )
-        output_ds.P_bat_kW = float(output_ds.P_bat_kW)
-    output_ds.P_net_before_kW = P_load_gen.P_load_kW - P_load_gen.P_gen_kW
-    output_ds.P_net_after_kW = -output_ds.export_kW + output_ds.import_kW
-    output_ds.SoC_bat = (
-        output_ds.bat_energy_kWs / battery_specs.bat_capacity_kWs
-    ) * 100
-    output_ds.P_bat_kW = (
-        output_ds.P_bat_kW * -1
-    )  # charging: positiv, discharging: negativ
+            P_bat_kW = -(abs(act_ptcb) - export_kW)
+            bat_energy_kWs = battery_specs.max_SoC * battery_specs.bat_capacity_kWs
+    P_net_after_kW = -export_kW + import_kW
 
-    return output_ds
+    # charging: positiv, discharging: negativ
+    return P_net_after_kW, P_bat_kW * -1, bat_energy_kWs, import_kW, export_kW
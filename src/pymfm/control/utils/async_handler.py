@@ -0,0 +1,197 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+import asyncio
+import functools
+import os
+import pickle
+import signal
+import sys
+from typing import Callable, Union
+import pandas as pd
+from pymfm.control.utils import data_output
+from pymfm.control.utils.data_input import Bulk, InputData
+from pymfm.control.utils.lazy import lazy_import
+from pymfm.control.utils.mode_logic_handler import handle_input
+
+OptB = lazy_import("pymfm.control.algorithms.optimization_based")
+
+
+async def run_out_of_process(function: Callable, *args, **kwargs):
+    """
+    Run a function in a child Python process and await its result without blocking the event
+    loop.
+
+    The arguments are sent to the child process and the result is returned from it pickled,
+    so the function has to be importable (defined at module level). The child process runs in
+    its own process group (on POSIX), and cancelling the awaiting task kills the whole group.
+    The gurobi solve runs inside the child itself (pyomo solves through gurobipy in-process);
+    killing the group also stops the processes the child or the function starts, e.g. the
+    workers of battery sizing or solvers run as executables. Output of the child process
+    (progress messages and solver logs) goes to stderr.
+
+    :param function: Function to run.
+    :param args: Positional arguments of the function.
+    :param kwargs: Keyword arguments of the function.
+    :return: Result of the function, exceptions raised by it are raised again.
+    """
+    loop = asyncio.get_running_loop()
+    job = await loop.run_in_executor(None, pickle.dumps, (function, args, kwargs))
+    # The child process imports modules from the same paths as this process
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-m",
+        __name__,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        env=env,
+        start_new_session=hasattr(os, "killpg"),
+    )
+    try:
+        stdout, _ = await process.communicate(job)
+    except BaseException:
+        # Cancelled (or failed) while waiting: do not leave the solve running
+        _kill_process_group(process)
+        if process.returncode is None:
+            await process.wait()
+        raise
+    if process.returncode != 0 or not stdout:
+        raise RuntimeError(
+            f"The child process running {function.__qualname__} exited with code "
+            f"{process.returncode}."
+        )
+    succeeded, result = await loop.run_in_executor(None, pickle.loads, stdout)
+    if not succeeded:
+        raise result
+    return result
+
+
+def _kill_process_group(process: asyncio.subprocess.Process):
+    """Kill a child process started by run_out_of_process together with its subprocesses."""
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    elif process.returncode is None:
+        process.kill()
+
+
+async def mode_logic_handler_async(data: Union[InputData, dict, str]):
+    """
+    Asynchronous variant of mode_logic_handler, run in a child process (see run_out_of_process).
+
+    Parsing the input, the solve and the post-processing all take place in the child process,
+    so that one event loop can drive many concurrent control runs.
+
+    :param data: InputData object, its (JSON) dictionary or the name of its JSON file.
+    :return: Tuple containing mode logic information, output DataFrame, and solver status.
+    """
+    return await run_out_of_process(handle_input, data)
+
+
+async def scheduling_async(
+    P_load_gen: pd.DataFrame,
+    df_battery: pd.DataFrame,
+    day_end,
+    bulk_data: Bulk,
+    P_net_after_kW_limits: pd.DataFrame,
+    pv_curtailment: bool,
+    elastic: bool = False,
+):
+    """
+    Asynchronous variant of optimization_based.scheduling, run in a child process
+    (see run_out_of_process).
+
+    :return: Same results as optimization_based.scheduling.
+    """
+    return await run_out_of_process(
+        OptB.scheduling,
+        P_load_gen,
+        df_battery,
+        day_end,
+        bulk_data,
+        P_net_after_kW_limits,
+        pv_curtailment,
+        elastic,
+    )
+
+
+async def prepare_json_async(
+    mode_logic: dict,
+    output_df: pd.DataFrame,
+    output_directory: str,
+    compact: bool = False,
+    compress: bool = False,
+):
+    """
+    Asynchronous variant of data_output.prepare_json, writing the output file in a worker
+    thread.
+
+    :param mode_logic: Mode logic information.
+    :param output_df: Output DataFrame.
+    :param output_directory: Directory of the output JSON file.
+    :param compact: If true, the JSON is written without indentation and whitespace.
+    :param compress: If true, the JSON is gzip compressed into a .json.gz file.
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        None,
+        functools.partial(
+            data_output.prepare_json,
+            mode_logic,
+            output_df,
+            output_directory,
+            compact=compact,
+            compress=compress,
+        ),
+    )
+
+
+def _child_main():
+    """Entry point of the child processes of run_out_of_process: run the pickled job from stdin
+    and write the pickled outcome to stdout."""
+    # Keep stdout for the outcome, everything else (also the solver output) goes to stderr
+    result_stream = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    function, args, kwargs = pickle.load(sys.stdin.buffer)
+    try:
+        outcome = (True, function(*args, **kwargs))
+    except Exception as err:
+        outcome = (False, err)
+    sys.stdout.flush()
+    try:
+        payload = pickle.dumps(outcome, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as err:
+        payload = pickle.dumps(
+            (False, RuntimeError(f"The result cannot be returned: {err}")),
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+    result_stream.write(payload)
+    result_stream.close()
+
+
+if __name__ == "__main__":
+    _child_main()
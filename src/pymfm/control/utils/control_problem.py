@@ -0,0 +1,158 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Compiled, array-backed representation of a control input shared by all control logics."""
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+from pymfm.control.utils import data_input
+from pymfm.control.utils.data_input import BatterySpecs, InputData
+
+
+@dataclass(frozen=True)
+class ControlProblem:
+    """
+    Control input compiled once into read-only arrays over the time steps of the use case
+    window, consumed by every control logic.
+
+    The input data itself is not modified (the battery percentages are converted on copies),
+    so that several control logics can be run on one compiled problem. The DataFrames handed
+    to the control algorithms (forecasts, limits, battery_frame) are views on, or built from,
+    these arrays.
+    """
+
+    data: InputData  # The input data, for its scalar fields and options
+    timestamps: pd.DatetimeIndex  # Forecast timestamps within [uc_start, uc_end]
+    forecast_kW: np.ndarray  # Rows P_gen_kW and P_load_kW, each contiguous float64
+    upper_bound_kW: np.ndarray  # Upper bound of P_net_after_kW, 0 where there is none
+    lower_bound_kW: np.ndarray  # Lower bound of P_net_after_kW, 0 where there is none
+    with_upper_bound: np.ndarray  # Bool mask of the time steps with an upper bound
+    with_lower_bound: np.ndarray  # Bool mask of the time steps with a lower bound
+    batteries: Tuple[BatterySpecs, ...]  # Battery specifications with absolute SoC and kWs
+
+    @classmethod
+    def compile(cls, data: InputData) -> "ControlProblem":
+        """
+        Compile input data into a control problem.
+
+        :param data: InputData object containing input data.
+        :return: The compiled control problem.
+        """
+        # Battery percentages are converted to absolute values on copies of the specifications
+        specs = (
+            data.battery_specs
+            if isinstance(data.battery_specs, list)
+            else [data.battery_specs]
+        )
+        batteries = tuple(data_input.input_prep([battery.copy() for battery in specs]))
+
+        if data.generation_and_load is None:
+            # Near real-time operation works on measurements only
+            timestamps = pd.DatetimeIndex([], name="timestamp")
+            forecast_kW = np.empty((2, 0))
+            limits = pd.DataFrame(
+                {
+                    "upper_bound": np.empty(0),
+                    "with_upper_bound": np.empty(0, bool),
+                    "lower_bound": np.empty(0),
+                    "with_lower_bound": np.empty(0, bool),
+                }
+            )
+        else:
+            window = data_input.generation_and_load_to_df(
+                data.generation_and_load, start=data.uc_start, end=data.uc_end
+            )
+            timestamps = window.index
+            forecast_kW = np.ascontiguousarray(
+                window[["P_gen_kW", "P_load_kW"]].to_numpy(float).T
+            )
+            limits = data_input.P_net_after_kW_lim_to_df(
+                data.P_net_after_kW_limitation, data.generation_and_load
+            ).loc[data.uc_start : data.uc_end]
+
+        arrays = [
+            forecast_kW,
+            limits.upper_bound.to_numpy(float),
+            limits.lower_bound.to_numpy(float),
+            limits.with_upper_bound.to_numpy(bool),
+            limits.with_lower_bound.to_numpy(bool),
+        ]
+        for array in arrays:
+            array.flags.writeable = False
+        return cls(data, timestamps, *arrays, batteries)
+
+    @property
+    def pv_curtailment(self) -> Optional[float]:
+        """The PV curtailment value."""
+        if self.data.generation_and_load is None:
+            return None
+        return self.data.generation_and_load.pv_curtailment
+
+    def forecasts(self) -> pd.DataFrame:
+        """
+        :return: DataFrame of P_gen_kW and P_load_kW indexed by timestamp (with the frequency of
+            the forecast), a read-only view on forecast_kW.
+        """
+        return pd.DataFrame(
+            self.forecast_kW.T, index=self.timestamps, columns=["P_gen_kW", "P_load_kW"]
+        )
+
+    def limits(self) -> pd.DataFrame:
+        """
+        :return: DataFrame of the P_net_after_kW bounds and their masks as returned by
+            data_input.P_net_after_kW_lim_to_df, indexed by timestamp.
+        """
+        return pd.DataFrame(
+            {
+                "upper_bound": self.upper_bound_kW,
+                "with_upper_bound": self.with_upper_bound,
+                "lower_bound": self.lower_bound_kW,
+                "with_lower_bound": self.with_lower_bound,
+            },
+            index=self.timestamps,
+        )
+
+    def battery_specs(self) -> Union[BatterySpecs, List[BatterySpecs]]:
+        """
+        :return: Fresh copies of the prepared battery specifications, a list if the input data
+            holds a list (control logics may update them, e.g. the initial SoC).
+        """
+        copies = [battery.copy() for battery in self.batteries]
+        return copies if isinstance(self.data.battery_specs, list) else copies[0]
+
+    def battery_frame(self) -> pd.DataFrame:
+        """
+        :return: DataFrame of the prepared battery specifications as returned by
+            data_input.battery_to_df.
+        """
+        return data_input.battery_to_df([battery.copy() for battery in self.batteries])
+
+    def measurements_request(self) -> Optional[dict]:
+        """
+        :return: Measurements and request of near real-time operation as a dictionary.
+        """
+        if self.data.measurements_request is None:
+            return None
+        return data_input.measurements_request_to_dict(self.data.measurements_request)
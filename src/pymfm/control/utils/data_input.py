@@ -23,12 +23,19 @@
 
 from typing import Dict, Optional, List, Union
 import json
+import numpy as np
 import pandas as pd
-from pydantic import BaseModel as PydBaseModel, Field, ValidationError, validator
-from datetime import datetime, timezone, timedelta
+from pandas.tseries.frequencies import to_offset
+from pydantic import (
+    BaseModel as PydBaseModel,
+    Field,
+    ValidationError,
+    root_validator,
+    validator,
+)
+from datetime import date, datetime, timezone, timedelta
 from enum import Enum
-from astral.sun import sun
-from astral.location import LocationInfo
+from functools import lru_cache
 
 
 def open_json(filename):
@@ -71,6 +78,9 @@ class ControlLogic(StrEnum):
 
     RULE_BASED = "rule_based"  # Rule-based control logic.
     OPTIMIZATION_BASED = "optimization_based"  # Optimization-based control logic.
+    TIERED = "tiered"  # Optimization-based control with a rule-based fallback.
+    DYNAMIC_PROGRAMMING = "dynamic_programming"  # Solver-free single-battery scheduling.
+    PEAK_SHAVING = "peak_shaving"  # Forecast-aware peak-shaving heuristic scheduling.
 
 
 class OperationMode(StrEnum):
@@ -82,6 +92,15 @@ class OperationMode(StrEnum):
     SCHEDULING = "scheduling"  # Scheduling operation mode.
 
 
+class OutputDtype(StrEnum):
+    """
+    An enumeration class representing the float types of the control output.
+    """
+
+    FLOAT64 = "float64"  # Double precision output.
+    FLOAT32 = "float32"  # Single precision output, half the memory.
+
+
 class Bulk(BaseModel):
     """
     Pydantic model representing bulk energy data.
@@ -104,6 +123,92 @@ class Bulk(BaseModel):
     )
 
 
+class SiteLocation(BaseModel):
+    """
+    Pydantic model representing the geographic location of the microgrid site.
+    """
+
+    latitude: float = Field(
+        ..., alias="latitude", description="The latitude of the site in degrees (north positive)."
+    )
+    longitude: float = Field(
+        ..., alias="longitude", description="The longitude of the site in degrees (east positive)."
+    )
+
+    @validator("latitude")
+    def latitude_range(cls, v):
+        """
+        Validator to ensure the latitude is within [-90, 90] degrees.
+
+        :param v: The value of latitude.
+        :return: The validated value.
+        """
+        if not -90 <= v <= 90:
+            raise ValueError(f"latitude has to be within [-90, 90] degrees, it was {v}.")
+        return v
+
+    @validator("longitude")
+    def longitude_range(cls, v):
+        """
+        Validator to ensure the longitude is within [-180, 180] degrees.
+
+        :param v: The value of longitude.
+        :return: The validated value.
+        """
+        if not -180 <= v <= 180:
+            raise ValueError(f"longitude has to be within [-180, 180] degrees, it was {v}.")
+        return v
+
+
+# Site of the sunset based day_end if no location is given (Berlin)
+DEFAULT_LOCATION = SiteLocation(latitude=52.52, longitude=13.40)
+
+
+@lru_cache(maxsize=1024)
+def sunset(latitude: float, longitude: float, day: date) -> datetime:
+    """Sunset time (UTC) at a location on a day, cached per (location, day).
+
+    Parameters
+    ----------
+    latitude : float
+        latitude of the location in degrees.
+    longitude : float
+        longitude of the location in degrees.
+    day : date
+        the day of the sunset.
+
+    Returns
+    -------
+    datetime
+        the sunset time in UTC.
+    """
+    from astral import Observer
+    from astral.sun import sunset as astral_sunset
+
+    return astral_sunset(Observer(latitude, longitude), date=day, tzinfo=timezone.utc)
+
+
+def nearest_timestamp(index: pd.DatetimeIndex, t: datetime) -> datetime:
+    """Timestamp of a sorted index nearest to t (the earlier one on a tie).
+
+    Parameters
+    ----------
+    index : pd.DatetimeIndex
+        sorted timestamps.
+    t : datetime
+        the time to look up.
+
+    Returns
+    -------
+    datetime
+        the nearest timestamp of index.
+    """
+    i = index.searchsorted(t)
+    if i == len(index) or (i > 0 and t - index[i - 1] <= index[i] - t):
+        i -= 1
+    return index[i].to_pydatetime()
+
+
 class P_net_after_kWLimitation(BaseModel):
     """
     Pydantic model representing P_net_after limitations.
@@ -126,6 +231,35 @@ class P_net_after_kWLimitation(BaseModel):
     )
 
 
+class TimeResolution(BaseModel):
+    """
+    Pydantic model representing a block of the optimization horizon with its own step length.
+    """
+
+    step_minutes: float = Field(
+        ...,
+        alias="step_minutes",
+        description="The length of the time steps within the block in minutes.",
+    )
+    until_minutes: Optional[float] = Field(
+        None,
+        alias="until_minutes",
+        description="The end of the block in minutes after uc_start (optional, default: until uc_end).",
+    )
+
+    @validator("step_minutes")
+    def step_minutes_positive(cls, v):
+        """
+        Validator to ensure the step length is positive.
+
+        :param v: The value of step_minutes.
+        :return: The validated value.
+        """
+        if v <= 0:
+            raise ValueError(f"step_minutes has to be positive, it was {v}.")
+        return v
+
+
 class GenerationAndLoadValues(BaseModel):
     """
     Pydantic model representing generation and load forecast data at a specific timestamp.
@@ -142,6 +276,281 @@ class GenerationAndLoadValues(BaseModel):
     )
 
 
+class TimeSeriesColumns:
+    """
+    Base of columnar time series: a DatetimeIndex and a float array per column.
+
+    A time series is accepted either as a list of values, one per timestamp (dictionaries or
+    models of the ROW type), or in the compact form of a dictionary with the start timestamp,
+    the freq (time step as e.g. "15min", "PT15M" or seconds) and a parallel array per column.
+    Both forms are parsed straight into columns, so that long time series do not instantiate a
+    model per timestamp. Indexing and iterating still yield ROW models, built on demand.
+    """
+
+    ROW = None  # Model of the values of a single timestamp
+    COLUMNS = ()  # Names of the float columns
+    NAME = ""  # Name of the time series in error messages
+
+    @classmethod
+    def __get_validators__(cls):
+        yield cls.validate
+
+    @classmethod
+    def __modify_schema__(cls, field_schema: dict):
+        field_schema.update(
+            anyOf=[
+                {"type": "array", "items": cls.ROW.schema()},
+                {
+                    "type": "object",
+                    "properties": {
+                        "start": {"type": "string", "format": "date-time"},
+                        "freq": {"type": ["string", "number"]},
+                        **{
+                            name: {"type": "array", "items": {"type": ["number", "null"]}}
+                            for name in cls.COLUMNS
+                        },
+                    },
+                    "required": ["start", "freq"],
+                },
+            ]
+        )
+
+    @classmethod
+    def validate(cls, v) -> "TimeSeriesColumns":
+        """
+        Parse a time series given as a list of values or in the compact form into columns.
+
+        :param v: The raw time series.
+        :return: The parsed columns.
+        """
+        if isinstance(v, cls):
+            return v
+        if isinstance(v, dict):
+            columns = [v.get(name) for name in cls.COLUMNS]
+            lengths = {len(column) for column in columns if column is not None}
+            if len(lengths) > 1:
+                raise ValueError(
+                    f"the arrays of {', '.join(cls.COLUMNS)} of {cls.NAME} have to have the same length."
+                )
+            length = lengths.pop() if lengths else 0
+            if not length:
+                raise ValueError(f"{cls.NAME} arrays have to be non-empty.")
+            timestamps = _compact_index(v.get("start"), v.get("freq"), length, cls.NAME)
+            columns = [(None,) * length if column is None else column for column in columns]
+        elif isinstance(v, (list, tuple)) and v:
+            if isinstance(v[0], dict):
+                timestamps, *columns = (
+                    [row.get(name) for row in v] for name in ("timestamp",) + cls.COLUMNS
+                )
+            else:
+                timestamps, *columns = (
+                    [getattr(row, name, None) for row in v]
+                    for name in ("timestamp",) + cls.COLUMNS
+                )
+            timestamps = _parse_timestamps(timestamps, cls.NAME)
+        else:
+            raise ValueError(
+                f"{cls.NAME} has to be a non-empty list of values or a dictionary of start, freq "
+                f"and arrays of {', '.join(cls.COLUMNS)}."
+            )
+        return cls.from_columns(
+            timestamps, [np.asarray(column, dtype=float) for column in columns]
+        )
+
+    @classmethod
+    def from_columns(
+        cls, timestamps: pd.DatetimeIndex, columns: List[np.ndarray]
+    ) -> "TimeSeriesColumns":
+        """
+        Validate parsed timestamps and float columns (in the order of COLUMNS).
+
+        :param timestamps: The timestamps, named "timestamp".
+        :param columns: A float array per column.
+        :return: The columns.
+        """
+        return cls(timestamps, *columns)
+
+    def to_dict(self) -> dict:
+        """
+        :return: Dictionary of the timestamps and columns as lists of datetimes and floats.
+        """
+        return {
+            "timestamp": list(self.timestamps.to_pydatetime()),
+            **{name: getattr(self, name).tolist() for name in self.COLUMNS},
+        }
+
+    def _row(self, i: int):
+        values = {}
+        for name in self.COLUMNS:
+            value = getattr(self, name)[i]
+            values[name] = None if np.isnan(value) else float(value)
+        return self.ROW.construct(timestamp=self.timestamps[i].to_pydatetime(), **values)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._row(j) for j in range(len(self))[i]]
+        return self._row(range(len(self))[i])
+
+    def __iter__(self):
+        return (self._row(i) for i in range(len(self)))
+
+    def __eq__(self, other) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.timestamps.equals(other.timestamps) and all(
+            np.array_equal(getattr(self, name), getattr(other, name), equal_nan=True)
+            for name in self.COLUMNS
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"{type(self).__name__}({len(self)} values from {self.timestamps[0]} "
+            f"to {self.timestamps[-1]})"
+        )
+
+
+class GenerationAndLoadColumns(TimeSeriesColumns):
+    """
+    Columnar generation and load forecast: a DatetimeIndex with a uniform time step and float
+    arrays of the generated and load powers.
+    """
+
+    ROW = GenerationAndLoadValues
+    COLUMNS = ("P_gen_kW", "P_load_kW")
+    NAME = "generation_and_load"
+
+    def __init__(
+        self, timestamps: pd.DatetimeIndex, P_gen_kW: np.ndarray, P_load_kW: np.ndarray
+    ):
+        """
+        :param timestamps: Strictly increasing timestamps of the forecast.
+        :param P_gen_kW: Generated power in kW at every timestamp.
+        :param P_load_kW: Load power in kW at every timestamp.
+        """
+        self.timestamps = timestamps
+        self.P_gen_kW = P_gen_kW
+        self.P_load_kW = P_load_kW
+
+    @classmethod
+    def from_columns(cls, timestamps, columns):
+        # Powers are required at every timestamp and the time step has to be uniform
+        for name, column in zip(cls.COLUMNS, columns):
+            if np.isnan(column).any():
+                raise ValueError(
+                    f"{name} of {cls.NAME} has to be a number at every timestamp, it is missing "
+                    f"at position {np.flatnonzero(np.isnan(column))[0]}."
+                )
+        return cls(_uniform_index(timestamps), *columns)
+
+    def to_df(self) -> pd.DataFrame:
+        """
+        :return: DataFrame of P_gen_kW and P_load_kW indexed by timestamp.
+        """
+        return pd.DataFrame(
+            {"P_gen_kW": self.P_gen_kW, "P_load_kW": self.P_load_kW},
+            index=self.timestamps,
+        )
+
+
+class P_net_after_kWLimitationColumns(TimeSeriesColumns):
+    """
+    Columnar P_net_after limitations: a DatetimeIndex and float arrays of the upper and lower
+    bounds, NaN where a timestamp has no bound.
+    """
+
+    ROW = P_net_after_kWLimitation
+    COLUMNS = ("upper_bound", "lower_bound")
+    NAME = "P_net_after_kW_limitation"
+
+    def __init__(
+        self,
+        timestamps: pd.DatetimeIndex,
+        upper_bound: np.ndarray,
+        lower_bound: np.ndarray,
+    ):
+        """
+        :param timestamps: Timestamps of the limitations.
+        :param upper_bound: Upper bound of P_net_after in kW at every timestamp (NaN if none).
+        :param lower_bound: Lower bound of P_net_after in kW at every timestamp (NaN if none).
+        """
+        self.timestamps = timestamps
+        self.upper_bound = upper_bound
+        self.lower_bound = lower_bound
+
+    @classmethod
+    def from_columns(cls, timestamps, columns):
+        # Every timestamp may only be limited once
+        if timestamps.has_duplicates:
+            raise ValueError(
+                f"{cls.NAME} timestamps have to be unique, {timestamps[timestamps.duplicated()][0]} "
+                f"is repeated."
+            )
+        return cls(timestamps, *columns)
+
+
+def _parse_timestamps(timestamps: list, name: str) -> pd.DatetimeIndex:
+    """Parse ISO strings, datetimes or unix timestamps (as pydantic does) into a DatetimeIndex."""
+    if isinstance(timestamps[0], (int, float)):
+        index = pd.to_datetime(np.asarray(timestamps, dtype=float), unit="s", utc=True)
+    else:
+        index = pd.to_datetime(timestamps)
+        if not isinstance(index, pd.DatetimeIndex):
+            # Mixed UTC offsets (e.g. across a daylight saving time change) are converted to UTC
+            index = pd.to_datetime(timestamps, utc=True)
+    if index.hasnans:
+        raise ValueError(
+            f"{name} requires a timestamp for every value, it is missing at position "
+            f"{np.flatnonzero(index.isna())[0]}."
+        )
+    return pd.DatetimeIndex(index, name="timestamp")
+
+
+def _compact_index(start, freq, length: int, name: str) -> pd.DatetimeIndex:
+    """Timestamps of a time series in the compact form from its start and time step."""
+    if start is None or freq is None:
+        raise ValueError(f"{name} arrays require a start and a freq.")
+    try:
+        step = (
+            pd.Timedelta(seconds=freq)
+            if isinstance(freq, (int, float))
+            else pd.Timedelta(freq)
+        )
+    except ValueError:
+        raise ValueError(
+            f"freq of {name} has to be a time step (e.g. 15min, PT15M or seconds), it was {freq}."
+        )
+    if step <= pd.Timedelta(0):
+        raise ValueError(f"freq of {name} has to be positive, it was {freq}.")
+    return pd.date_range(
+        _parse_timestamps([start], name)[0], periods=length, freq=step, name="timestamp"
+    )
+
+
+def _uniform_index(timestamps: pd.DatetimeIndex) -> pd.DatetimeIndex:
+    """Check that the timestamps are strictly increasing with a uniform time step and set it as
+    the frequency of the index."""
+    steps = np.diff(timestamps.asi8)
+    if (steps <= 0).any():
+        i = np.flatnonzero(steps <= 0)[0]
+        raise ValueError(
+            f"generation_and_load timestamps have to be strictly increasing, {timestamps[i + 1]} "
+            f"follows {timestamps[i]}."
+        )
+    if len(steps) == 0:
+        return timestamps
+    if (steps != steps[0]).any():
+        i = np.flatnonzero(steps != steps[0])[0]
+        raise ValueError(
+            f"generation_and_load timestamps have to have a uniform time step, the step from "
+            f"{timestamps[i]} to {timestamps[i + 1]} differs from the first one "
+            f"({pd.Timedelta(steps[0])})."
+        )
+    return pd.DatetimeIndex(timestamps, freq=to_offset(pd.Timedelta(steps[0])))
+
+
 class GenerationAndLoad(BaseModel):
     """
     Pydantic model representing a collection of generation and load data.
@@ -152,10 +561,30 @@ class GenerationAndLoad(BaseModel):
         alias="bulk",
         description="The photovoltaic (PV) curtailment value (optional).",
     )
-    values: List[GenerationAndLoadValues] = Field(
-        ..., alias="values", description="A list of generation and load data values."
+    values: GenerationAndLoadColumns = Field(
+        ...,
+        alias="values",
+        description="A list of generation and load data values with a uniform time step, or the start, freq and arrays of P_gen_kW and P_load_kW.",
     )
 
+    @root_validator(pre=True)
+    def compact_values(cls, values):
+        """
+        Validator to accept the compact form, with start, freq and the arrays of P_gen_kW and
+        P_load_kW given in place of values.
+
+        :param values: The raw values dictionary.
+        :return: The values dictionary with the compact form moved into values.
+        """
+        if "values" not in values and "start" in values:
+            values = dict(values)
+            values["values"] = {
+                key: values.pop(key)
+                for key in ("start", "freq") + GenerationAndLoadColumns.COLUMNS
+                if key in values
+            }
+        return values
+
 
 class MeasurementsRequest(BaseModel):
     """
@@ -274,24 +703,59 @@ class InputData(BaseModel):
         alias="generation_and_load",
         description="Generation and load data (optional).",
     )
+    location: Optional[SiteLocation] = Field(
+        None,
+        alias="location",
+        description="The location of the site, from which the sunset based day_end is computed (optional, default: Berlin).",
+    )
     day_end: Optional[datetime] = Field(
         None,
         alias="day_end",
-        description="The end of the sunlight for the day timestamp (optional).",
+        description="The end of the sunlight for the day timestamp (optional, default: the generation_and_load timestamp nearest to the sunset at the location on the uc_start date).",
     )
     bulk: Optional[Bulk] = Field(
         None, alias="bulk", description="Bulk energy data (optional)."
     )
-    P_net_after_kW_limitation: Optional[List[P_net_after_kWLimitation]] = Field(
+    P_net_after_kW_limitation: Optional[P_net_after_kWLimitationColumns] = Field(
         None,
         alias="P_net_after_kW_limitation",
-        description="P_net_after limitations (optional).",
+        description="P_net_after limitations as a list of values or the start, freq and arrays of upper_bound and lower_bound (optional).",
     )
     measurements_request: Optional[MeasurementsRequest] = Field(
         None,
         alias="measurements_request",
         description="Measurements request data (optional).",
     )
+    deadline: Optional[datetime] = Field(
+        None,
+        alias="deadline",
+        description="The wall-clock time (e.g. gate closure) by which the optimization-based schedule has to be returned (optional, required for tiered control logic).",
+    )
+    elastic: bool = Field(
+        False,
+        alias="elastic",
+        description="If true, P_net_after_kW_limitation, final_SoC and bulk are treated as penalized soft constraints in optimization-based control (default: False).",
+    )
+    time_resolution: Optional[List[TimeResolution]] = Field(
+        None,
+        alias="time_resolution",
+        description="Blocks of increasing step length (e.g. 5 minutes for the first 2 hours, 15 minutes up to 12 hours and hourly after) into which the forecasts are aggregated for optimization-based control (optional, default: resolution of generation_and_load).",
+    )
+    representative_periods: Optional[int] = Field(
+        None,
+        alias="representative_periods",
+        description="Number of representative days into which the days of long (e.g. year-scale) optimization-based scheduling horizons are clustered (optional, default: all days are optimized).",
+    )
+    output_dtype: OutputDtype = Field(
+        OutputDtype.FLOAT64,
+        alias="output_dtype",
+        description="The float type of the scheduling output columns, float64 or float32 (default: float64).",
+    )
+    discretization_error: bool = Field(
+        False,
+        alias="discretization_error",
+        description="If true, dynamic programming control also solves the optimization model and reports the gap of its schedule to the optimum (requires the optimization solver, default: False).",
+    )
     battery_specs: Union[BatterySpecs, List[BatterySpecs]]  # Battery specifications.
 
     @validator("generation_and_load")
@@ -305,9 +769,9 @@ class InputData(BaseModel):
         """
         uc_start = values["uc_start"]
         # Check if generation_and_load starts before or at uc_start
-        if uc_start < meas.values[0].timestamp:
+        if uc_start < meas.values.timestamps[0]:
             raise ValueError(
-                f"generation_and_load have to start at or before uc_start. generation_and_load start at {meas.values[0].timestamp} uc_start was {uc_start}"
+                f"generation_and_load have to start at or before uc_start. generation_and_load start at {meas.values.timestamps[0]} uc_start was {uc_start}"
             )
         return meas
 
@@ -323,16 +787,90 @@ class InputData(BaseModel):
         """
         uc_end = values["uc_end"]
         # Check if generation_and_load ends after or at uc_end
-        if uc_end > meas.values[-1].timestamp:
+        if uc_end > meas.values.timestamps[-1]:
             raise ValueError(
-                f"generation_and_load have to end at or after uc_end. generation_and_load end at {meas.values[-1].timestamp} uc_end was {uc_end}"
+                f"generation_and_load have to end at or after uc_end. generation_and_load end at {meas.values.timestamps[-1]} uc_end was {uc_end}"
             )
         return meas
 
+    @validator("deadline", always=True)
+    def deadline_for_tiered_control(cls, v, values):
+        """
+        Validator to ensure tiered control is used for scheduling and comes with a deadline,
+        which is the wall-clock budget of its optimization tier.
+
+        :param v: The value of deadline.
+        :param values: The values dictionary.
+        :return: The validated value.
+        """
+        if values.get("control_logic") == ControlLogic.TIERED:
+            if values.get("operation_mode") != OperationMode.SCHEDULING:
+                raise ValueError("tiered control logic is only available for scheduling.")
+            if v is None:
+                raise ValueError("tiered control logic requires a deadline.")
+        return v
+
+    @validator("time_resolution")
+    def time_resolution_for_optimization(cls, v, values):
+        """
+        Validator to ensure a time resolution is only given for optimization-based scheduling
+        and that its blocks follow each other.
+
+        :param v: The value of time_resolution.
+        :param values: The values dictionary.
+        :return: The validated value.
+        """
+        if v is None:
+            return v
+        if values.get("control_logic") not in (
+            ControlLogic.OPTIMIZATION_BASED,
+            ControlLogic.TIERED,
+        ) or values.get("operation_mode") != OperationMode.SCHEDULING:
+            raise ValueError(
+                "time_resolution is only available for optimization-based scheduling."
+            )
+        previous_end = 0
+        for block in v[:-1]:
+            if block.until_minutes is None:
+                raise ValueError("Only the last time_resolution block can omit until_minutes.")
+            if block.until_minutes <= previous_end:
+                raise ValueError("time_resolution blocks have to end after each other.")
+            previous_end = block.until_minutes
+        if v[-1].until_minutes is not None and v[-1].until_minutes <= previous_end:
+            raise ValueError("time_resolution blocks have to end after each other.")
+        return v
+
+    @validator("representative_periods")
+    def representative_periods_for_optimization(cls, v, values):
+        """
+        Validator to ensure representative periods are only used for optimization-based
+        scheduling without bulk energy and time resolution.
+
+        :param v: The value of representative_periods.
+        :param values: The values dictionary.
+        :return: The validated value.
+        """
+        if v is None:
+            return v
+        if (
+            values.get("control_logic") != ControlLogic.OPTIMIZATION_BASED
+            or values.get("operation_mode") != OperationMode.SCHEDULING
+        ):
+            raise ValueError(
+                "representative_periods is only available for optimization-based scheduling."
+            )
+        if v < 1:
+            raise ValueError("representative_periods has to be at least 1.")
+        if values.get("bulk") is not None or values.get("time_resolution") is not None:
+            raise ValueError(
+                "representative_periods cannot be combined with bulk or time_resolution."
+            )
+        return v
+
     @validator("day_end", always=True)
     def set_day_end(cls, v, values):
         """
-        Validator to set day_end if not provided, based on sunset time in Berlin.
+        Validator to set day_end if not provided, based on the sunset time at the location.
 
         :param v: The value of day_end.
         :param values: The values dictionary.
@@ -341,28 +879,15 @@ class InputData(BaseModel):
         generation_and_load = values.get("generation_and_load")
 
         # Check if day_end is not provided
-        if v is None:
-            # Calculate the sunset time for uc_start date and location (Berlin)
-            berlin_location = LocationInfo(
-                "Berlin", "Germany", "Europe/Berlin", 52.52, 13.40
+        if v is None and isinstance(generation_and_load, GenerationAndLoad):
+            location = values.get("location") or DEFAULT_LOCATION
+            # Sunset time for the uc_start date at the location
+            sunset_time = sunset(
+                location.latitude, location.longitude, values["uc_start"].date()
             )
-            s = sun(berlin_location.observer, date=values["uc_start"].date())
-
-            # Set day_end to the sunset time
-            sunset_time = s["sunset"].astimezone(timezone.utc)
-
-            if generation_and_load and isinstance(
-                generation_and_load, GenerationAndLoad
-            ):
-                timestamps = [
-                    data_point.timestamp for data_point in generation_and_load.values
-                ]
-                # Find the nearest timestamp in generation_and_load data to sunset_time
-                nearest_timestamp = min(timestamps, key=lambda t: abs(t - sunset_time))
-                return nearest_timestamp
-            return v
-        else:
-            return v
+            # Set day_end to the generation_and_load timestamp nearest to the sunset time
+            return nearest_timestamp(generation_and_load.values.timestamps, sunset_time)
+        return v
 
 
 def minutes_horizon(starttime: datetime, endtime: datetime) -> float:
@@ -435,11 +960,9 @@ def generation_and_load_to_df(
     pd.DataFrame
         containing filtered generation and load data.
     """    
-    # Convert GenerationAndLoad objects to a DataFrame, set index to timestamp, and filter by time range
-    df_forecasts = pd.json_normalize([mes.dict(by_alias=False) for mes in meas.values])
-    df_forecasts.set_index("timestamp", inplace=True)
-    df_forecasts.index.freq = pd.infer_freq(df_forecasts.index)
-    df_forecasts = df_forecasts.loc[start:end]
+    # Build the DataFrame from the parsed columns (indexed by timestamp with the frequency of
+    # the uniform time step) and filter by time range
+    df_forecasts = meas.values.to_df().loc[start:end]
     return df_forecasts
 
 
@@ -484,65 +1007,43 @@ def measurements_request_to_dict(measurements_request: MeasurementsRequest):
 
 
 def P_net_after_kW_lim_to_df(
-    P_net_after_kW_limits: List[P_net_after_kWLimitation],
-    gen_load_data: List[GenerationAndLoad],
+    P_net_after_kW_limits: P_net_after_kWLimitationColumns,
+    gen_load_data: GenerationAndLoad,
 ) -> pd.DataFrame:
-    """Convert P_net_after_kWLimitation data (upper and lower bouns of microgrid power) to a DataFrame.
+    """Convert P_net_after_kWLimitation data (upper and lower bouns of microgrid power) to a DataFrame
+    aligned onto the timestamps of the generation and load forecast.
 
     Parameters
     ----------
-    P_net_after_kW_limits : List[P_net_after_kWLimitation]
-        List of P_net_after_kWLimitation objects.
-    gen_load_data : List[GenerationAndLoad]
-        List of GenerationAndLoad objects.
+    P_net_after_kW_limits : P_net_after_kWLimitationColumns
+        Columns of the P_net_after limitations.
+    gen_load_data : GenerationAndLoad
+        Generation and load data.
 
     Returns
     -------
     pd.DataFrame
-        containing P_net_after_kWLimitation data
-    """    
-    # Check if P_net_after_kW_limits is None
+        containing the float upper_bound and lower_bound (0 where there is none) and the bool
+        with_upper_bound and with_lower_bound at every forecast timestamp, in order
+    """
+    index = gen_load_data.values.timestamps
     if P_net_after_kW_limits is None:
-        # Create a DataFrame with default values and use timestamps from gen_load_data
-        all_timestamps = set(item.timestamp for item in gen_load_data.values)
-        missing_data = pd.DataFrame(
-            {
-                "upper_bound": [0] * len(all_timestamps),
-                "with_upper_bound": [False] * len(all_timestamps),
-                "lower_bound": [0] * len(all_timestamps),
-                "with_lower_bound": [False] * len(all_timestamps),
-            },
-            index=list(all_timestamps),
-        )
-        missing_data.index.name = "timestamp"  # Set the index name
-        return missing_data
-
-    # Convert the list of P_net_after_kWLimitation objects to a DataFrame
-    df = pd.DataFrame([item.dict() for item in P_net_after_kW_limits])
-    df.set_index("timestamp", inplace=True)
-
-    # Adding new columns and filling default values
-    df["with_upper_bound"] = df["upper_bound"].notnull()
-    df["with_lower_bound"] = df["lower_bound"].notnull()
-    df.fillna(0, inplace=True)
-
-    # Handle timestamps not present in P_net_after_kWLimitation but in generation_and_load
-    all_timestamps = set(df.index).union(
-        set(item.timestamp for item in gen_load_data.values)
-    )
-    missing_timestamps = list(set(all_timestamps).difference(df.index))
-    missing_data = pd.DataFrame(
+        upper_bound = lower_bound = np.full(len(index), np.nan)
+    else:
+        # Limitations at timestamps outside of the forecast are dropped, missing ones are NaN
+        positions = P_net_after_kW_limits.timestamps.get_indexer(index)
+        found = positions >= 0
+        upper_bound = np.where(found, P_net_after_kW_limits.upper_bound[positions], np.nan)
+        lower_bound = np.where(found, P_net_after_kW_limits.lower_bound[positions], np.nan)
+
+    with_upper_bound = ~np.isnan(upper_bound)
+    with_lower_bound = ~np.isnan(lower_bound)
+    return pd.DataFrame(
         {
-            "upper_bound": [0] * len(missing_timestamps),
-            "with_upper_bound": [False] * len(missing_timestamps),
-            "lower_bound": [0] * len(missing_timestamps),
-            "with_lower_bound": [False] * len(missing_timestamps),
+            "upper_bound": np.where(with_upper_bound, upper_bound, 0.0),
+            "with_upper_bound": with_upper_bound,
+            "lower_bound": np.where(with_lower_bound, lower_bound, 0.0),
+            "with_lower_bound": with_lower_bound,
         },
-        index=missing_timestamps,
+        index=index,
     )
-
-    # Concatenate the two DataFrames
-    result_df = pd.concat([df, missing_data.astype(int)], axis=0)
-    result_df.index.name = "timestamp"  # Set the index name
-
-    return result_df
@@ -22,16 +22,67 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
+from typing import Sequence, Tuple
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 import os
 import json
+import functools
+import gzip
 import itertools
 from pymfm.control.utils.data_input import (
     ControlLogic as CL,
     OperationMode as OM,
 )
 
+# File suffixes of the columnar output formats
+COLUMNAR_SUFFIXES = {"parquet": ".parquet", "arrow": ".arrow", "npz": ".npz"}
+
+# Key of the mode_logic, solver status and index metadata in the columnar output files
+METADATA_KEY = "pymfm"
+
+# Control logics producing the scheduling output of the optimization-based control
+SCHEDULE_OUTPUT_LOGICS = (
+    CL.OPTIMIZATION_BASED,
+    CL.DYNAMIC_PROGRAMMING,
+    CL.PEAK_SHAVING,
+)
+
+
+class OutputColumns:
+    """
+    Preallocated float columns of a control output over its timestamps. The columns are rows of
+    one contiguous block, so that to_df wraps them into a single-dtype DataFrame without copying.
+    """
+
+    def __init__(
+        self, index: pd.Index, columns: Sequence[str], dtype: str = "float64"
+    ):
+        """
+        :param index: Timestamps of the output.
+        :param columns: Names of the output columns.
+        :param dtype: Float type of the values, "float64" or "float32" (default: "float64").
+        """
+        self.index = index
+        self.columns = list(columns)
+        self._positions = {column: i for i, column in enumerate(self.columns)}
+        # Values not set by the control logic stay NaN (e.g. time steps without a bound)
+        self.values = np.full((len(self.columns), len(index)), np.nan, dtype=dtype)
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.values[self._positions[column]]
+
+    def __setitem__(self, column: str, values):
+        self.values[self._positions[column]] = values
+
+    def to_df(self) -> pd.DataFrame:
+        """
+        :return: DataFrame of the columns indexed by timestamp, a view on the values.
+        """
+        return pd.DataFrame(
+            self.values.T, index=self.index, columns=self.columns, copy=False
+        )
+
 
 def visualize_and_save_plots(
     mode_logic: dict, dataframe: pd.DataFrame, output_directory: str
@@ -47,7 +98,10 @@ def visualize_and_save_plots(
     output_directory : str
         Directory where the SVG plots will be saved.
     """    
-    if mode_logic["CL"] == CL.OPTIMIZATION_BASED:
+    # matplotlib is only loaded for plotting
+    import matplotlib.pyplot as plt
+
+    if mode_logic["CL"] in SCHEDULE_OUTPUT_LOGICS:
         # First subplot for 'P_net_after_kW', 'upperb', and 'lowerb'
         plt.figure(figsize=(12, 8))
         plt.plot(
@@ -185,7 +239,13 @@ def visualize_and_save_plots(
     )
 
 
-def prepare_json(mode_logic: dict, output_df: pd.DataFrame, output_directory: str):
+def prepare_json(
+    mode_logic: dict,
+    output_df: pd.DataFrame,
+    output_directory: str,
+    compact: bool = False,
+    compress: bool = False,
+):
     """Prepare and save output control data as JSON files based on control logic and operation mode.
 
 
@@ -194,89 +254,317 @@ def prepare_json(mode_logic: dict, output_df: pd.DataFrame, output_directory: st
     mode_logic : dict
         containing control logic and operation mode information.
     output_df : pd.DataFrame
-        containing data to be saved as JSON.
+        containing data to be saved as JSON (not modified).
     output_directory : str
         Directory where the JSON files will be saved.
-    """    
-    if mode_logic["CL"] == CL.RULE_BASED:
-        if mode_logic["OM"] == OM.NEAR_REAL_TIME:
-            # Prepare JSON data for near real-time rule-based mode
-            formatted_data = {
-                "id": mode_logic["ID"],
-                "application": "pymfm",
-                "control_logic": "rule_based",
-                "operation_mode": "near_real_time",
-                "timestamp": output_df["timestamp"].isoformat(),
-                "initial_SoC_bat_%": output_df["initial_SoC_bat_%"],
-                "SoC_bat_%": output_df["SoC_bat_%"],
-                "P_bat_kW": output_df["P_bat_kW"],
-                "P_net_meas_kW": output_df["P_net_meas_kW"],
-                "P_net_after_kW": output_df["P_net_after_kW"],
-            }
-
-            # Serialize the formatted data to a JSON string with indentation for readability
-            json_string = json.dumps(formatted_data, indent=4)
-
-            # Write the JSON string to a file
-            output_file = os.path.join(
-                output_directory, f"{mode_logic['ID']}_output.json"
-            )
-            with open(output_file, "w") as json_file:
-                json_file.write(json_string)
-                # Save the dictionary as JSON to the specified output file
-            # with open(output_path, "w") as json_file:
-            #    json.dump(json_data, json_file)
+    compact : bool, optional
+        If true, the JSON is written without indentation and whitespace, by default False
+    compress : bool, optional
+        If true, the JSON is gzip compressed into a .json.gz file, by default False
+    """
+    json_bytes = serialize_json(mode_logic, output_df, compact=compact, compress=compress)
+
+    # Write the JSON bytes to a file
+    output_file = os.path.join(
+        output_directory,
+        f"{mode_logic['ID']}_output.json" + (".gz" if compress else ""),
+    )
+    with open(output_file, "wb") as json_file:
+        json_file.write(json_bytes)
 
-        if mode_logic["OM"] == OM.SCHEDULING:
-            # Prepare JSON data for scheduling rule-based mode
-            # Extract the timestamps as strings
-            output_df["timestamp"] = output_df.index.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-
-            # Create the JSON structure
-            result = {
-                "id": mode_logic["ID"],
-                "application": "pymfm",
-                "control_logic": "rule_based",
-                "operation_mode": "scheduling",
-                "uc_start": output_df.index[0].strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
-                "uc_end": output_df.index[-1].strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
-                "results": output_df.to_dict(orient="records"),
-            }
-
-            # Serialize the JSON data with indentation for readability
-            json_string = json.dumps(result, indent=4)
-
-            # Write the JSON string to a file
-            output_file = os.path.join(
-                output_directory, f"{mode_logic['ID']}_output.json"
-            )
-            with open(output_file, "w") as json_file:
-                json_file.write(json_string)
+    # Get the absolute file path of the generated .json file
+    absolute_output_file_path = os.path.abspath(output_file)
+    print(f"Output .json file generated and saved under: {absolute_output_file_path}")
 
-    if mode_logic["CL"] == CL.OPTIMIZATION_BASED:
-        # Prepare JSON data for scheduling optimization-based mode
-        # Extract the timestamps as strings and reset the index
-        output_df["timestamp"] = output_df.index.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
 
-        # Create the JSON structure
+def serialize_json(
+    mode_logic: dict,
+    output_df: pd.DataFrame,
+    compact: bool = False,
+    compress: bool = False,
+) -> bytes:
+    """Serialize output control data into the JSON of prepare_json in memory.
+
+    The scheduling results are written straight from the column arrays, with the timestamps
+    formatted at once, instead of through one dictionary per time step.
+
+    Parameters
+    ----------
+    mode_logic : dict
+        containing control logic and operation mode information.
+    output_df : pd.DataFrame
+        containing data to be serialized (not modified), the dictionary of the near real-time
+        operation mode.
+    compact : bool, optional
+        If true, the JSON is serialized without indentation and whitespace, by default False
+    compress : bool, optional
+        If true, the JSON is gzip compressed, by default False
+
+    Returns
+    -------
+    bytes
+        the (compressed) UTF-8 encoded JSON.
+    """
+    if compact:
+        dumps = functools.partial(json.dumps, separators=(",", ":"))
+    else:
+        # Serialize the JSON data with indentation for readability
+        dumps = functools.partial(json.dumps, indent=4)
+
+    if mode_logic["OM"] == OM.NEAR_REAL_TIME:
+        # Prepare JSON data for near real-time rule-based mode
+        formatted_data = {
+            "id": mode_logic["ID"],
+            "application": "pymfm",
+            "control_logic": "rule_based",
+            "operation_mode": "near_real_time",
+            "timestamp": output_df["timestamp"].isoformat(),
+            "initial_SoC_bat_%": output_df["initial_SoC_bat_%"],
+            "SoC_bat_%": output_df["SoC_bat_%"],
+            "P_bat_kW": output_df["P_bat_kW"],
+            "P_net_meas_kW": output_df["P_net_meas_kW"],
+            "P_net_after_kW": output_df["P_net_after_kW"],
+        }
+        json_string = dumps(formatted_data)
+    else:
+        # Prepare JSON data for the scheduling modes, with the results of every timestamp
+        timestamps = _format_timestamps(output_df.index)
         result = {
             "id": mode_logic["ID"],
             "application": "pymfm",
-            "control_logic": "optimization_based",
+            "control_logic": mode_logic["CL"].value,
             "operation_mode": "scheduling",
-            "uc_start": output_df.index[0].strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
-            "uc_end": output_df.index[-1].strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
-            "results": output_df.to_dict(orient="records"),
+            "uc_start": timestamps[0],
+            "uc_end": timestamps[-1],
+            "results": None,
         }
+        # The results are the last item, their placeholder is replaced by the records
+        json_string = dumps(result)
+        json_string = (
+            json_string[: json_string.rindex("null")]
+            + _json_records(output_df, timestamps, compact)
+            + json_string[json_string.rindex("null") + len("null") :]
+        )
 
-        # Serialize the JSON data with indentation for readability
-        json_string = json.dumps(result, indent=4)
+    json_bytes = json_string.encode()
+    if compress:
+        json_bytes = gzip.compress(json_bytes, mtime=0)
+    return json_bytes
+
+
+def _format_timestamps(index: pd.DatetimeIndex) -> list:
+    """Format the timestamps as "%Y-%m-%dT%H:%M:%S.%fZ" strings (of their wall time) at once."""
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    formatted = np.char.add(np.datetime_as_string(index.values, unit="us"), "Z")
+    return formatted.tolist()
+
+
+def _json_records(output_df: pd.DataFrame, timestamps: list, compact: bool) -> str:
+    """JSON array of the records of output_df (as to_dict(orient="records") with the formatted
+    timestamps as last item), built from the columns in the layout of json.dumps."""
+    if len(output_df) == 0:
+        return "[]"
+    columns = [_json_values(output_df[column]) for column in output_df.columns]
+    columns.append([f'"{timestamp}"' for timestamp in timestamps])
+    # Keys as format strings (with "%" of e.g. "SoC_bat_1_%" escaped)
+    keys = [
+        json.dumps(str(column)).replace("%", "%%") for column in output_df.columns
+    ] + ['"timestamp"']
+
+    if compact:
+        record = "{" + ",".join(f"{key}:%s" for key in keys) + "}"
+        separator, start, end = ",", "[", "]"
+    else:
+        record = (
+            "{\n"
+            + ",\n".join(f"            {key}: %s" for key in keys)
+            + "\n        }"
+        )
+        separator, start, end = ",\n        ", "[\n        ", "\n    ]"
+    return start + separator.join(map(record.__mod__, zip(*columns))) + end
+
+
+def _json_values(column: pd.Series) -> list:
+    """JSON representations of the values of a column."""
+    if column.dtype.kind != "f":
+        return [json.dumps(value) for value in column.tolist()]
+    values = column.to_numpy()
+    # Python floats (also of float32 columns) in their shortest repr, NaN and infinity as in
+    # json.dumps
+    strings = list(map(float.__repr__, values.tolist()))
+    for i in np.flatnonzero(~np.isfinite(values)).tolist():
+        strings[i] = json.dumps(float(values[i]))
+    return strings
+
+
+def prepare_columnar(
+    mode_logic: dict,
+    output_df: pd.DataFrame,
+    solver_status: tuple,
+    output_directory: str,
+    format: str = "parquet",
+) -> str:
+    """Save the scheduling output of a control run as a columnar Parquet, Arrow IPC or NPZ file.
+
+    The columns keep their dtypes and the DatetimeIndex its time zone and frequency. mode_logic
+    and the solver status are stored as metadata of the file, so that read_columnar returns what
+    mode_logic_handler returned. Parquet and Arrow IPC require pyarrow, without it the output is
+    written as NPZ.
 
-        # Write the JSON string to a file
-        output_file = os.path.join(output_directory, f"{mode_logic['ID']}_output.json")
-        with open(output_file, "w") as json_file:
-            json_file.write(json_string)
+    Parameters
+    ----------
+    mode_logic : dict
+        containing control logic and operation mode information.
+    output_df : pd.DataFrame
+        containing the scheduling output indexed by timestamp (not modified).
+    solver_status : tuple
+        solver status and termination condition of the control run.
+    output_directory : str
+        Directory where the file will be saved.
+    format : str, optional
+        "parquet", "arrow" (Arrow IPC, memory-mappable) or "npz", by default "parquet"
+
+    Returns
+    -------
+    str
+        the absolute path of the written file.
+    """
+    if format not in COLUMNAR_SUFFIXES:
+        raise ValueError(
+            f"Columnar output format has to be one of {', '.join(COLUMNAR_SUFFIXES)}, "
+            f"it was {format}."
+        )
+    if not isinstance(output_df, pd.DataFrame):
+        raise ValueError(
+            "Columnar outputs are written for the scheduling operation mode only."
+        )
+    if format != "npz":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print(f"pyarrow is not installed, writing the {format} output as npz instead.")
+            format = "npz"
+
+    metadata = json.dumps(
+        {
+            "mode_logic": mode_logic,
+            "solver_status": [getattr(status, "value", status) for status in solver_status],
+            "index": {
+                "name": output_df.index.name,
+                "freq": output_df.index.freqstr,
+            },
+        },
+        default=str,
+    )
+    output_file = os.path.abspath(
+        os.path.join(
+            output_directory, f"{mode_logic['ID']}_output{COLUMNAR_SUFFIXES[format]}"
+        )
+    )
 
-    # Get the absolute file path of the generated .json file
-    absolute_output_file_path = os.path.abspath(output_file)
-    print(f"Output .json file generated and saved under: {absolute_output_file_path}")
+    if format == "npz":
+        _write_npz(output_df, metadata, output_file)
+    else:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(output_df, preserve_index=True)
+        table = table.replace_schema_metadata(
+            {**table.schema.metadata, METADATA_KEY: metadata}
+        )
+        if format == "parquet":
+            pq.write_table(table, output_file)
+        else:
+            with pa.OSFile(output_file, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+
+    print(f"Output .{format} file generated and saved under: {output_file}")
+    return output_file
+
+
+def read_columnar(path: str) -> Tuple[dict, pd.DataFrame, tuple]:
+    """Read a scheduling output saved by prepare_columnar. Parquet and Arrow IPC files are
+    memory-mapped (Arrow IPC columns without missing values are not copied).
+
+    Parameters
+    ----------
+    path : str
+        Parquet, Arrow IPC or NPZ file written by prepare_columnar.
+
+    Returns
+    -------
+    Tuple[dict, pd.DataFrame, tuple]
+        mode_logic, the output DataFrame and the solver status as returned by
+        mode_logic_handler.
+    """
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == COLUMNAR_SUFFIXES["npz"]:
+        output_df, metadata = _read_npz(path)
+    elif suffix in (COLUMNAR_SUFFIXES["parquet"], COLUMNAR_SUFFIXES["arrow"]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if suffix == COLUMNAR_SUFFIXES["parquet"]:
+            table = pq.read_table(path, memory_map=True)
+        else:
+            table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+        metadata = table.schema.metadata[METADATA_KEY.encode()].decode()
+        output_df = table.to_pandas(split_blocks=True)
+    else:
+        raise ValueError(
+            f"Columnar output files have to be {', '.join(COLUMNAR_SUFFIXES.values())} files, "
+            f"it was {path}."
+        )
+    metadata = json.loads(metadata)
+
+    # Restore the index frequency and the enumerations of mode_logic and the solver status
+    if metadata["index"]["freq"] is not None:
+        output_df.index.freq = metadata["index"]["freq"]
+    mode_logic = metadata["mode_logic"]
+    mode_logic["CL"] = CL(mode_logic["CL"])
+    mode_logic["OM"] = OM(mode_logic["OM"])
+    from pyomo.opt import SolverStatus, TerminationCondition
+
+    status, termination_condition = metadata["solver_status"]
+    return (
+        mode_logic,
+        output_df,
+        (SolverStatus(status), TerminationCondition(termination_condition)),
+    )
+
+
+def _write_npz(output_df: pd.DataFrame, metadata: str, output_file: str):
+    """Write the columns, the index (as UTC nanoseconds) and the metadata into an uncompressed
+    NPZ file."""
+    arrays = {}
+    for i, column in enumerate(output_df.columns):
+        values = output_df[column].to_numpy()
+        if values.dtype == object:
+            raise ValueError(
+                f"Column {column} of type object cannot be written as npz output."
+            )
+        arrays[f"column_{i}"] = values
+    index = output_df.index
+    arrays["index"] = index.asi8
+    arrays["columns"] = np.array([str(column) for column in output_df.columns])
+    arrays["tz"] = np.array("" if index.tz is None else str(index.tz))
+    arrays[METADATA_KEY] = np.array(metadata)
+    np.savez(output_file, **arrays)
+
+
+def _read_npz(path: str) -> Tuple[pd.DataFrame, str]:
+    """Read the DataFrame and the metadata of an NPZ file written by _write_npz."""
+    with np.load(path, allow_pickle=False) as npz:
+        columns = npz["columns"].tolist()
+        tz = str(npz["tz"]) or None
+        index = pd.DatetimeIndex(npz["index"].view("datetime64[ns]"))
+        if tz is not None:
+            index = index.tz_localize("UTC").tz_convert(tz)
+        output_df = pd.DataFrame(
+            {column: npz[f"column_{i}"] for i, column in enumerate(columns)}, index=index
+        )
+        metadata = str(npz[METADATA_KEY])
+    output_df.index.name = json.loads(metadata)["index"]["name"]
+    return output_df, metadata
@@ -0,0 +1,326 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from datetime import datetime
+from typing import List
+import numpy as np
+import pandas as pd
+from pymfm.control.utils.data_input import Bulk
+from pymfm.control.utils.time_resolution import step_seconds
+
+# Numerical tolerance (kW, kWh and SoC fractions) below which a violation is not reported
+TOLERANCE = 1e-6
+# Maximum number of example timestamps listed in a reason
+MAX_EXAMPLES = 3
+
+
+class InfeasibleInputError(ValueError):
+    """
+    Raised when scheduling inputs are provably infeasible, before any optimization model is built.
+    """
+
+    def __init__(self, reasons: List[str]):
+        self.reasons = reasons
+        super().__init__(
+            "Scheduling input is infeasible: " + " ".join(reasons)
+        )
+
+    def __reduce__(self):
+        # Keep the reasons when passed between processes
+        return (self.__class__, (self.reasons,))
+
+
+def screen_feasibility(
+    P_load_gen: pd.DataFrame,
+    df_battery: pd.DataFrame,
+    day_end: datetime,
+    bulk_data: Bulk,
+    P_net_after_kW_limits: pd.DataFrame,
+    pv_curtailment: bool,
+) -> List[str]:
+    """Screen the scheduling optimization inputs for provable infeasibility.
+
+    Only necessary conditions of the optimization model are checked, each one vectorized over the
+    time steps and batteries: reachability of the final SoC, deliverability of the bulk energy and
+    compatibility of the P_net_after_kW bounds with the forecast and the battery power limits.
+    An input passing the screen can still be infeasible, but an input failing it cannot be feasible.
+
+    Parameters
+    ----------
+    P_load_gen : pd.DataFrame
+        load and generation forecast time series of float type.
+    df_battery : pd.DataFrame
+        battery specifications of float and string types (SoC values between 0 and 1).
+    day_end : datetime
+        end of the day till which household batteries should reach maximum SoC.
+    bulk_data : Bulk
+        bulk delivery/reception of energy from batteries (optional).
+    P_net_after_kW_limits : pd.DataFrame
+        upper and lower bound float time series (kW) and the identifiers for their existance.
+    pv_curtailment : bool
+        If true, PV generation can be curtailed.
+
+    Returns
+    -------
+    List[str]
+        the reasons why the input is infeasible, empty if none has been found.
+    """
+    reasons = []
+    index = P_load_gen.index
+    dt_s = step_seconds(P_load_gen)
+    P_net_before_kW = (P_load_gen.P_load_kW - P_load_gen.P_gen_kW).to_numpy(float)
+    surplus_kW = np.maximum(-P_net_before_kW, 0.0)
+
+    # Battery parameters as column vectors (batteries x 1)
+    bat_ids = df_battery.index.to_numpy()
+    is_hbes = (df_battery.bat_type == "hbes").to_numpy()
+    capacity_kWs = df_battery.bat_capacity_kWs.to_numpy(float)[:, None]
+    ch_eff = df_battery.ch_efficiency.to_numpy(float)[:, None]
+    dis_eff = df_battery.dis_efficiency.to_numpy(float)[:, None]
+    initial_SoC = df_battery.initial_SoC.to_numpy(float)
+    min_SoC = df_battery.min_SoC.to_numpy(float)
+    max_SoC = df_battery.max_SoC.to_numpy(float)
+    P_ch_max_kW = df_battery.P_ch_max_kW.to_numpy(float)[:, None]
+    # Household batteries are never discharged
+    P_dis_max_kW = np.where(is_hbes, 0.0, df_battery.P_dis_max_kW.to_numpy(float))[
+        :, None
+    ]
+
+    # Charging is only allowed from surplus and limited by it (batteries x time steps)
+    P_ch_cap_kW = np.minimum(P_ch_max_kW, ch_eff * surplus_kW)
+    SoC_up_step = P_ch_cap_kW / ch_eff * dt_s / capacity_kWs
+    SoC_down_step = P_dis_max_kW * dis_eff * dt_s / capacity_kWs
+    # Highest/lowest SoC reachable at the beginning of every time step (and after the last one)
+    SoC_up = np.concatenate(
+        [np.zeros((len(bat_ids), 1)), np.cumsum(SoC_up_step, axis=1)], axis=1
+    )
+    SoC_down = np.concatenate(
+        [np.zeros((len(bat_ids), 1)), np.cumsum(SoC_down_step, axis=1)], axis=1
+    )
+    reachable_max_SoC = np.minimum(initial_SoC[:, None] + SoC_up, max_SoC[:, None])
+    reachable_min_SoC = np.maximum(initial_SoC[:, None] - SoC_down, min_SoC[:, None])
+
+    # Initial SoC within the SoC limits
+    for n in np.flatnonzero(
+        (initial_SoC < min_SoC - TOLERANCE) | (initial_SoC > max_SoC + TOLERANCE)
+    ):
+        reasons.append(
+            f"initial_SoC of battery {bat_ids[n]} ({initial_SoC[n] * 100:.2f} %) is outside of "
+            f"[min_SoC, max_SoC] = [{min_SoC[n] * 100:.2f} %, {max_SoC[n] * 100:.2f} %]."
+        )
+
+    # Final SoC reachable from the initial SoC
+    final_SoC = df_battery.final_SoC.to_numpy(float)
+    for n in np.flatnonzero(~np.isnan(final_SoC)):
+        if is_hbes[n]:
+            # Household batteries have to be full at the end of the day
+            if day_end is None:
+                continue
+            target_SoC, target_time = max_SoC[n], day_end
+        else:
+            target_SoC, target_time = final_SoC[n], index[-1]
+        k = index.searchsorted(target_time)
+        if reachable_max_SoC[n, k] < target_SoC - TOLERANCE:
+            reasons.append(
+                f"final SoC of battery {bat_ids[n]} ({target_SoC * 100:.2f} %) is out of reach: "
+                f"starting at initial_SoC ({initial_SoC[n] * 100:.2f} %) and charging at most "
+                f"with P_ch_max_kW from the PV surplus, it cannot exceed "
+                f"{reachable_max_SoC[n, k] * 100:.2f} % at {target_time}."
+            )
+        elif reachable_min_SoC[n, k] > target_SoC + TOLERANCE:
+            reasons.append(
+                f"final SoC of battery {bat_ids[n]} ({target_SoC * 100:.2f} %) is out of reach: "
+                f"starting at initial_SoC ({initial_SoC[n] * 100:.2f} %) and discharging at most "
+                f"with P_dis_max_kW, it cannot fall below "
+                f"{reachable_min_SoC[n, k] * 100:.2f} % at {target_time}."
+            )
+
+    # Bulk energy deliverable/receivable within the bulk window
+    if bulk_data is not None:
+        start, end = index.searchsorted(
+            [bulk_data.bulk_start, bulk_data.bulk_end], side="left"
+        )
+        end = min(end + 1, len(index))
+        # Discharged (delivered) energy per battery, limited by power and by the stored energy
+        delivery_kWh = np.minimum(
+            (SoC_down_step[:, start:end]).sum(axis=1),
+            reachable_max_SoC[:, start] - min_SoC,
+        ) * capacity_kWs[:, 0] / 3600
+        # Charged (received) energy per battery, limited by power and by the free capacity,
+        # and for all batteries together by the PV surplus
+        reception_kWh = np.minimum(
+            (SoC_up_step[:, start:end]).sum(axis=1),
+            max_SoC - reachable_min_SoC[:, start],
+        ) * capacity_kWs[:, 0] / 3600
+        max_delivery_kWh = max(delivery_kWh.sum(), 0.0)
+        max_reception_kWh = max(
+            min(reception_kWh.sum(), (surplus_kW[start:end] * dt_s[start:end]).sum() / 3600),
+            0.0,
+        )
+        if -bulk_data.bulk_energy_kWh > max_delivery_kWh + TOLERANCE:
+            reasons.append(
+                f"bulk_energy_kWh ({bulk_data.bulk_energy_kWh} kWh) requires delivering "
+                f"{-bulk_data.bulk_energy_kWh} kWh between {bulk_data.bulk_start} and "
+                f"{bulk_data.bulk_end}, but at most {max_delivery_kWh:.2f} kWh can be delivered "
+                f"(P_dis_max_kW × bulk window, limited by the stored energy)."
+            )
+        if bulk_data.bulk_energy_kWh > max_reception_kWh + TOLERANCE:
+            reasons.append(
+                f"bulk_energy_kWh ({bulk_data.bulk_energy_kWh} kWh) requires receiving "
+                f"{bulk_data.bulk_energy_kWh} kWh between {bulk_data.bulk_start} and "
+                f"{bulk_data.bulk_end}, but at most {max_reception_kWh:.2f} kWh can be received "
+                f"(P_ch_max_kW × bulk window, limited by the PV surplus and the free capacity)."
+            )
+
+    # P_net_after_kW bounds compatible with the forecast and the battery power limits
+    limits = P_net_after_kW_limits.reindex(index)
+    upper_bound = limits.upper_bound.to_numpy(float)
+    lower_bound = limits.lower_bound.to_numpy(float)
+    with_upper_bound = limits.with_upper_bound.fillna(False).to_numpy(bool)
+    with_lower_bound = limits.with_lower_bound.fillna(False).to_numpy(bool)
+    # Lowest P_net_after_kW: all batteries discharging at their maximum power
+    min_P_net_after_kW = P_net_before_kW - P_dis_max_kW.sum()
+    # Highest P_net_after_kW: no import beyond the deficit, no import in case of surplus, where
+    # the export can only be reduced by charging or by PV curtailment
+    max_P_net_after_kW = np.where(
+        P_net_before_kW > 0,
+        P_net_before_kW,
+        0.0
+        if pv_curtailment
+        else np.minimum(P_net_before_kW + P_ch_cap_kW.sum(axis=0), 0.0),
+    )
+    _bound_reasons(
+        reasons,
+        index,
+        with_upper_bound & with_lower_bound & (lower_bound > upper_bound + TOLERANCE),
+        "lower_bound exceeds upper_bound",
+        lambda k: f"lower bound {lower_bound[k]} kW > upper bound {upper_bound[k]} kW",
+    )
+    _bound_reasons(
+        reasons,
+        index,
+        with_upper_bound & (min_P_net_after_kW > upper_bound + TOLERANCE),
+        "upper_bound cannot be met even with all batteries discharging at P_dis_max_kW",
+        lambda k: f"upper bound {upper_bound[k]} kW, lowest possible P_net_after_kW "
+        f"{min_P_net_after_kW[k]:.2f} kW",
+    )
+    _bound_reasons(
+        reasons,
+        index,
+        with_lower_bound & (max_P_net_after_kW < lower_bound - TOLERANCE),
+        "lower_bound cannot be met with the forecast and the charging limits",
+        lambda k: f"lower bound {lower_bound[k]} kW, highest possible P_net_after_kW "
+        f"{max_P_net_after_kW[k]:.2f} kW",
+    )
+
+    # Stored energy of all batteries together: the bounds can force charging (export limited by a
+    # lower bound in case of surplus) or discharging (import limited by an upper bound in case of
+    # deficit), which has to fit into the SoC limits and the final SoC
+    forced_charge_kW = np.where(
+        with_lower_bound & (P_net_before_kW <= 0) & (not pv_curtailment),
+        np.maximum(lower_bound - P_net_before_kW, 0.0),
+        0.0,
+    )
+    forced_discharge_kW = np.where(
+        with_upper_bound & (P_net_before_kW > 0),
+        np.maximum(P_net_before_kW - upper_bound, 0.0),
+        0.0,
+    )
+    # Lowest and highest change of the stored energy in every time step (kWs)
+    min_change_kWs = np.where(
+        forced_charge_kW > 0,
+        forced_charge_kW,
+        -(P_dis_max_kW * dis_eff).sum(),
+    ) * dt_s
+    max_change_kWs = np.where(
+        P_net_before_kW <= 0,
+        np.minimum((P_ch_max_kW / ch_eff).sum(), surplus_kW),
+        -dis_eff.min() * forced_discharge_kW,
+    ) * dt_s
+    min_energy_kWs = (min_SoC * capacity_kWs[:, 0]).sum()
+    max_energy_kWs = (max_SoC * capacity_kWs[:, 0]).sum()
+    # The final SoC of the fleet is only known if every battery has one at the end time
+    final_energy_kWs = None
+    if not is_hbes.any() and not np.isnan(final_SoC).any():
+        final_energy_kWs = (final_SoC * capacity_kWs[:, 0]).sum()
+    low_kWs = high_kWs = (initial_SoC * capacity_kWs[:, 0]).sum()
+    for k in range(len(index)):
+        if k == len(index) - 1 and final_energy_kWs is not None:
+            low_kWs, high_kWs = max(low_kWs, final_energy_kWs), min(
+                high_kWs, final_energy_kWs
+            )
+            if low_kWs > high_kWs + TOLERANCE * 3600:
+                break
+        low_kWs = max(low_kWs + min_change_kWs[k], min_energy_kWs)
+        high_kWs = min(high_kWs + max_change_kWs[k], max_energy_kWs)
+        if low_kWs > high_kWs + TOLERANCE * 3600:
+            break
+    if low_kWs > high_kWs + TOLERANCE * 3600:
+        reasons.append(
+            f"the P_net_after_kW bounds force charging/discharging beyond the SoC limits"
+            f"{' and the final SoC' if final_energy_kWs is not None else ''} of the batteries "
+            f"at {index[k]}: the stored energy would have to be at least {low_kWs / 3600:.2f} kWh "
+            f"and at most {high_kWs / 3600:.2f} kWh."
+        )
+
+    return reasons
+
+
+def _bound_reasons(reasons, index, violated, message, describe):
+    """Append a reason for the violated time steps, listing a few of them as examples."""
+    steps = np.flatnonzero(violated)
+    if len(steps) == 0:
+        return
+    examples = ", ".join(
+        f"{index[k]} ({describe(k)})" for k in steps[:MAX_EXAMPLES]
+    )
+    reasons.append(
+        f"{message} at {len(steps)} timestamp(s), e.g. at {examples}."
+    )
+
+
+def check_feasibility(
+    P_load_gen: pd.DataFrame,
+    df_battery: pd.DataFrame,
+    day_end: datetime,
+    bulk_data: Bulk,
+    P_net_after_kW_limits: pd.DataFrame,
+    pv_curtailment: bool,
+):
+    """Reject provably infeasible scheduling optimization inputs (see screen_feasibility).
+
+    Raises
+    ------
+    InfeasibleInputError
+        with the precise reasons if the input cannot be feasible.
+    """
+    reasons = screen_feasibility(
+        P_load_gen,
+        df_battery,
+        day_end,
+        bulk_data,
+        P_net_after_kW_limits,
+        pv_curtailment,
+    )
+    if reasons:
+        raise InfeasibleInputError(reasons)
@@ -21,192 +21,640 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
+import dataclasses
+from typing import TYPE_CHECKING, Dict, Sequence, Union
 import pandas as pd
-from pyomo.opt import SolverStatus, TerminationCondition
-from pymfm.control.utils import data_input, data_output
+from pymfm.control.utils.control_problem import ControlProblem
 from pymfm.control.utils.data_input import (
     InputData,
     ControlLogic as CL,
     OperationMode as OM,
 )
-from pymfm.control.algorithms import optimization_based as OptB
+from pymfm.control.utils.lazy import lazy_import
+from pymfm.control.utils.streaming_input import read_input_data
 from pymfm.control.algorithms import rule_based as RB
 
+# The optimization stack (pyomo, scipy) is only loaded by the control logics using it
+feasibility = lazy_import("pymfm.control.utils.feasibility")
+time_resolution = lazy_import("pymfm.control.utils.time_resolution")
+OptB = lazy_import("pymfm.control.algorithms.optimization_based")
+BS = lazy_import("pymfm.control.algorithms.battery_sizing")
+DP = lazy_import("pymfm.control.algorithms.dynamic_programming")
+PS = lazy_import("pymfm.control.algorithms.peak_shaving")
+RP = lazy_import("pymfm.control.algorithms.representative_periods")
 
-def mode_logic_handler(data: InputData):
+if TYPE_CHECKING:
+    from pymfm.control.utils.result_cache import ResultCache
+
+
+def mode_logic_handler(data: InputData, cache: "ResultCache" = None):
     """
     Handle different control logic modes and operation modes.
 
     :param data: InputData object containing input data.
+    :param cache: Cache returning the result of identical input data without recomputation
+        (optional).
     :return: Tuple containing mode logic information, output DataFrame, and solver status.
     """
-    # Prepare battery specifications, converting battery percentage to absolute values
-    battery_specs = data_input.input_prep(data.battery_specs)
+    if cache is not None:
+        return cache.get_or_compute(data, lambda: mode_logic_handler(data))
 
-    if data.control_logic == CL.RULE_BASED:
-        if data.operation_mode == OM.SCHEDULING:
-            # Prepare the forecasted data
-            df_forecasts = data_input.generation_and_load_to_df(
-                data.generation_and_load, start=data.uc_start, end=data.uc_end
-            )
+    # Compile the input data once into the problem shared by the control logics
+    return run_problem(ControlProblem.compile(data))
 
-            # If multiple battery nodes are present, handle them
-            if isinstance(battery_specs, list):
-                if len(battery_specs) == 1:
-                    battery_specs = battery_specs[0]
-                else:
-                    raise RuntimeError(
-                        "Rule based control cannot deal with multiple flex nodes."
-                    )
-
-            # Initialize the output DataFrame
-            output_df = None
-            delta_T = pd.to_timedelta(df_forecasts.P_load_kW.index.freq)
-            print(
-                "Input data has been read successfully. Running scheduling rule-based control."
-            )
 
-            # Iterate through forecasted data and perform scheduling
-            for time, P_net_before_kW in df_forecasts.iterrows():
-                output = RB.scheduling(P_net_before_kW, battery_specs, delta_T)
-
-                # Initialize output DataFrame if not created
-                if output_df is None:
-                    output_df = pd.DataFrame(
-                        columns=output.index, index=df_forecasts.index
-                    )
-
-                # Append the output for the current time
-                output_df.loc[time] = output
-
-                # Update initial SoC for the next time step
-                battery_specs.initial_SoC = (
-                    output.bat_energy_kWs / battery_specs.bat_capacity_kWs
-                )
-            print("Scheduling rule-based control finished.")
-
-            # Rename columns for battery-specific data
-            if battery_specs.id is not None:
-                output_df.rename(
-                    {"P_bat_kW": f"P_{battery_specs.id}_kW"}, inplace=True, axis=1
-                )
-                output_df.rename(
-                    {"SoC_bat": f"SoC_{battery_specs.id}_%"}, inplace=True, axis=1
-                )
-            else:
-                output_df.rename({"P_bat_kW": "P_bat_1_kW"}, inplace=True, axis=1)
-                output_df.rename({"SoC_bat": "SoC_bat_1_%"}, inplace=True, axis=1)
-
-            # Drop unnecessary columns
-            output_df = output_df.drop(
-                ["bat_energy_kWs", "import_kW", "export_kW"], axis=1
-            )
+def run_problem(problem: ControlProblem, control_logic: CL = None):
+    """
+    Run a control logic on a compiled control problem. The problem is not modified, so that
+    several control logics can be run on it without compiling the input data again.
 
-            # Define mode_logic information
-            mode_logic = {
-                "ID": data.id,
-                "CL": data.control_logic,
-                "OM": data.operation_mode,
-            }
-
-            return (
-                mode_logic,
-                output_df,
-                (SolverStatus.ok, TerminationCondition.optimal),
-            )
+    :param problem: Control problem compiled from the input data.
+    :param control_logic: Control logic to run (optional, the one of the input data by default).
+        The input data is validated again for it, and the mode logic information reports it.
+    :return: Tuple containing mode logic information, output DataFrame, and solver status.
+    """
+    data = problem.data
+    if control_logic is None:
+        control_logic = data.control_logic
+    elif control_logic != data.control_logic:
+        # Validate the input data for the other control logic (e.g. tiered requires a
+        # deadline); the compiled arrays do not depend on it and are shared
+        data = InputData(**{**dict(data), "control_logic": control_logic})
+        problem = dataclasses.replace(problem, data=data)
+
+    if control_logic == CL.RULE_BASED:
+        if data.operation_mode == OM.SCHEDULING:
+            return rule_based_scheduling(problem)
 
         if data.operation_mode == OM.NEAR_REAL_TIME:
-            # Handle near real-time rule-based control
-            if isinstance(battery_specs, list):
-                if len(battery_specs) == 1:
-                    battery_specs = battery_specs[0]
-                else:
-                    raise RuntimeError(
-                        "Near real-time control cannot deal with multiple flex nodes."
-                    )
-
-            # Prepare measurements request data
-            measurements_request_dict = data_input.measurements_request_to_dict(
-                data.measurements_request
-            )
+            return near_real_time_control(problem)
+
+    if control_logic == CL.OPTIMIZATION_BASED:
+        return optimization_based_scheduling(problem)
+
+    if control_logic == CL.TIERED:
+        return tiered_scheduling(problem)
+
+    if control_logic == CL.DYNAMIC_PROGRAMMING:
+        return dynamic_programming_scheduling(problem)
+
+    if control_logic == CL.PEAK_SHAVING:
+        return peak_shaving_scheduling(problem)
 
-            print(
-                "Input data has been read successfully. Running near real-time rule-based control."
+
+def handle_input(data: Union[InputData, dict, str]):
+    """
+    Parse the input data if necessary and run mode_logic_handler.
+
+    :param data: InputData object, its (JSON) dictionary or the name of its JSON file (read
+        incrementally with read_input_data).
+    :return: Tuple containing mode logic information, output DataFrame, and solver status.
+    """
+    if isinstance(data, str):
+        data = read_input_data(data)
+    if isinstance(data, dict):
+        data = InputData(**data)
+    return mode_logic_handler(data)
+
+
+def near_real_time_control(problem: ControlProblem):
+    """
+    Run the near real-time rule-based control.
+
+    :param problem: Control problem compiled from the input data.
+    :return: Tuple containing mode logic information, output DataFrame, and solver status.
+    """
+    data = problem.data
+    battery_specs = problem.battery_specs()
+    if isinstance(battery_specs, list):
+        if len(battery_specs) == 1:
+            battery_specs = battery_specs[0]
+        else:
+            raise RuntimeError(
+                "Near real-time control cannot deal with multiple flex nodes."
             )
 
-            # Perform near real-time rule-based control
-            output_df = RB.near_real_time(measurements_request_dict, battery_specs)
-
-            # Define mode_logic information
-            mode_logic = {
-                "ID": data.id,
-                "CL": data.control_logic,
-                "OM": data.operation_mode,
-            }
-
-            print("Near real-time rule-based control finished.")
-            return (
-                mode_logic,
-                output_df,
-                (SolverStatus.ok, TerminationCondition.optimal),
+    print(
+        "Input data has been read successfully. Running near real-time rule-based control."
+    )
+
+    # Perform near real-time rule-based control
+    output_df = RB.near_real_time(problem.measurements_request(), battery_specs)
+
+    # Define mode_logic information
+    mode_logic = {
+        "ID": data.id,
+        "CL": data.control_logic,
+        "OM": data.operation_mode,
+    }
+
+    print("Near real-time rule-based control finished.")
+    return (
+        mode_logic,
+        output_df,
+        _solver_free_status(),
+    )
+
+
+def rule_based_scheduling(problem: ControlProblem):
+    """
+    Run the scheduling rule-based control.
+
+    :param problem: Control problem compiled from the input data.
+    :return: Tuple containing mode logic information, output DataFrame, and solver status.
+    """
+    data = problem.data
+    # Prepare the forecasted data and battery specifications
+    df_forecasts = problem.forecasts()
+    battery_specs = problem.battery_specs()
+
+    # If multiple battery nodes are present, handle them
+    if isinstance(battery_specs, list):
+        if len(battery_specs) == 1:
+            battery_specs = battery_specs[0]
+        else:
+            raise RuntimeError(
+                "Rule based control cannot deal with multiple flex nodes."
             )
 
-    if data.control_logic == CL.OPTIMIZATION_BASED:
-        # Prepare forecasted data
-        df_forecasts = data_input.generation_and_load_to_df(
-            data.generation_and_load, start=data.uc_start, end=data.uc_end
+    delta_T = pd.to_timedelta(df_forecasts.P_load_kW.index.freq)
+    print(
+        "Input data has been read successfully. Running scheduling rule-based control."
+    )
+
+    # Perform scheduling over the forecasted data into float columns
+    output_df = RB.scheduling_profile(
+        df_forecasts, battery_specs, delta_T, dtype=data.output_dtype.value
+    )
+    print("Scheduling rule-based control finished.")
+
+    # Rename columns for battery-specific data
+    if battery_specs.id is not None:
+        output_df.rename(
+            {"P_bat_kW": f"P_{battery_specs.id}_kW", "SoC_bat": f"SoC_{battery_specs.id}_%"},
+            inplace=True,
+            axis=1,
         )
-
-        # Prepare power limitations data
-        P_net_after_kW_limits = data_input.P_net_after_kW_lim_to_df(
-            data.P_net_after_kW_limitation, data.generation_and_load
+    else:
+        output_df.rename(
+            {"P_bat_kW": "P_bat_1_kW", "SoC_bat": "SoC_bat_1_%"}, inplace=True, axis=1
         )
 
-        # Prepare battery specifications data
-        df_battery_specs = data_input.battery_to_df(battery_specs)
+    # Define mode_logic information
+    mode_logic = {
+        "ID": data.id,
+        "CL": CL.RULE_BASED,
+        "OM": data.operation_mode,
+    }
 
-        print(
-            "Input data has been read successfully. Running scheduling optimization-based control."
+    return (
+        mode_logic,
+        output_df,
+        _solver_free_status(),
+    )
+
+
+def optimization_based_scheduling(problem: ControlProblem):
+    """
+    Run the scheduling optimization-based control.
+
+    :param problem: Control problem compiled from the input data.
+    :return: Tuple containing mode logic information, output DataFrame, and solver status.
+    """
+    data = problem.data
+    # Long horizons are optimized on representative days
+    if data.representative_periods is not None:
+        return representative_periods_scheduling(problem)
+
+    # Forecasts, limits and battery specifications as frames on the compiled problem
+    df_forecasts = problem.forecasts()
+    P_net_after_kW_limits = problem.limits()
+    df_battery_specs = problem.battery_frame()
+
+    # Aggregate forecasts and limits into the time steps of the requested time resolution
+    if data.time_resolution is not None:
+        df_forecasts, P_net_after_kW_limits = time_resolution.aggregate(
+            df_forecasts, P_net_after_kW_limits, data.time_resolution
         )
 
-        # Perform scheduling optimization-based control
-        (
-            P_net_after_kW,
-            PV_profile,
-            P_bat_kW_df,
-            P_bat_total_kW,
-            SoC_bat_df,
-            upper_bound_kW,
-            lower_bound_kW,
-            solver_status,
-        ) = OptB.scheduling(
+    # Reject provably infeasible inputs before building the model (the elastic formulation
+    # is feasible by construction and reports the violations instead)
+    if not data.elastic:
+        feasibility.check_feasibility(
             df_forecasts,
             df_battery_specs,
             data.day_end,
             data.bulk,
             P_net_after_kW_limits,
-            data.generation_and_load.pv_curtailment,
+            problem.pv_curtailment,
         )
 
-        print("Scheduling optimization-based control finished.")
+    print(
+        "Input data has been read successfully. Running scheduling optimization-based control."
+    )
+
+    # Perform scheduling optimization-based control
+    model = OptB.build_model(
+        df_forecasts,
+        df_battery_specs,
+        data.day_end,
+        data.bulk,
+        P_net_after_kW_limits,
+        problem.pv_curtailment,
+        elastic=data.elastic,
+    )
+    # With a deadline, the best schedule found by then is taken, together with its gap
+    anytime_info = None
+    if data.deadline is not None:
+        solver_status, anytime_info = OptB.solve_anytime(model, data.deadline)
+    else:
+        solver_status = OptB.solve(model)
+    (
+        PV_profile,
+        P_bat_kW_df,
+        P_bat_total_kW,
+        SoC_bat_df,
+        P_net_after_kW,
+        upper_bound_kW,
+        lower_bound_kW,
+    ) = OptB.post_process(model, df_battery_specs)
+
+    print("Scheduling optimization-based control finished.")
+
+    # Prepare the output DataFrame
+    output_df = OptB.prep_output_df(
+        PV_profile,
+        P_bat_kW_df,
+        P_bat_total_kW,
+        SoC_bat_df,
+        P_net_after_kW,
+        df_forecasts,
+        upper_bound_kW,
+        lower_bound_kW,
+        dtype=data.output_dtype.value,
+    )
+    # Report the duration of the aggregated time steps
+    if data.time_resolution is not None:
+        output_df[time_resolution.STEP_COLUMN] = df_forecasts[time_resolution.STEP_COLUMN]
+    # Report the per-timestep constraint violations of the elastic formulation
+    if data.elastic:
+        output_df = output_df.join(OptB.violation_report(model))
+
+    # Define mode_logic information
+    mode_logic = {
+        "ID": data.id,
+        "CL": CL.OPTIMIZATION_BASED,
+        "OM": data.operation_mode,
+    }
+    if anytime_info is not None:
+        mode_logic["gap"] = anytime_info["gap"]
+        mode_logic["incumbents"] = anytime_info["incumbents"]
+
+    return mode_logic, output_df, solver_status
+
+
+def representative_periods_scheduling(problem: ControlProblem):
+    """
+    Run the scheduling optimization-based control on representative days of a long horizon
+    and expand the schedule back to the full horizon.
+
+    :param problem: Control problem compiled from the input data.
+    :return: Tuple containing mode logic information, output DataFrame, and solver status.
+    """
+    data = problem.data
+    # Forecasts, limits and battery specifications as frames on the compiled problem
+    df_forecasts = problem.forecasts()
+    P_net_after_kW_limits = problem.limits()
+    df_battery_specs = problem.battery_frame()
+
+    # Reject provably infeasible inputs (household batteries are not required to be full at
+    # the end of every day on representative days)
+    feasibility.check_feasibility(
+        df_forecasts,
+        df_battery_specs,
+        None,
+        None,
+        P_net_after_kW_limits,
+        problem.pv_curtailment,
+    )
+
+    print(
+        "Input data has been read successfully. Running scheduling optimization-based control "
+        "on representative periods."
+    )
+
+    # Perform scheduling optimization-based control on representative periods
+    (
+        PV_profile,
+        P_bat_kW_df,
+        P_bat_total_kW,
+        SoC_bat_df,
+        P_net_after_kW,
+        upper_bound_kW,
+        lower_bound_kW,
+        info,
+    ) = RP.scheduling(
+        df_forecasts,
+        df_battery_specs,
+        P_net_after_kW_limits,
+        problem.pv_curtailment,
+        data.representative_periods,
+    )
+
+    print(
+        f"Scheduling optimization-based control on {len(info['representative_periods'])} "
+        f"representative periods of {sum(info['representative_periods'].values())} periods "
+        "finished."
+    )
+
+    # Prepare the output DataFrame
+    output_df = OptB.prep_output_df(
+        PV_profile,
+        P_bat_kW_df,
+        P_bat_total_kW,
+        SoC_bat_df,
+        P_net_after_kW,
+        df_forecasts,
+        upper_bound_kW,
+        lower_bound_kW,
+        dtype=data.output_dtype.value,
+    )
+
+    # Define mode_logic information
+    mode_logic = {
+        "ID": data.id,
+        "CL": CL.OPTIMIZATION_BASED,
+        "OM": data.operation_mode,
+        "objective": info["objective"],
+        "representative_periods": {
+            timestamp.isoformat(): count
+            for timestamp, count in info["representative_periods"].items()
+        },
+        "net_load_rmse_kW": info["net_load_rmse_kW"],
+        "relative_energy_error": info["relative_energy_error"],
+    }
+
+    return mode_logic, output_df, (info["status"], info["termination_condition"])
+
+
+def tiered_scheduling(problem: ControlProblem):
+    """
+    Run the deadline-aware tiered scheduling control.
+
+    The fast rule-based schedule is computed first as a baseline. The optimization-based control
+    is then run until data.deadline. Its schedule is returned if one has been found in time,
+    otherwise (deadline missed, infeasible input or solver failure) the baseline is returned.
+    The tier which produced the result is recorded under "tier" in mode_logic. Inputs without
+    a rule-based baseline (e.g. multiple batteries) only run the optimization tier, which is
+    recorded under "baseline_unavailable" and "baseline_unavailable_reason"; the error of the
+    optimization tier is raised if it fails as well.
+
+    :param problem: Control problem compiled from the input data.
+    :return: Tuple containing mode logic information, output DataFrame, and solver status.
+    """
+    # Tier 1: rule-based baseline
+    baseline = None
+    try:
+        baseline = rule_based_scheduling(problem)
+    except Exception as err:
+        print(f"Rule-based baseline unavailable, running the optimization tier only: {err}")
+        baseline_error = err
+
+    # Tier 2: optimization-based control under the wall-clock budget given by the deadline
+    try:
+        mode_logic, output_df, solver_status = optimization_based_scheduling(problem)
+    except Exception as err:
+        if baseline is None:
+            raise
+        print(f"Optimization tier failed, falling back to the rule-based baseline: {err}")
+        mode_logic, output_df, solver_status = baseline
+        mode_logic["tier"] = "rule_based"
+        mode_logic["fallback_reason"] = str(err)
+        return mode_logic, output_df, solver_status
+
+    mode_logic["tier"] = "optimization_based"
+    if baseline is None:
+        mode_logic["baseline_unavailable"] = True
+        mode_logic["baseline_unavailable_reason"] = str(baseline_error)
+    return mode_logic, output_df, solver_status
+
 
-        # Prepare the output DataFrame
-        output_df = OptB.prep_output_df(
-            P_net_after_kW,
-            PV_profile,
-            P_bat_kW_df,
-            P_bat_total_kW,
-            SoC_bat_df,
+def dynamic_programming_scheduling(problem: ControlProblem):
+    """
+    Run the solver-free dynamic programming scheduling control of a single battery.
+
+    :param problem: Control problem compiled from the input data.
+    :return: Tuple containing mode logic information, output DataFrame, and solver status.
+    """
+    data = problem.data
+    # Forecasts, limits and battery specifications as frames on the compiled problem
+    df_forecasts = problem.forecasts()
+    P_net_after_kW_limits = problem.limits()
+    df_battery_specs = problem.battery_frame()
+
+    # Reject provably infeasible inputs
+    feasibility.check_feasibility(
+        df_forecasts,
+        df_battery_specs,
+        data.day_end,
+        data.bulk,
+        P_net_after_kW_limits,
+        problem.pv_curtailment,
+    )
+
+    print(
+        "Input data has been read successfully. Running scheduling dynamic programming control."
+    )
+
+    # Perform scheduling dynamic programming control
+    (
+        PV_profile,
+        P_bat_kW_df,
+        P_bat_total_kW,
+        SoC_bat_df,
+        P_net_after_kW,
+        upper_bound_kW,
+        lower_bound_kW,
+        info,
+    ) = DP.scheduling(
+        df_forecasts,
+        df_battery_specs,
+        data.day_end,
+        data.bulk,
+        P_net_after_kW_limits,
+        problem.pv_curtailment,
+    )
+
+    print("Scheduling dynamic programming control finished.")
+
+    # Prepare the output DataFrame
+    output_df = OptB.prep_output_df(
+        PV_profile,
+        P_bat_kW_df,
+        P_bat_total_kW,
+        SoC_bat_df,
+        P_net_after_kW,
+        df_forecasts,
+        upper_bound_kW,
+        lower_bound_kW,
+        dtype=data.output_dtype.value,
+    )
+
+    # Define mode_logic information
+    mode_logic = {
+        "ID": data.id,
+        "CL": CL.DYNAMIC_PROGRAMMING,
+        "OM": data.operation_mode,
+        "objective": info["objective"],
+        "SoC_resolution_%": info["SoC_resolution_%"],
+    }
+    # Report the gap to the MILP optimum on request
+    if data.discretization_error:
+        mode_logic["discretization_error"] = DP.discretization_error(
             df_forecasts,
-            upper_bound_kW,
-            lower_bound_kW,
+            df_battery_specs,
+            data.day_end,
+            P_net_after_kW_limits,
+            problem.pv_curtailment,
+            info=info,
         )
 
-        # Define mode_logic information
-        mode_logic = {
-            "ID": data.id,
-            "CL": data.control_logic,
-            "OM": data.operation_mode,
-        }
+    return (
+        mode_logic,
+        output_df,
+        _solver_free_status(),
+    )
 
-        return mode_logic, output_df, solver_status
+
+def peak_shaving_scheduling(problem: ControlProblem):
+    """
+    Run the forecast-aware peak-shaving heuristic scheduling control.
+
+    :param problem: Control problem compiled from the input data.
+    :return: Tuple containing mode logic information, output DataFrame, and solver status.
+    """
+    data = problem.data
+    # Forecasts, limits and battery specifications as frames on the compiled problem
+    df_forecasts = problem.forecasts()
+    P_net_after_kW_limits = problem.limits()
+    df_battery_specs = problem.battery_frame()
+
+    # Reject provably infeasible inputs
+    feasibility.check_feasibility(
+        df_forecasts,
+        df_battery_specs,
+        data.day_end,
+        data.bulk,
+        P_net_after_kW_limits,
+        problem.pv_curtailment,
+    )
+
+    print(
+        "Input data has been read successfully. Running scheduling peak-shaving control."
+    )
+
+    # Perform scheduling peak-shaving control
+    (
+        PV_profile,
+        P_bat_kW_df,
+        P_bat_total_kW,
+        SoC_bat_df,
+        P_net_after_kW,
+        upper_bound_kW,
+        lower_bound_kW,
+        info,
+    ) = PS.scheduling(
+        df_forecasts,
+        df_battery_specs,
+        data.day_end,
+        data.bulk,
+        P_net_after_kW_limits,
+        problem.pv_curtailment,
+    )
+
+    print("Scheduling peak-shaving control finished.")
+    if info["bound_violations"]:
+        print(
+            f"Warning: P_net_after_kW bounds could not be met in "
+            f"{info['bound_violations']} time steps."
+        )
+
+    # Prepare the output DataFrame
+    output_df = OptB.prep_output_df(
+        PV_profile,
+        P_bat_kW_df,
+        P_bat_total_kW,
+        SoC_bat_df,
+        P_net_after_kW,
+        df_forecasts,
+        upper_bound_kW,
+        lower_bound_kW,
+        dtype=data.output_dtype.value,
+    )
+
+    # Define mode_logic information
+    mode_logic = {
+        "ID": data.id,
+        "CL": CL.PEAK_SHAVING,
+        "OM": data.operation_mode,
+        "objective": info["objective"],
+        "import_threshold_kW": info["import_threshold_kW"],
+        "export_threshold_kW": info["export_threshold_kW"],
+        "bound_violations": info["bound_violations"],
+        "final_SoC_deviation_%": info["final_SoC_deviation_%"],
+    }
+
+    return (
+        mode_logic,
+        output_df,
+        _solver_free_status(),
+    )
+
+
+def battery_sizing_sweep(
+    data: InputData,
+    grid: Dict[str, Sequence[float]],
+    bat_id: str = None,
+    n_workers: int = 1,
+) -> pd.DataFrame:
+    """
+    Run the scheduling optimization-based control of the input data for every candidate battery
+    size of the grid (see battery_sizing.sweep), without an InputData round trip per candidate.
+
+    :param data: InputData object containing input data.
+    :param grid: Candidate values of the swept battery specifications, e.g.
+        {"bat_capacity_kWh": [100, 200], "P_ch_max_kW": [50, 100]}.
+    :param bat_id: Identifier of the sized battery (optional for a single battery).
+    :param n_workers: Number of worker processes.
+    :return: DataFrame with the results of every candidate, indexed by the swept parameters.
+    """
+    # Compile the input data into forecasts, limits and battery specifications frames
+    problem = ControlProblem.compile(data)
+    df_forecasts = problem.forecasts()
+    P_net_after_kW_limits = problem.limits()
+    df_battery_specs = problem.battery_frame()
+
+    # Aggregate forecasts and limits into the time steps of the requested time resolution
+    if data.time_resolution is not None:
+        df_forecasts, P_net_after_kW_limits = time_resolution.aggregate(
+            df_forecasts, P_net_after_kW_limits, data.time_resolution
+        )
+
+    return BS.sweep(
+        df_forecasts,
+        df_battery_specs,
+        data.day_end,
+        data.bulk,
+        P_net_after_kW_limits,
+        problem.pv_curtailment,
+        grid,
+        bat_id=bat_id,
+        n_workers=n_workers,
+    )
+
+
+def _solver_free_status():
+    """Solver status reported by the control logics which do not run an optimization solver."""
+    from pyomo.opt import SolverStatus, TerminationCondition
+
+    return (SolverStatus.ok, TerminationCondition.optimal)
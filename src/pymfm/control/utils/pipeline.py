@@ -0,0 +1,163 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Programmatic entry point of the control pipeline for callers holding their forecasts as
+pandas or NumPy data.
+
+run_control takes the forecast (and limitations) as a DatetimeIndex-ed DataFrame or a dictionary
+of arrays, without serializing them into per-timestamp records for InputData: the series are
+checked vectorized and handed to InputData as columns sharing the caller's float64 arrays, only
+the small fields (times, batteries, options) are validated by pydantic.
+"""
+
+from typing import TYPE_CHECKING, List, Mapping, Optional, Type, Union
+import numpy as np
+import pandas as pd
+from pymfm.control.utils.data_input import (
+    BatterySpecs,
+    ControlLogic,
+    GenerationAndLoadColumns,
+    InputData,
+    OperationMode,
+    P_net_after_kWLimitationColumns,
+    TimeSeriesColumns,
+)
+from pymfm.control.utils.mode_logic_handler import mode_logic_handler
+
+if TYPE_CHECKING:
+    from pymfm.control.utils.result_cache import ResultCache
+
+# Forecast or limitation series: a DatetimeIndex-ed DataFrame or arrays with a "timestamp" key
+Series = Union[pd.DataFrame, Mapping[str, np.ndarray]]
+Batteries = Union[pd.DataFrame, dict, BatterySpecs, List[Union[dict, BatterySpecs]]]
+
+
+def run_control(
+    forecast: Optional[Series],
+    battery_specs: Batteries,
+    control_logic: Union[ControlLogic, str] = ControlLogic.OPTIMIZATION_BASED,
+    operation_mode: Union[OperationMode, str] = OperationMode.SCHEDULING,
+    uc_start=None,
+    uc_end=None,
+    limits: Optional[Series] = None,
+    pv_curtailment: Optional[float] = None,
+    id: str = "pymfm",
+    application: str = "pymfm",
+    cache: "ResultCache" = None,
+    **options,
+):
+    """
+    Run the control pipeline on a forecast held as pandas or NumPy data.
+
+    :param forecast: Generation and load forecast, a DataFrame with a DatetimeIndex (uniform
+        time step) and float P_gen_kW and P_load_kW columns, or a dictionary of timestamp,
+        P_gen_kW and P_load_kW arrays (None for near real-time operation).
+    :param battery_specs: Battery specifications: a DataFrame with a row per battery (as
+        returned by data_input.battery_to_df), dictionaries of their fields or BatterySpecs.
+    :param control_logic: The control logic (default: optimization_based).
+    :param operation_mode: The operation mode (default: scheduling).
+    :param uc_start: Start of the control operation (default: start of the forecast).
+    :param uc_end: End of the control operation (default: end of the forecast).
+    :param limits: P_net_after limitations in the form of the forecast with upper_bound and/or
+        lower_bound columns, NaN where there is no bound (optional).
+    :param pv_curtailment: The PV curtailment value (optional).
+    :param id: The identifier of the control run.
+    :param application: The application name.
+    :param cache: Cache returning the result of identical inputs without recomputation
+        (optional).
+    :param options: Further InputData fields, e.g. bulk, day_end, location, elastic, deadline,
+        time_resolution, representative_periods or measurements_request.
+    :return: Tuple containing mode logic information, output DataFrame, and solver status.
+    """
+    data = {
+        "id": id,
+        "application": application,
+        "control_logic": control_logic,
+        "operation_mode": operation_mode,
+        "battery_specs": _battery_records(battery_specs),
+        **options,
+    }
+    if forecast is not None:
+        values = series_columns(GenerationAndLoadColumns, forecast)
+        data["generation_and_load"] = {"pv_curtailment": pv_curtailment, "values": values}
+        data["uc_start"] = values.timestamps[0] if uc_start is None else uc_start
+        data["uc_end"] = values.timestamps[-1] if uc_end is None else uc_end
+    else:
+        data["uc_start"], data["uc_end"] = uc_start, uc_end
+    if limits is not None:
+        data["P_net_after_kW_limitation"] = series_columns(
+            P_net_after_kWLimitationColumns, limits
+        )
+    return mode_logic_handler(InputData(**data), cache=cache)
+
+
+def series_columns(cls: Type[TimeSeriesColumns], series: Series) -> TimeSeriesColumns:
+    """
+    Validated columns of a time series sharing the float64 arrays of the given data.
+
+    :param cls: The columns type, e.g. GenerationAndLoadColumns.
+    :param series: A DataFrame with a DatetimeIndex and a column per series, or a dictionary of
+        timestamp and series arrays.
+    :return: The columns, with missing series NaN.
+    """
+    if isinstance(series, pd.DataFrame):
+        timestamps = series.index
+    elif isinstance(series, Mapping) and "timestamp" in series:
+        timestamps = series["timestamp"]
+    else:
+        raise ValueError(
+            f"{cls.NAME} has to be a DataFrame with a DatetimeIndex or a dictionary of "
+            f"timestamp, {', '.join(cls.COLUMNS)} arrays."
+        )
+    if not isinstance(timestamps, pd.DatetimeIndex):
+        timestamps = pd.DatetimeIndex(timestamps)
+    if timestamps.hasnans or not len(timestamps):
+        raise ValueError(f"{cls.NAME} requires a timestamp for every value.")
+
+    columns = []
+    for name in cls.COLUMNS:
+        if name in series:
+            # A view of float64 data, converted otherwise
+            column = np.asarray(series[name], dtype=float)
+            if column.shape != (len(timestamps),):
+                raise ValueError(
+                    f"{name} of {cls.NAME} has to have a value per timestamp."
+                )
+        else:
+            column = np.full(len(timestamps), np.nan)
+        columns.append(column)
+    return cls.from_columns(timestamps.rename("timestamp"), columns)
+
+
+def _battery_records(battery_specs: Batteries) -> Union[dict, BatterySpecs, list]:
+    """Battery specifications in a form validated by InputData."""
+    if isinstance(battery_specs, pd.DataFrame):
+        if battery_specs.index.name == "id":
+            battery_specs = battery_specs.reset_index()
+        # Missing values (e.g. no final_SoC) are None for pydantic
+        return (
+            battery_specs.astype(object)
+            .where(battery_specs.notna(), None)
+            .to_dict("records")
+        )
+    return battery_specs
@@ -0,0 +1,300 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Loaders of long load/PV profiles and P_net_after limitation series from Parquet, Arrow IPC
+(Feather) and CSV files.
+
+Profiles shared by many control runs (e.g. a year in 1-minute resolution) are read column-wise
+and cut to the use case window before anything is converted: Arrow IPC files are memory-mapped
+and sliced zero-copy, Parquet files only decode the row groups overlapping the window. The
+loaded columns are accepted by InputData in place of the JSON lists, e.g.::
+
+    data["generation_and_load"] = {
+        "values": load_generation_and_load("profile.arrow", data["uc_start"], data["uc_end"])
+    }
+
+The files hold a timestamp column (sorted ascending) and the float columns of the series
+(P_gen_kW and P_load_kW, or upper_bound and lower_bound). Reading Parquet and Arrow files
+requires pyarrow.
+"""
+
+from datetime import datetime
+import os
+from typing import Dict, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+from pymfm.control.utils.data_input import (
+    GenerationAndLoadColumns,
+    P_net_after_kWLimitationColumns,
+)
+
+PARQUET_SUFFIXES = (".parquet", ".pq")
+ARROW_SUFFIXES = (".arrow", ".feather", ".ipc")
+CSV_SUFFIXES = (".csv",)
+
+# Nanoseconds per unit of Arrow timestamps
+NS_PER_UNIT = {"s": 10**9, "ms": 10**6, "us": 10**3, "ns": 1}
+
+Time = Union[datetime, str, None]
+
+
+def load_generation_and_load(
+    path: str, uc_start: Time = None, uc_end: Time = None, timestamp_column: str = "timestamp"
+) -> GenerationAndLoadColumns:
+    """Load a generation and load forecast within [uc_start, uc_end].
+
+    Parameters
+    ----------
+    path : str
+        Parquet, Arrow IPC or CSV file with the P_gen_kW and P_load_kW columns.
+    uc_start : Time, optional
+        first timestamp to load, by default the start of the file.
+    uc_end : Time, optional
+        last timestamp to load, by default the end of the file.
+    timestamp_column : str, optional
+        name of the timestamp column, by default "timestamp".
+
+    Returns
+    -------
+    GenerationAndLoadColumns
+        the forecast, validated as generation_and_load values.
+    """
+    timestamps, columns = read_time_series(
+        path, GenerationAndLoadColumns.COLUMNS, uc_start, uc_end, timestamp_column
+    )
+    missing = [name for name, column in columns.items() if column is None]
+    if missing:
+        raise ValueError(f"{path} has no {', '.join(missing)} column.")
+    return GenerationAndLoadColumns.from_columns(timestamps, list(columns.values()))
+
+
+def load_P_net_after_kW_limitation(
+    path: str, uc_start: Time = None, uc_end: Time = None, timestamp_column: str = "timestamp"
+) -> P_net_after_kWLimitationColumns:
+    """Load P_net_after limitations within [uc_start, uc_end].
+
+    Parameters
+    ----------
+    path : str
+        Parquet, Arrow IPC or CSV file with an upper_bound and/or a lower_bound column, where
+        missing values mean no bound.
+    uc_start : Time, optional
+        first timestamp to load, by default the start of the file.
+    uc_end : Time, optional
+        last timestamp to load, by default the end of the file.
+    timestamp_column : str, optional
+        name of the timestamp column, by default "timestamp".
+
+    Returns
+    -------
+    P_net_after_kWLimitationColumns
+        the limitations, validated as P_net_after_kW_limitation.
+    """
+    timestamps, columns = read_time_series(
+        path, P_net_after_kWLimitationColumns.COLUMNS, uc_start, uc_end, timestamp_column
+    )
+    if all(column is None for column in columns.values()):
+        raise ValueError(f"{path} has neither an upper_bound nor a lower_bound column.")
+    return P_net_after_kWLimitationColumns.from_columns(
+        timestamps,
+        [
+            np.full(len(timestamps), np.nan) if column is None else column
+            for column in columns.values()
+        ],
+    )
+
+
+def read_time_series(
+    path: str,
+    columns: Tuple[str, ...],
+    start: Time = None,
+    end: Time = None,
+    timestamp_column: str = "timestamp",
+) -> Tuple[pd.DatetimeIndex, Dict[str, Optional[np.ndarray]]]:
+    """Read the timestamps and float columns of a time series file within [start, end].
+
+    Parameters
+    ----------
+    path : str
+        Parquet (.parquet, .pq), Arrow IPC (.arrow, .feather, .ipc) or CSV (.csv) file.
+    columns : Tuple[str, ...]
+        names of the float columns to read.
+    start : Time, optional
+        first timestamp to read, by default the start of the file.
+    end : Time, optional
+        last timestamp to read, by default the end of the file.
+    timestamp_column : str, optional
+        name of the timestamp column, by default "timestamp".
+
+    Returns
+    -------
+    Tuple[pd.DatetimeIndex, Dict[str, Optional[np.ndarray]]]
+        timestamps (named "timestamp") and a float array per column, None for columns missing
+        in the file.
+    """
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix in CSV_SUFFIXES:
+        timestamps, arrays = _read_csv(path, columns, start, end, timestamp_column)
+    elif suffix in PARQUET_SUFFIXES + ARROW_SUFFIXES:
+        timestamps, arrays = _read_arrow(
+            path, columns, start, end, timestamp_column, suffix in PARQUET_SUFFIXES
+        )
+    else:
+        raise ValueError(
+            f"Unsupported profile file {path}, expected one of "
+            f"{', '.join(PARQUET_SUFFIXES + ARROW_SUFFIXES + CSV_SUFFIXES)}."
+        )
+    if not len(timestamps):
+        raise ValueError(f"{path} has no values between {start} and {end}.")
+    return timestamps.rename("timestamp"), arrays
+
+
+def _read_arrow(
+    path: str,
+    columns: Tuple[str, ...],
+    start: Time,
+    end: Time,
+    timestamp_column: str,
+    parquet: bool,
+) -> Tuple[pd.DatetimeIndex, Dict[str, Optional[np.ndarray]]]:
+    """Read a Parquet or memory-mapped Arrow IPC file and slice it to [start, end]."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError(
+            "Reading Parquet and Arrow profiles requires pyarrow (pip install pymfm[arrow])."
+        )
+
+    if parquet:
+        schema = pq.read_schema(path)
+        names = [name for name in columns if name in schema.names]
+        timestamp_type = schema.field(timestamp_column).type
+        # Row groups entirely outside of the window are skipped using their statistics
+        filters = [
+            (timestamp_column, operator, pa.scalar(_as_timestamp(t, timestamp_type.tz)))
+            for operator, t in ((">=", start), ("<=", end))
+            if t is not None
+        ]
+        table = pq.read_table(
+            path,
+            columns=[timestamp_column] + names,
+            filters=filters or None,
+            memory_map=True,
+        )
+    else:
+        source = pa.memory_map(path)
+        try:
+            table = pa.ipc.open_file(source).read_all()
+        except pa.ArrowInvalid:
+            # Arrow IPC stream format
+            source.seek(0)
+            table = pa.ipc.open_stream(source).read_all()
+        names = [name for name in columns if name in table.column_names]
+
+    # The table references the memory-mapped buffers, slicing it copies nothing
+    first, last = _window(table.column(timestamp_column), start, end)
+    table = table.slice(first, last - first)
+    timestamps = pd.DatetimeIndex(table.column(timestamp_column).to_pandas())
+    arrays = {
+        name: table.column(name).to_numpy().astype(float, copy=False)
+        if name in names
+        else None
+        for name in columns
+    }
+    return timestamps, arrays
+
+
+def _window(timestamps, start: Time, end: Time) -> Tuple[int, int]:
+    """Row range [first, last) of the sorted (possibly chunked) Arrow timestamp array within
+    [start, end]."""
+    import pyarrow as pa
+
+    tz, unit = timestamps.type.tz, timestamps.type.unit
+    ns_per_unit = NS_PER_UNIT[unit]
+    first = last = 0
+    for chunk in timestamps.chunks:
+        # Zero-copy view of the chunk as integer (UTC) times in its unit
+        values = chunk.view(pa.int64()).to_numpy()
+        first += (
+            values.searchsorted(-(-_as_ns(start, tz) // ns_per_unit), side="left")
+            if start is not None
+            else 0
+        )
+        last += (
+            values.searchsorted(_as_ns(end, tz) // ns_per_unit, side="right")
+            if end is not None
+            else len(values)
+        )
+    return first, last
+
+
+def _read_csv(
+    path: str,
+    columns: Tuple[str, ...],
+    start: Time,
+    end: Time,
+    timestamp_column: str,
+) -> Tuple[pd.DatetimeIndex, Dict[str, Optional[np.ndarray]]]:
+    """Read a CSV file and slice it to [start, end]."""
+    wanted = {timestamp_column, *columns}
+    df = pd.read_csv(
+        path,
+        usecols=lambda name: name in wanted,
+        parse_dates=[timestamp_column],
+        index_col=timestamp_column,
+        float_precision="round_trip",
+    )
+    timestamps = pd.DatetimeIndex(df.index)
+    first = (
+        timestamps.searchsorted(_as_timestamp(start, timestamps.tz), side="left")
+        if start is not None
+        else 0
+    )
+    last = (
+        timestamps.searchsorted(_as_timestamp(end, timestamps.tz), side="right")
+        if end is not None
+        else len(timestamps)
+    )
+    df = df.iloc[first:last]
+    arrays = {
+        name: df[name].to_numpy(float) if name in df.columns else None for name in columns
+    }
+    return pd.DatetimeIndex(df.index), arrays
+
+
+def _as_timestamp(t: Time, tz) -> pd.Timestamp:
+    """Timestamp comparable to a timestamp column in the time zone tz (None if naive)."""
+    t = pd.Timestamp(t)
+    if tz is None:
+        if t.tz is not None:
+            raise ValueError(
+                f"Time zone aware {t} cannot be compared to the naive timestamps of the profile."
+            )
+        return t
+    return t.tz_localize("UTC") if t.tz is None else t
+
+
+def _as_ns(t: Time, tz) -> int:
+    """UTC (or naive) nanoseconds since the epoch comparable to an Arrow timestamp column."""
+    return _as_timestamp(t, tz).value
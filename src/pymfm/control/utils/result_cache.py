@@ -0,0 +1,263 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+from collections import OrderedDict
+import copy
+from datetime import datetime, timezone
+from enum import Enum
+import hashlib
+from importlib import metadata
+import json
+import os
+import pickle
+import tempfile
+from typing import Callable, Tuple
+import pandas as pd
+from pydantic import BaseModel
+from pymfm.control.utils.data_input import (
+    ControlLogic as CL,
+    InputData,
+    TimeSeriesColumns,
+)
+from pymfm.control.utils.lazy import lazy_import
+
+OptB = lazy_import("pymfm.control.algorithms.optimization_based")
+DP = lazy_import("pymfm.control.algorithms.dynamic_programming")
+PS = lazy_import("pymfm.control.algorithms.peak_shaving")
+RP = lazy_import("pymfm.control.algorithms.representative_periods")
+
+# Default number of results kept in memory
+MAX_ENTRIES = 128
+# Default size limit of the on-disk results (bytes)
+MAX_DISK_BYTES = 512 * 1024**2
+# File extension of the on-disk results
+SUFFIX = ".pkl"
+
+
+def solver_configuration(control_logic: CL = None) -> dict:
+    """Configuration besides the input data which the results of a control run depend on:
+    the package and pyomo versions, the optimization solver and the settings of the algorithms.
+
+    Only the settings of the algorithms run by the given control logic are included (all if it
+    is None), so that the keys of e.g. rule-based runs do not load the optimization stack."""
+    try:
+        version = metadata.version("pymfm")
+    except metadata.PackageNotFoundError:
+        version = None
+    try:
+        pyomo_version = metadata.version("pyomo")
+    except metadata.PackageNotFoundError:
+        pyomo_version = None
+    configuration = {"pymfm": version, "pyomo": pyomo_version}
+    if control_logic in (None, CL.OPTIMIZATION_BASED, CL.TIERED):
+        configuration["solver"] = OptB.SOLVER_NAME
+        configuration["elastic_penalty"] = OptB.ELASTIC_PENALTY
+        configuration["rp_period_hours"] = RP.PERIOD_HOURS
+        configuration["rp_clustering_seed"] = RP.CLUSTERING_SEED
+    if control_logic in (None, CL.DYNAMIC_PROGRAMMING):
+        configuration["dp_grid_points"] = DP.GRID_POINTS
+        configuration["dp_peak_search"] = [
+            DP.PEAK_GRID_POINTS,
+            DP.PEAK_CAPS,
+            DP.PEAK_SEARCH_ROUNDS,
+        ]
+    if control_logic in (None, CL.PEAK_SHAVING):
+        configuration["ps_bisection_iterations"] = PS.BISECTION_ITERATIONS
+    return configuration
+
+
+def input_key(data: InputData) -> str:
+    """Canonical hash of the normalized input data and the solver configuration.
+
+    Inputs which only differ in their representation (key order, time zone of the timestamps,
+    aliases, optional fields set to their defaults) share the same key.
+
+    Parameters
+    ----------
+    data : InputData
+        input data of a control run.
+
+    Returns
+    -------
+    str
+        SHA-256 hex digest.
+    """
+    canonical = json.dumps(
+        {"input": _normalize(data), "configuration": solver_configuration(data.control_logic)},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ResultCache:
+    """Content-addressed cache of control run results (mode_logic, output_df, status), keyed by
+    input_key.
+
+    Results are kept in an in-process LRU tier of max_entries results and, if a directory is
+    given, in an on-disk tier shared between processes, where the least recently used results
+    are evicted once the files exceed max_disk_bytes. Cached results are returned as copies, so
+    that callers can modify them freely.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = MAX_ENTRIES,
+        directory: str = None,
+        max_disk_bytes: int = MAX_DISK_BYTES,
+    ):
+        """
+        :param max_entries: Number of results kept in memory.
+        :param directory: Directory of the on-disk tier (optional, created if missing).
+        :param max_disk_bytes: Size limit of the on-disk tier in bytes.
+        """
+        if max_entries < 0 or max_disk_bytes < 0:
+            raise ValueError("The cache sizes cannot be negative.")
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, key: str) -> Tuple[dict, pd.DataFrame, tuple]:
+        """
+        Look up a result, first in memory and then on disk.
+
+        :param key: Key of the result (see input_key).
+        :return: Copy of the cached result, None if it is not cached.
+        """
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return copy.deepcopy(self._memory[key])
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                result = pickle.load(file)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        # Mark as recently used for the eviction
+        os.utime(path)
+        self._remember(key, result)
+        return copy.deepcopy(result)
+
+    def put(self, key: str, result: Tuple[dict, pd.DataFrame, tuple]):
+        """
+        Store a result in both tiers.
+
+        :param key: Key of the result (see input_key).
+        :param result: Tuple of mode logic information, output DataFrame, and solver status.
+        """
+        result = copy.deepcopy(result)
+        self._remember(key, result)
+        if self.directory is None:
+            return
+        # Write to a temporary file first, so that concurrent readers never see partial results
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(descriptor, "wb") as file:
+            pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, self._path(key))
+        self._evict()
+
+    def get_or_compute(
+        self,
+        data: InputData,
+        compute: Callable[[], Tuple[dict, pd.DataFrame, tuple]],
+    ) -> Tuple[dict, pd.DataFrame, tuple]:
+        """
+        Return the cached result of the input data, or compute and cache it.
+
+        :param data: InputData object containing input data.
+        :param compute: Control run of the input data, called on a cache miss.
+        :return: Tuple containing mode logic information, output DataFrame, and solver status.
+        """
+        key = input_key(data)
+        result = self.get(key)
+        if result is not None:
+            print(f"Returning the cached result of input data {data.id}.")
+            return result
+        result = compute()
+        self.put(key, result)
+        return result
+
+    def clear(self):
+        """Remove all results from both tiers."""
+        self._memory.clear()
+        if self.directory is not None:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(SUFFIX):
+                    os.remove(entry.path)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def _remember(self, key, result):
+        """Store a result in the LRU tier, dropping the least recently used ones."""
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        """Remove the least recently used files until the on-disk tier fits max_disk_bytes."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+
+
+def _normalize(value):
+    """JSON-compatible canonical form of (nested) input data."""
+    if isinstance(value, BaseModel):
+        return _normalize(value.dict())
+    if isinstance(value, TimeSeriesColumns):
+        return _normalize(value.to_dict())
+    if isinstance(value, dict):
+        return {str(key): _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, float):
+        return repr(value)
+    return value
@@ -0,0 +1,293 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from collections import deque
+import os
+import threading
+import time
+from typing import Callable, Iterator, List
+
+# Name of the thread limit option of the supported optimization solvers
+THREAD_OPTIONS = {
+    "gurobi": "Threads",
+    "gurobi_persistent": "Threads",
+    "appsi_highs": "threads",
+    "highs": "threads",
+    "cbc": "threads",
+    "scip": "lp/threads",
+}
+
+# Seconds a job waits for further submissions (e.g. the rest of a burst) before it is started
+# with a budget of several cores
+COALESCE_S = 0.02
+
+# Thread budget of the solves of this process, set in the worker processes of a scheduler
+_thread_budget = None
+
+
+def thread_budget() -> int:
+    """Thread budget of the solves of this process, None outside of the worker processes of a
+    SolverResourceScheduler (the solvers use all cores)."""
+    return _thread_budget
+
+
+def solver_options(solver_name: str) -> dict:
+    """Solver options limiting a solve of this process to its thread budget.
+
+    Parameters
+    ----------
+    solver_name : str
+        name of the optimization solver (e.g. optimization_based.SOLVER_NAME).
+
+    Returns
+    -------
+    dict
+        solver options, empty without thread budget or for solvers without a known thread option.
+    """
+    option = THREAD_OPTIONS.get(solver_name)
+    if _thread_budget is None or option is None:
+        return {}
+    return {option: _thread_budget}
+
+
+class SolverAllocation:
+    """
+    Cores reserved for a single solve by a SolverResourceScheduler.
+    """
+
+    def __init__(self, threads: int, cores: List[int], queue_wait_s: float):
+        """
+        :param threads: Thread budget of the solve.
+        :param cores: CPU cores reserved for the solve.
+        :param queue_wait_s: Time the solve waited in the queue (seconds).
+        """
+        self.threads = threads
+        self.cores = cores
+        self.queue_wait_s = queue_wait_s
+
+
+class SolverResourceScheduler:
+    """
+    Local scheduler of the CPU cores of concurrent optimization solves (e.g. several
+    optimization_based.scheduling calls), so that the solvers do not each grab all cores and
+    thrash the machine.
+
+    Every job reserves a thread budget of dedicated cores for its duration and runs in a worker
+    process, where the solvers of optimization_based are limited to that budget (see
+    solver_options) and optionally pinned to the reserved cores (Linux only). Jobs are started in
+    the order they are submitted and wait in the queue while no core is free. The budget is
+    adapted to the load: a job gets an equal share of the free cores with all jobs submitted but
+    not started yet, between 1 and max_threads_per_solve cores, so that a lone solve can use
+    several cores while many concurrent solves run on one core each, which gives the highest
+    total throughput for branch-and-bound solvers. A job is only given several cores once
+    COALESCE_S have passed since its submission, so that the first job of a burst of
+    submissions does not reserve the cores of the jobs submitted right after it.
+    """
+
+    def __init__(
+        self,
+        cores: List[int] = None,
+        max_threads_per_solve: int = None,
+        pin_affinity: bool = False,
+    ):
+        """
+        :param cores: CPU cores available to the solves (optional, default: all cores available
+            to the process).
+        :param max_threads_per_solve: Maximum thread budget of a single solve (optional, default:
+            all cores).
+        :param pin_affinity: If true, the worker processes are pinned to the reserved cores.
+        """
+        if cores is None:
+            if hasattr(os, "sched_getaffinity"):
+                cores = sorted(os.sched_getaffinity(0))
+            else:
+                cores = list(range(os.cpu_count() or 1))
+        if not cores:
+            raise ValueError("The solver resource scheduler requires at least one core.")
+        if max_threads_per_solve is not None and max_threads_per_solve < 1:
+            raise ValueError("max_threads_per_solve has to be at least 1.")
+        if pin_affinity and not hasattr(os, "sched_setaffinity"):
+            raise RuntimeError("CPU affinity is not supported on this platform.")
+        if pin_affinity:
+            # The worker processes could not be pinned to cores unavailable to the process
+            unavailable = sorted(set(cores) - os.sched_getaffinity(0))
+            if unavailable:
+                raise ValueError(
+                    f"Cores {unavailable} are not available to the process "
+                    f"(available: {sorted(os.sched_getaffinity(0))})."
+                )
+        self.cores = list(cores)
+        self.max_threads_per_solve = max_threads_per_solve or len(self.cores)
+        self.pin_affinity = pin_affinity
+        self._executor = ProcessPoolExecutor(max_workers=len(self.cores))
+        self._condition = threading.Condition()
+        self._free_cores = list(self.cores)
+        self._queue = deque()
+        self._futures = []
+        self._started = None
+        self._submitted = 0
+        self._running = 0
+        self._completed = 0
+        self._queue_wait_s = []
+        self._run_s = []
+        self._core_s = 0.0
+
+    def submit(self, function: Callable, *args, **kwargs) -> Future:
+        """
+        Queue a job (e.g. optimization_based.scheduling) to be run in a worker process as soon
+        as cores are free.
+
+        :param function: Picklable function running the solve.
+        :param args: Positional arguments of the function.
+        :param kwargs: Keyword arguments of the function.
+        :return: Future of the result of the function.
+        """
+        future = Future()
+        submitted_at = time.perf_counter()
+        with self._condition:
+            if self._started is None:
+                self._started = submitted_at
+            self._submitted += 1
+            self._futures.append(future)
+            # A job waiting to be started with several cores shares them with this one
+            self._condition.notify_all()
+
+        def dispatch():
+            try:
+                with self._allocate(submitted_at) as allocation:
+                    result = self._executor.submit(
+                        _run_allocated,
+                        allocation.threads,
+                        allocation.cores if self.pin_affinity else None,
+                        function,
+                        args,
+                        kwargs,
+                    ).result()
+            except BaseException as err:
+                future.set_exception(err)
+            else:
+                future.set_result(result)
+
+        threading.Thread(target=dispatch, daemon=True).start()
+        return future
+
+    @contextmanager
+    def _allocate(self, submitted_at: float) -> Iterator[SolverAllocation]:
+        """Reserve cores for a job, waiting in the queue while no core is free, and release them
+        when the job is done."""
+        ticket = object()
+        with self._condition:
+            self._queue.append(ticket)
+            while True:
+                while self._queue[0] is not ticket or not self._free_cores:
+                    self._condition.wait()
+                # Equal share of the free cores with the other jobs not started yet
+                outstanding = self._submitted - self._running - self._completed
+                threads = max(
+                    1,
+                    min(self.max_threads_per_solve, len(self._free_cores) // outstanding),
+                )
+                remaining_s = submitted_at + COALESCE_S - time.perf_counter()
+                if threads == 1 or remaining_s <= 0:
+                    break
+                self._condition.wait(remaining_s)
+            self._queue.popleft()
+            cores = self._free_cores[:threads]
+            del self._free_cores[:threads]
+            self._running += 1
+            # The next job in the queue may start on the remaining cores
+            self._condition.notify_all()
+        started_at = time.perf_counter()
+        allocation = SolverAllocation(threads, cores, started_at - submitted_at)
+        try:
+            yield allocation
+        finally:
+            finished_at = time.perf_counter()
+            with self._condition:
+                self._free_cores.extend(cores)
+                self._running -= 1
+                self._completed += 1
+                self._queue_wait_s.append(allocation.queue_wait_s)
+                self._run_s.append(finished_at - started_at)
+                self._core_s += (finished_at - started_at) * threads
+                self._condition.notify_all()
+
+    def metrics(self) -> dict:
+        """
+        Throughput and queue-wait metrics of the jobs so far.
+
+        :return: Dictionary with the number of "cores" and "busy_cores", the number of
+            "submitted", "running", "queued" and "completed" jobs, the "throughput_per_min"
+            (completed jobs per minute since the first submission), the "mean_queue_wait_s" and
+            "max_queue_wait_s", the "mean_run_s" and the "core_utilization" (share of the core
+            time reserved by completed jobs).
+        """
+        with self._condition:
+            elapsed_s = (
+                time.perf_counter() - self._started if self._started is not None else 0.0
+            )
+            return {
+                "cores": len(self.cores),
+                "busy_cores": len(self.cores) - len(self._free_cores),
+                "submitted": self._submitted,
+                "running": self._running,
+                "queued": self._submitted - self._running - self._completed,
+                "completed": self._completed,
+                "throughput_per_min": self._completed / elapsed_s * 60 if elapsed_s else 0.0,
+                "mean_queue_wait_s": _mean(self._queue_wait_s),
+                "max_queue_wait_s": max(self._queue_wait_s, default=0.0),
+                "mean_run_s": _mean(self._run_s),
+                "core_utilization": (
+                    self._core_s / (elapsed_s * len(self.cores)) if elapsed_s else 0.0
+                ),
+            }
+
+    def shutdown(self):
+        """Wait for the submitted jobs and stop the worker processes."""
+        with self._condition:
+            futures = list(self._futures)
+        wait(futures)
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+def _run_allocated(threads, cores, function, args, kwargs):
+    """Run a job in a worker process with the thread budget (and CPU affinity) of its
+    allocation."""
+    global _thread_budget
+    _thread_budget = threads
+    if cores is not None:
+        os.sched_setaffinity(0, cores)
+    return function(*args, **kwargs)
+
+
+def _mean(values: List[float]) -> float:
+    return sum(values) / len(values) if values else 0.0
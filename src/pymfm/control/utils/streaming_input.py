@@ -0,0 +1,307 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Incremental reader of large input JSON files.
+
+open_json loads the whole file into Python objects before InputData is built, so that peak
+memory is several times the file size for long multi-day scenarios. read_input_data instead
+decodes the file one value at a time: the small header fields are parsed as usual, while the
+generation_and_load and P_net_after_kW_limitation time series (lists of values or compact
+arrays) are streamed into preallocated NumPy arrays, so that peak memory stays close to the
+size of the final numeric data.
+"""
+
+import json
+from json.decoder import WHITESPACE
+from typing import Iterator, List, Tuple, Type
+import numpy as np
+import pandas as pd
+from pymfm.control.utils.data_input import (
+    GenerationAndLoadColumns,
+    InputData,
+    P_net_after_kWLimitationColumns,
+    TimeSeriesColumns,
+    _parse_timestamps,
+)
+
+# Characters read from the file at a time
+CHUNK_SIZE = 1 << 16
+# Values of a time series collected before they are converted into the arrays
+FLUSH_VALUES = 1 << 13
+# Characters that may continue a number
+NUMBER_CHARACTERS = frozenset("0123456789.eE+-")
+# Input fields streamed into columns
+STREAMED_SERIES = {
+    "generation_and_load": GenerationAndLoadColumns,
+    "P_net_after_kW_limitation": P_net_after_kWLimitationColumns,
+}
+
+
+def read_input_data(filename: str, chunk_size: int = CHUNK_SIZE) -> InputData:
+    """Read input data from a JSON file, streaming its time series into arrays.
+
+    Parameters
+    ----------
+    filename : str
+        name of the input JSON file.
+    chunk_size : int, optional
+        number of characters read from the file at a time, by default CHUNK_SIZE.
+
+    Returns
+    -------
+    InputData
+        the validated input data, equal to InputData(**open_json(filename)).
+    """
+    with open(filename) as file:
+        reader = _Reader(file, chunk_size)
+        data = {}
+        for key in reader.members():
+            if key in STREAMED_SERIES:
+                data[key] = _read_series(reader, STREAMED_SERIES[key])
+            else:
+                data[key] = reader.value()
+        reader.end()
+    return InputData(**data)
+
+
+class _Reader:
+    """Buffered reader of a JSON text decoding one value at a time."""
+
+    def __init__(self, file, chunk_size: int):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def _read(self) -> bool:
+        """Append the next chunk of the file to the unconsumed part of the buffer."""
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character, without consuming it."""
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._read():
+                raise ValueError("Unexpected end of the JSON input.")
+
+    def expect(self, character: str):
+        """Consume the next non-whitespace character, which has to be the given one."""
+        found = self.peek()
+        if found != character:
+            raise ValueError(f"Expected {character!r} in the JSON input, found {found!r}.")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # The value continues in the next chunk
+                if not self._read():
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            truncated = isinstance(value, (int, float)) and (
+                end == len(self.buffer) or self.buffer[end] in NUMBER_CHARACTERS
+            )
+            if not truncated or not self._read():
+                self.pos = end
+                return value
+
+    def _separators(self, closing: str) -> Iterator[None]:
+        """Yield before every member or element of an object or array until closing."""
+        if self.peek() == closing:
+            self.pos += 1
+            return
+        while True:
+            yield
+            separator = self.peek()
+            self.pos += 1
+            if separator == closing:
+                return
+            if separator != ",":
+                raise ValueError(
+                    f"Expected ',' or {closing!r} in the JSON input, found {separator!r}."
+                )
+
+    def members(self) -> Iterator[str]:
+        """Yield the keys of the next JSON object, the caller consumes the value of each."""
+        self.expect("{")
+        for _ in self._separators("}"):
+            key = self.value()
+            self.expect(":")
+            yield key
+
+    def batches(self, separator: str) -> Iterator[list]:
+        """Yield the elements of the next JSON array in lists.
+
+        The complete elements in the buffer, up to the last separator (e.g. "}," for objects)
+        before the closing bracket, are decoded at once, the remaining one on its own.
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            limit = self.buffer.find("]", self.pos)
+            cut = self.buffer.rfind(
+                separator, self.pos, len(self.buffer) if limit < 0 else limit
+            )
+            if cut >= 0:
+                cut += len(separator) - 1
+                try:
+                    batch = json.loads("[" + self.buffer[self.pos : cut] + "]")
+                except json.JSONDecodeError:
+                    # The separator is within a string, decode one element at a time
+                    batch = None
+                if batch is not None:
+                    self.pos = cut + 1
+                    yield batch
+                    continue
+            yield [self.value()]
+            separator_found = self.peek()
+            self.pos += 1
+            if separator_found == "]":
+                return
+            if separator_found != ",":
+                raise ValueError(
+                    f"Expected ',' or ']' in the JSON input, found {separator_found!r}."
+                )
+
+    def end(self):
+        """Check that only whitespace follows."""
+        try:
+            found = self.peek()
+        except ValueError:
+            return
+        raise ValueError(f"Unexpected {found!r} after the JSON input.")
+
+
+class _Buffer:
+    """Growing NumPy array, trimmed in place when finished."""
+
+    def __init__(self, dtype, capacity: int = FLUSH_VALUES):
+        self.array = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.array.dtype)
+        end = self.size + len(values)
+        if end > len(self.array):
+            self.array.resize(max(end, 2 * len(self.array)), refcheck=False)
+        self.array[self.size : end] = values
+        self.size = end
+
+    def finish(self) -> np.ndarray:
+        self.array.resize(self.size, refcheck=False)
+        return self.array
+
+
+class _TimestampBuffer:
+    """Timestamps parsed chunk-wise into nanoseconds (UTC for time zone aware timestamps)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.values = _Buffer(np.int64)
+        self.time_zones = set()
+
+    def extend(self, timestamps: list):
+        index = _parse_timestamps(timestamps, self.name)
+        self.time_zones.add(index.tz)
+        self.values.extend(index.asi8)
+
+    def finish(self) -> pd.DatetimeIndex:
+        index = pd.DatetimeIndex(self.values.finish().view("M8[ns]"), name="timestamp")
+        if self.time_zones <= {None}:
+            return index
+        if None in self.time_zones:
+            raise ValueError(
+                f"{self.name} mixes time zone aware and naive timestamps."
+            )
+        # Chunks with different UTC offsets are converted to UTC as in data_input
+        tz = self.time_zones.pop() if len(self.time_zones) == 1 else "UTC"
+        return index.tz_localize("UTC").tz_convert(tz)
+
+
+def _read_series(reader: _Reader, cls: Type[TimeSeriesColumns]):
+    """Read a time series field: its list of values is streamed into columns, a compact
+    form is read with its arrays streamed, anything else is left to InputData."""
+    following = reader.peek()
+    if following == "[":
+        return cls.from_columns(*_read_values(reader, cls))
+    if following != "{":
+        return reader.value()
+    section = {}
+    for key in reader.members():
+        if key == "values" and reader.peek() == "[":
+            section[key] = cls.from_columns(*_read_values(reader, cls))
+        elif key in cls.COLUMNS and reader.peek() == "[":
+            section[key] = _read_numbers(reader)
+        else:
+            section[key] = reader.value()
+    return section
+
+
+def _read_values(
+    reader: _Reader, cls: Type[TimeSeriesColumns]
+) -> Tuple[pd.DatetimeIndex, List[np.ndarray]]:
+    """Stream a list of values (dictionaries with a timestamp and the columns) into arrays."""
+    timestamps = _TimestampBuffer(cls.NAME)
+    columns = [_Buffer(float) for _ in cls.COLUMNS]
+    pending = []
+
+    def flush():
+        timestamps.extend([value.get("timestamp") for value in pending])
+        for name, column in zip(cls.COLUMNS, columns):
+            column.extend([value.get(name) for value in pending])
+        pending.clear()
+
+    for batch in reader.batches("},"):
+        if not all(isinstance(value, dict) for value in batch):
+            raise ValueError(f"Every value of {cls.NAME} has to be an object.")
+        pending.extend(batch)
+        if len(pending) >= FLUSH_VALUES:
+            flush()
+    if pending:
+        flush()
+    if not timestamps.values.size:
+        raise ValueError(f"{cls.NAME} has to be a non-empty list of values.")
+    return timestamps.finish(), [column.finish() for column in columns]
+
+
+def _read_numbers(reader: _Reader) -> np.ndarray:
+    """Stream an array of numbers (null for missing values) into a float array."""
+    numbers = _Buffer(float)
+    for batch in reader.batches(","):
+        numbers.extend(batch)
+    return numbers.finish()
@@ -0,0 +1,177 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from datetime import timedelta
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+from pymfm.control.utils.data_input import TimeResolution
+
+# Column of an aggregated forecast holding the duration of every time step in seconds
+STEP_COLUMN = "delta_T_s"
+
+
+def step_seconds(P_load_gen: pd.DataFrame) -> np.ndarray:
+    """Duration of every time step of a forecast in seconds.
+
+    Parameters
+    ----------
+    P_load_gen : pd.DataFrame
+        load and generation forecast, either aggregated by aggregate (with the step durations in
+        its STEP_COLUMN) or with a uniform time step (index with a frequency or at least two
+        entries).
+
+    Returns
+    -------
+    np.ndarray
+        float array of the step durations, for a uniform forecast without frequency the last step
+        lasts as long as the one before it.
+    """
+    if STEP_COLUMN in P_load_gen.columns:
+        return P_load_gen[STEP_COLUMN].to_numpy(float)
+    index = P_load_gen.index
+    if index.freq is not None:
+        return np.full(len(index), pd.to_timedelta(index.freq).total_seconds())
+    durations = np.diff(index.asi8) / 1e9
+    return np.append(durations, durations[-1])
+
+
+def step_starts(
+    index: pd.DatetimeIndex, time_resolution: List[TimeResolution]
+) -> pd.DatetimeIndex:
+    """Start timestamps of the time steps of the given time resolution over a uniform forecast.
+
+    The blocks follow each other from the start of the forecast, each one with its own step length.
+    A step is cut at the end of its block and at the end of the forecast, and the last block
+    (also if it has an until_minutes) covers the rest of the forecast.
+
+    Parameters
+    ----------
+    index : pd.DatetimeIndex
+        timestamps of the uniform forecast, with a frequency.
+    time_resolution : List[TimeResolution]
+        blocks of the optimization horizon with their step lengths.
+
+    Returns
+    -------
+    pd.DatetimeIndex
+        start timestamps of the time steps, a subset of index.
+    """
+    if index.freq is None:
+        raise ValueError(
+            "time_resolution requires generation_and_load with a uniform time step."
+        )
+    delta_T = pd.to_timedelta(index.freq)
+    horizon_end = index[-1] + delta_T
+    starts = []
+    t = index[0]
+    for i, block in enumerate(time_resolution):
+        step = timedelta(minutes=block.step_minutes)
+        if step % delta_T:
+            raise ValueError(
+                f"step_minutes of time_resolution ({block.step_minutes}) has to be a multiple "
+                f"of the generation_and_load time step ({delta_T})."
+            )
+        last_block = i == len(time_resolution) - 1
+        block_end = (
+            horizon_end
+            if last_block or block.until_minutes is None
+            else min(index[0] + timedelta(minutes=block.until_minutes), horizon_end)
+        )
+        while t < block_end:
+            starts.append(t)
+            t = min(t + step, block_end)
+    # Block ends between two forecast timestamps are rounded down to the forecast time step
+    return index[index.searchsorted(pd.DatetimeIndex(starts), side="right") - 1].unique()
+
+
+def aggregate(
+    P_load_gen: pd.DataFrame,
+    P_net_after_kW_limits: pd.DataFrame,
+    time_resolution: List[TimeResolution],
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Aggregate the forecast and the P_net_after_kW limits into the time steps of the given
+    time resolution (e.g. 5 minutes for the first 2 hours, 15 minutes up to 12 hours and hourly
+    after), so that the optimization keeps full resolution where it matters most with far fewer
+    time steps.
+
+    The load and generation forecasts are averaged over every time step (conserving the energy),
+    while the limits are tightened to the most restrictive bound within the time step, so that the
+    constant power of an aggregated time step respects the bounds of all forecast timestamps it
+    covers.
+
+    Parameters
+    ----------
+    P_load_gen : pd.DataFrame
+        load and generation forecast time series of float type, with a uniform time step.
+    P_net_after_kW_limits : pd.DataFrame
+        consisiting of upper and lower bound float time series (kW) and
+        the identifiers for the existance of any upper or lower bounds.
+    time_resolution : List[TimeResolution]
+        blocks of the optimization horizon with their step lengths.
+
+    Returns
+    -------
+    Tuple[pd.DataFrame, pd.DataFrame]
+        aggregated forecast, indexed by the start of its time steps and holding their durations in
+        STEP_COLUMN, and the aggregated P_net_after_kW limits on the same index.
+    """
+    index = P_load_gen.index
+    starts = step_starts(index, time_resolution)
+    # Time step of every forecast timestamp
+    steps = starts[starts.searchsorted(index, side="right") - 1]
+    durations = np.diff(
+        np.append(starts.asi8, (index[-1] + pd.to_timedelta(index.freq)).value)
+    ) / 1e9
+
+    aggregated_forecast = P_load_gen.groupby(steps).mean()
+    aggregated_forecast.index.name = P_load_gen.index.name
+    aggregated_forecast[STEP_COLUMN] = durations
+
+    limits = P_net_after_kW_limits.reindex(index)
+    with_upper_bound = limits.with_upper_bound.fillna(False).astype(bool)
+    with_lower_bound = limits.with_lower_bound.fillna(False).astype(bool)
+    bounds = pd.DataFrame(
+        {
+            "upper_bound": limits.upper_bound.where(with_upper_bound, np.inf),
+            "lower_bound": limits.lower_bound.where(with_lower_bound, -np.inf),
+            "with_upper_bound": with_upper_bound,
+            "with_lower_bound": with_lower_bound,
+        },
+        index=index,
+    ).groupby(steps)
+    aggregated_limits = pd.concat(
+        [
+            bounds.upper_bound.min(),
+            bounds.with_upper_bound.any(),
+            bounds.lower_bound.max(),
+            bounds.with_lower_bound.any(),
+        ],
+        axis=1,
+    )
+    # Missing bounds are set to 0 as in data_input.P_net_after_kW_lim_to_df
+    aggregated_limits.loc[~aggregated_limits.with_upper_bound, "upper_bound"] = 0
+    aggregated_limits.loc[~aggregated_limits.with_lower_bound, "lower_bound"] = 0
+    aggregated_limits.index.name = "timestamp"
+
+    return aggregated_forecast, aggregated_limits
@@ -0,0 +1,364 @@
+# The pymfm framework
+
+# Copyright (C) 2023,
+# Institute for Automation of Complex Power Systems (ACS),
+# E.ON Energy Research Center (E.ON ERC),
+# RWTH Aachen University
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the # rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit# persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+import collections
+from concurrent.futures import Future, wait
+import importlib
+import itertools
+import multiprocessing
+import pickle
+import queue
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, List, Union
+from pymfm.control.utils.data_input import InputData
+
+# Seconds to wait for a worker process to warm up
+WARM_UP_TIMEOUT_S = 300
+# Seconds between the checks of the collector whether the worker processes are alive
+LIVENESS_INTERVAL_S = 0.5
+# Modules of the control pipeline which are imported lazily (see lazy.lazy_import)
+LAZY_MODULES = (
+    "pymfm.control.utils.feasibility",
+    "pymfm.control.utils.time_resolution",
+    "pymfm.control.algorithms.battery_sizing",
+    "pymfm.control.algorithms.dynamic_programming",
+    "pymfm.control.algorithms.peak_shaving",
+    "pymfm.control.algorithms.representative_periods",
+)
+
+
+class WarmWorkerPool:
+    """
+    Pool of pre-warmed worker processes serving control runs from a local queue.
+
+    Every worker process imports the control pipeline (pandas, pyomo, scipy, matplotlib, astral
+    and the control algorithms, also those loaded lazily) and solves a trivial model once at
+    start, so that jobs only pay for the actual work. With SOLVER_NAME "gurobi", pyomo solves
+    in the worker process itself through gurobipy, so the gurobipy default environment (and
+    with it the licence) is created by the warm-up solve and kept alive for all jobs of the
+    worker. The pool records the cold start of its workers and the latency of every job (see
+    latency).
+
+    Jobs are dispatched by the pool to idle workers. The job of a worker process which dies
+    (e.g. segmentation fault or killed for lack of memory) fails with a RuntimeError and the
+    worker is replaced by a new one.
+    """
+
+    def __init__(self, n_workers: int = 1, warm_solver: bool = True):
+        """
+        :param n_workers: Number of worker processes.
+        :param warm_solver: If true, the workers initialize the optimization solver by solving
+            a trivial model (not needed for rule-based control only).
+        """
+        if n_workers < 1:
+            raise ValueError("The worker pool requires at least one worker.")
+        # Fresh interpreters, as forking would copy solver environments and threads
+        self._context = multiprocessing.get_context("spawn")
+        self._warm_solver = warm_solver
+        self._results = self._context.Queue()
+        self._futures = {}
+        self._submitted_at = {}
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._pending = collections.deque()  # Jobs waiting for an idle worker
+        self._idle = []  # Indices of the idle workers
+        self._running = {}  # Job ID run by each busy worker
+        self._closed = False
+        self._cold_start_s = []
+        self._warm_up_s = []
+        self._latency_s = []
+
+        started_at = time.perf_counter()
+        self._workers = [None] * n_workers
+        self._job_queues = [None] * n_workers
+        for index in range(n_workers):
+            self._start_worker(index)
+        # Wait until every worker is warm
+        deadline = started_at + WARM_UP_TIMEOUT_S
+        while len(self._warm_up_s) < n_workers:
+            try:
+                index, _, _, warm_up_s = self._results.get(timeout=LIVENESS_INTERVAL_S)
+            except queue.Empty:
+                dead = [worker for worker in self._workers if not worker.is_alive()]
+                if dead or time.perf_counter() > deadline:
+                    self._terminate()
+                    raise RuntimeError(
+                        f"A worker process exited with code {dead[0].exitcode} during warm-up."
+                        if dead
+                        else f"The worker processes did not warm up in {WARM_UP_TIMEOUT_S} s."
+                    )
+                continue
+            self._cold_start_s.append(time.perf_counter() - started_at)
+            self._warm_up_s.append(warm_up_s)
+            self._idle.append(index)
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+        print(
+            f"{n_workers} worker process(es) warmed up in "
+            f"{max(self._cold_start_s):.2f} s."
+        )
+
+    def submit(self, function: Callable, *args, **kwargs) -> Future:
+        """
+        Queue a job for the next free worker process.
+
+        :param function: Picklable function to run (defined at module level).
+        :param args: Positional arguments of the function.
+        :param kwargs: Keyword arguments of the function.
+        :return: Future of the result of the function.
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The worker pool has been shut down.")
+            job_id = next(self._job_ids)
+            self._futures[job_id] = future
+            self._submitted_at[job_id] = time.perf_counter()
+            self._pending.append((job_id, function, args, kwargs))
+            self._dispatch()
+        return future
+
+    def handle(self, data: Union[InputData, dict, str]) -> Future:
+        """
+        Queue a control run (see mode_logic_handler.handle_input).
+
+        :param data: InputData object, its (JSON) dictionary or the name of its JSON file.
+        :return: Future of the tuple of mode logic information, output DataFrame, and solver
+            status.
+        """
+        from pymfm.control.utils.mode_logic_handler import handle_input
+
+        return self.submit(handle_input, data)
+
+    def latency(self) -> dict:
+        """
+        Cold and warm latency numbers of the pool.
+
+        :return: Dictionary with the "cold_start_s" of the workers (from their start until they
+            were warm), the part of it spent in the "warm_up_s" (imports and solver
+            initialization), the number of "jobs" and the "mean_latency_s",
+            "median_latency_s" and "max_latency_s" of the jobs (from their submission until
+            their result).
+        """
+        with self._lock:
+            latency_s = list(self._latency_s)
+        return {
+            "cold_start_s": max(self._cold_start_s),
+            "warm_up_s": max(self._warm_up_s),
+            "jobs": len(latency_s),
+            "mean_latency_s": statistics.mean(latency_s) if latency_s else None,
+            "median_latency_s": statistics.median(latency_s) if latency_s else None,
+            "max_latency_s": max(latency_s, default=None),
+        }
+
+    def shutdown(self):
+        """Stop the worker processes after the queued jobs."""
+        with self._lock:
+            self._closed = True
+            futures = list(self._futures.values())
+        wait(futures)
+        with self._lock:
+            for job_queue in self._job_queues:
+                job_queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._results.put(None)
+        self._collector.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def _start_worker(self, index: int):
+        """Start the worker process of the given index with its own job queue."""
+        self._job_queues[index] = self._context.Queue()
+        self._workers[index] = self._context.Process(
+            target=_serve,
+            args=(index, self._job_queues[index], self._results, self._warm_solver),
+            daemon=True,
+        )
+        self._workers[index].start()
+
+    def _terminate(self):
+        """Kill the worker processes (when the pool could not be started)."""
+        for worker in self._workers:
+            if worker.is_alive():
+                worker.kill()
+            worker.join()
+
+    def _dispatch(self):
+        """Hand the pending jobs to the idle workers (called with the lock held)."""
+        while self._pending and self._idle:
+            index = self._idle.pop()
+            job = self._pending.popleft()
+            self._running[index] = job[0]
+            self._job_queues[index].put(job)
+
+    def _collect(self):
+        """Resolve the futures with the results of the workers and replace dead workers."""
+        while True:
+            self._replace_dead_workers()
+            try:
+                message = self._results.get(timeout=LIVENESS_INTERVAL_S)
+            except queue.Empty:
+                continue
+            if message is None:
+                return
+            index, job_id, succeeded, result = message
+            with self._lock:
+                # A replaced worker reports that it is warm
+                if job_id is not None:
+                    del self._running[index]
+                    future = self._futures.pop(job_id)
+                    self._latency_s.append(
+                        time.perf_counter() - self._submitted_at.pop(job_id)
+                    )
+                self._idle.append(index)
+                self._dispatch()
+            if job_id is None:
+                continue
+            if succeeded:
+                future.set_result(result)
+            else:
+                future.set_exception(result)
+
+    def _replace_dead_workers(self):
+        """Fail the jobs of the worker processes which died and start new workers."""
+        failed = []
+        with self._lock:
+            for index, worker in enumerate(self._workers):
+                if worker.is_alive() or worker.exitcode is None:
+                    continue
+                # Workers stopped by shutdown are not replaced
+                if self._closed and index not in self._running:
+                    continue
+                job_id = self._running.pop(index, None)
+                if job_id is not None:
+                    failed.append((job_id, worker.exitcode))
+                    self._submitted_at.pop(job_id)
+                if index in self._idle:
+                    self._idle.remove(index)
+                print(f"Worker process exited with code {worker.exitcode}, restarting it.")
+                self._start_worker(index)
+            failed = [
+                (self._futures.pop(job_id), exitcode) for job_id, exitcode in failed
+            ]
+        for future, exitcode in failed:
+            future.set_exception(
+                RuntimeError(f"The worker process running the job exited with code {exitcode}.")
+            )
+
+
+def cold_latency(data: Union[InputData, dict, str], repeats: int = 1) -> List[float]:
+    """
+    Latency of control runs in fresh processes, for comparison with the warm latency of a
+    WarmWorkerPool.
+
+    :param data: InputData object, its (JSON) dictionary or the name of its JSON file.
+    :param repeats: Number of runs.
+    :return: Wall-clock time of every run in seconds, from the process start until its result.
+    """
+    latency_s = []
+    for _ in range(repeats):
+        started_at = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", _COLD_RUN],
+            input=_pickle(data),
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        latency_s.append(time.perf_counter() - started_at)
+    return latency_s
+
+
+# Control run of a fresh process reading its pickled input from stdin
+_COLD_RUN = (
+    "import pickle, sys; "
+    "from pymfm.control.utils.mode_logic_handler import handle_input; "
+    "handle_input(pickle.load(sys.stdin.buffer))"
+)
+
+
+def _pickle(data) -> bytes:
+    return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _serve(index, jobs, results, warm_solver):
+    """Main loop of a worker process: warm up, then run jobs until told to stop."""
+    started_at = time.perf_counter()
+    _warm_up(warm_solver)
+    results.put((index, None, True, time.perf_counter() - started_at))
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        job_id, function, args, kwargs = job
+        try:
+            message = (index, job_id, True, function(*args, **kwargs))
+            # Make sure the result can be sent back before reporting it
+            _pickle(message)
+        except Exception as err:
+            message = (index, job_id, False, err)
+            try:
+                _pickle(message)
+            except Exception:
+                # Exceptions which cannot be pickled are sent back as their representation
+                message = (index, job_id, False, RuntimeError(repr(err)))
+        results.put(message)
+
+
+def _warm_up(warm_solver):
+    """Import the control pipeline and initialize the optimization solver."""
+    import astral.sun  # noqa: F401
+    import matplotlib.pyplot  # noqa: F401
+    from pyomo.core import ConcreteModel, Constraint, NonNegativeReals, Objective, Var
+    from pyomo.environ import SolverFactory
+    import scipy.cluster.vq  # noqa: F401
+    from pymfm.control.algorithms import optimization_based as OptB
+    import pymfm.control.utils.mode_logic_handler  # noqa: F401
+    import pymfm.control.utils.data_output  # noqa: F401
+
+    # The modules imported lazily by the control pipeline are only executed on first use of
+    # one of their attributes
+    for name in LAZY_MODULES:
+        importlib.import_module(name).__dict__
+
+    if not warm_solver:
+        return
+    # Solving a trivial model loads the solver interface; gurobipy creates its default
+    # environment and checks out the licence, both kept for the later solves of the process
+    model = ConcreteModel()
+    model.x = Var(within=NonNegativeReals)
+    model.c = Constraint(expr=model.x >= 1)
+    model.obj = Objective(expr=model.x)
+    try:
+        SolverFactory(OptB.SOLVER_NAME).solve(model)
+    except Exception as err:
+        print(f"The optimization solver could not be initialized: {err}")